@@ -0,0 +1,175 @@
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from main_agent import create_paper_search_agents, run_paper_search_chat
+from research_tools import search_research_papers_tool_schema, search_research_papers_batch_tool_schema
+from tracing import span
+
+# Upper bound on concurrent chats, and on agent pairs kept alive
+AGENT_POOL_SIZE = int(os.getenv("AGENT_POOL_SIZE", "4"))
+# How long a caller waits for a free pair before AgentPoolTimeout (None = forever)
+AGENT_POOL_CHECKOUT_TIMEOUT = 60.0
+# Pairs are rebuilt after this many chats so long-running services do not accumulate state
+AGENT_POOL_MAX_CHATS_PER_PAIR = 200
+
+_TOOL_NAMES = (search_research_papers_tool_schema["name"], search_research_papers_batch_tool_schema["name"])
+
+
+class AgentPoolTimeout(TimeoutError):
+    pass
+
+
+class _PooledPair:
+    __slots__ = ("user_proxy", "assistant", "chats", "created_at")
+
+    def __init__(self, user_proxy, assistant):
+        self.user_proxy = user_proxy
+        self.assistant = assistant
+        self.chats = 0
+        self.created_at = time.monotonic()
+
+
+# A pair is reusable when both agents still know the tools and the last chat left nothing behind.
+def _is_healthy(pair: _PooledPair) -> bool:
+    user_proxy, assistant = pair.user_proxy, pair.assistant
+    if any(name not in user_proxy.function_map for name in _TOOL_NAMES):
+        return False
+    llm_tools = {tool["function"]["name"] for tool in (assistant.llm_config or {}).get("tools", [])}
+    if any(name not in llm_tools for name in _TOOL_NAMES):
+        return False
+    return not user_proxy.chat_messages and not assistant.chat_messages
+
+
+class AgentPool:
+    """
+    Keeps up to `size` pre-built paper search agent pairs for concurrent chats.
+
+    checkout() hands out an idle pair (building one if the pool is not full yet) and
+    blocks while all pairs are busy, which also bounds the number of concurrent chats.
+    Returned pairs are reset and health-checked; broken or worn-out pairs are dropped
+    and rebuilt on demand.
+    """
+
+    def __init__(self, size: int = AGENT_POOL_SIZE, use_async_tools: bool = False, max_chats_per_pair: int = AGENT_POOL_MAX_CHATS_PER_PAIR):
+        if size < 1:
+            raise ValueError("Agent pool size must be at least 1.")
+        self.size = size
+        self.use_async_tools = use_async_tools
+        self.max_chats_per_pair = max_chats_per_pair
+        self._idle = queue.LifoQueue()  # the most recently used pair has warm connections and caches
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._live_pairs = 0
+        self._stats = {"pairs_created": 0, "pairs_discarded": 0, "checkouts": 0, "checkout_wait_seconds": 0.0}
+
+    def _build_pair(self) -> _PooledPair:
+        pair = _PooledPair(*create_paper_search_agents(use_async_tools=self.use_async_tools))
+        if not _is_healthy(pair):
+            raise RuntimeError("Freshly built agent pair failed its health check.")
+        with self._lock:
+            self._live_pairs += 1
+            self._stats["pairs_created"] += 1
+        return pair
+
+    def warm(self, count: int = None) -> None:
+        """Builds pairs up front so the first requests do not pay for agent construction."""
+        count = self.size if count is None else min(count, self.size)
+        with self._lock:
+            missing = count - self._live_pairs
+        for _ in range(max(missing, 0)):
+            self._idle.put(self._build_pair())
+
+    def _acquire(self, timeout: float | None) -> _PooledPair:
+        started = time.monotonic()
+        if not self._slots.acquire(timeout=timeout):
+            raise AgentPoolTimeout(f"No agent pair became free within {timeout} seconds (pool size {self.size}).")
+        try:
+            pair = self._idle.get_nowait()
+        except queue.Empty:
+            pair = None
+        try:
+            if pair is None:
+                pair = self._build_pair()
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._lock:
+            self._stats["checkouts"] += 1
+            self._stats["checkout_wait_seconds"] += time.monotonic() - started
+        return pair
+
+    def _release(self, pair: _PooledPair, failed: bool) -> None:
+        try:
+            pair.chats += 1
+            pair.user_proxy.reset()
+            pair.assistant.reset()
+            if failed or pair.chats >= self.max_chats_per_pair or not _is_healthy(pair):
+                with self._lock:
+                    self._live_pairs -= 1
+                    self._stats["pairs_discarded"] += 1
+            else:
+                self._idle.put(pair)
+        finally:
+            self._slots.release()
+
+    @contextmanager
+    def checkout(self, timeout: float | None = AGENT_POOL_CHECKOUT_TIMEOUT):
+        """Yields (user_proxy, assistant) for one chat and returns the pair to the pool afterwards."""
+        pair = self._acquire(timeout)
+        failed = False
+        try:
+            yield pair.user_proxy, pair.assistant
+        except BaseException:
+            failed = True  # the agents may be mid-chat; do not hand them to the next caller
+            raise
+        finally:
+            self._release(pair, failed)
+
+    def run_chat(self, task_message: str, timeout: float | None = AGENT_POOL_CHECKOUT_TIMEOUT, **chat_kwargs) -> tuple[str, list]:
+        """run_paper_search_chat on a pooled pair. The history is copied before the pair is reset."""
+        with span("agent_pool.chat", pool_size=self.size) as pool_span:
+            with self.checkout(timeout) as (user_proxy, assistant):
+                final_response, history = run_paper_search_chat(task_message, user_proxy, assistant, **chat_kwargs)
+                history = history.snapshot()
+            pool_span.set_attribute("messages", len(history))
+            return final_response, history
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": self.size, "live_pairs": self._live_pairs, "idle_pairs": self._idle.qsize(), **self._stats}
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+# Returns the process-wide pool (AGENT_POOL_SIZE pairs), created on first use.
+def get_agent_pool() -> AgentPool:
+    global _default_pool
+    if _default_pool is None:
+        with _default_pool_lock:
+            if _default_pool is None:
+                _default_pool = AgentPool()
+    return _default_pool
+
+
+if __name__ == "__main__":
+    from concurrent.futures import ThreadPoolExecutor
+    from tracing import configure_logging
+
+    configure_logging()
+    pool = AgentPool(size=2)
+    pool.warm()
+    print(f"Warmed pool: {pool.stats()}")
+
+    prompts = [
+        "Find 3 research papers on graph neural networks published after 2020.",
+        "Find 2 papers about reinforcement learning with at least 100 citations.",
+        "Find 3 research papers on transformer models in NLP published in 2021.",
+    ]
+    with ThreadPoolExecutor(max_workers=len(prompts)) as executor:
+        for prompt, (final_response, history) in zip(prompts, executor.map(pool.run_chat, prompts)):
+            print(f"\n--- {prompt} ({len(history)} messages) ---\n{final_response}")
+    print(f"\nAgent pool stats: {pool.stats()}")
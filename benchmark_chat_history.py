@@ -0,0 +1,73 @@
+import argparse
+import json
+import time
+from chat_history import ChatHistory
+from evaluation import format_history_for_critic
+from prescorer import compute_prescore_facts
+
+ASSISTANT_NAME = "PaperSearchAssistant"
+USER_PROXY_NAME = "UserQueryProxy"
+DEFAULT_LENGTHS = (50, 500, 2000)
+DEFAULT_ITERATIONS = 20
+PROMPT = "Find 5 research papers on graph neural networks published after 2020 with at least 50 citations."
+
+
+# A long chat as autogen records it on the user proxy: rounds of tool call, tool result and assistant text.
+def synthetic_history(messages: int) -> list:
+    history = [{"role": "assistant", "name": USER_PROXY_NAME, "content": PROMPT}]
+    papers = [
+        {"paperId": f"p{i}", "title": f"Paper {i} on graph neural networks", "authors": "A. Author, B. Author",
+         "year": 2021 + i % 3, "citationCount": 50 + 10 * i, "url": f"https://www.semanticscholar.org/paper/p{i}"}
+        for i in range(5)
+    ]
+    round_number = 0
+    while len(history) < messages:
+        call_id = f"call_{round_number}"
+        arguments = json.dumps({"topic": f"graph neural networks {round_number}", "year": 2020, "year_filter": "after", "limit": 5})
+        history.append({"role": "assistant", "content": None, "tool_calls": [{"id": call_id, "type": "function", "function": {"name": "search_research_papers", "arguments": arguments}}]})
+        result = json.dumps(papers)
+        history.append({"role": "tool", "content": result, "tool_responses": [{"tool_call_id": call_id, "role": "tool", "content": result}]})
+        listing = "\n".join(f"{i + 1}. {paper['title']} ({paper['year']}), {paper['citationCount']} citations" for i, paper in enumerate(papers))
+        history.append({"role": "user", "name": ASSISTANT_NAME, "content": f"Here are the papers:\n{listing}"})
+        round_number += 1
+    history[-1]["content"] += "\nTERMINATE"
+    return history[:messages]
+
+
+def _time_ms(function, iterations: int) -> float:
+    function()  # warm-up (tokenizer load, caches)
+    started = time.perf_counter()
+    for _ in range(iterations):
+        function()
+    return round((time.perf_counter() - started) / iterations * 1000, 3)
+
+
+# Each consumer timed on the plain message list (which it has to classify itself) and on a
+# ChatHistory classified beforehand, as run_paper_search_chat now returns it.
+def benchmark_length(messages: int, iterations: int) -> dict:
+    raw = synthetic_history(messages)
+    history = ChatHistory(raw)
+    final_response = history.final_response(ASSISTANT_NAME)
+    consumers = {
+        "final_response": lambda h: (h if isinstance(h, ChatHistory) else ChatHistory(h)).final_response(ASSISTANT_NAME),
+        "prescorer": lambda h: compute_prescore_facts(PROMPT, final_response, h),
+        "critic_transcript": lambda h: format_history_for_critic(h, token_budget=None),
+        "critic_compacted": lambda h: format_history_for_critic(h),
+        "jsonl_export": lambda h: (h if isinstance(h, ChatHistory) else ChatHistory(h)).to_jsonl(),
+    }
+    result = {"messages": len(raw), "ingest_ms": _time_ms(lambda: ChatHistory(raw), iterations)}
+    for name, consumer in consumers.items():
+        result[name] = {
+            "plain_list_ms": _time_ms(lambda: consumer(raw), iterations),
+            "chat_history_ms": _time_ms(lambda: consumer(history), iterations),
+        }
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-benchmark of chat history classification, extraction, critic formatting and export.")
+    parser.add_argument("--lengths", type=int, nargs="*", default=list(DEFAULT_LENGTHS), help="Messages per synthetic history.")
+    parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS)
+    args = parser.parse_args()
+
+    print(json.dumps([benchmark_length(length, args.iterations) for length in args.lengths], indent=2))
@@ -0,0 +1,85 @@
+import argparse
+import json
+import time
+from query_parser import parse_search_request
+from test_prompts import TEST_PROMPTS_FULL
+
+# The fast path replaces the LLM turn that extracts the tool arguments
+LLM_CALLS_SAVED_PER_FAST_PATH = 1
+
+
+# Times the rule-based parser alone on every test prompt (no network, no API key needed).
+def benchmark_parser(iterations: int) -> dict:
+    cases = []
+    for prompt in TEST_PROMPTS_FULL:
+        started = time.perf_counter()
+        for _ in range(iterations):
+            parsed = parse_search_request(prompt)
+        elapsed = time.perf_counter() - started
+        cases.append({
+            "prompt": prompt,
+            "fast_path": parsed.is_confident,
+            "confidence": parsed.confidence,
+            "tool_arguments": parsed.to_tool_arguments() if parsed.is_confident else None,
+            "parse_microseconds": round(elapsed / iterations * 1e6, 2),
+        })
+    fast_path_cases = sum(case["fast_path"] for case in cases)
+    return {
+        "mode": "parser",
+        "iterations": iterations,
+        "fast_path_cases": fast_path_cases,
+        "total_cases": len(cases),
+        "estimated_llm_calls_saved": fast_path_cases * LLM_CALLS_SAVED_PER_FAST_PATH,
+        "cases": cases,
+    }
+
+
+# Counts completions made through the assistant's OpenAIWrapper.
+def _count_llm_calls(assistant) -> dict:
+    counter = {"calls": 0}
+    original_create = assistant.client.create
+
+    def counting_create(*args, **kwargs):
+        counter["calls"] += 1
+        return original_create(*args, **kwargs)
+
+    assistant.client.create = counting_create
+    return counter
+
+
+# Runs every prompt through both paths against the live services.
+def benchmark_live(prompt_indices: list) -> dict:
+    from main_agent import create_paper_search_agents, run_paper_search_chat
+
+    user_proxy, assistant = create_paper_search_agents()
+    counter = _count_llm_calls(assistant)
+    cases = []
+    for index in prompt_indices:
+        prompt = TEST_PROMPTS_FULL[index]
+        case = {"prompt": prompt}
+        for label, use_fast_path in (("agent_loop", False), ("fast_path", True)):
+            counter["calls"] = 0
+            started = time.perf_counter()
+            run_paper_search_chat(prompt, user_proxy, assistant, use_fast_path=use_fast_path)
+            case[label] = {"seconds": round(time.perf_counter() - started, 3), "llm_calls": counter["calls"]}
+        case["llm_calls_saved"] = case["agent_loop"]["llm_calls"] - case["fast_path"]["llm_calls"]
+        cases.append(case)
+    return {
+        "mode": "live",
+        "total_llm_calls_saved": sum(case["llm_calls_saved"] for case in cases),
+        "total_seconds_saved": round(sum(case["agent_loop"]["seconds"] - case["fast_path"]["seconds"] for case in cases), 3),
+        "cases": cases,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the rule-based fast path against the full agent loop.")
+    parser.add_argument("--iterations", type=int, default=1000, help="Parser iterations per prompt.")
+    parser.add_argument("--live", action="store_true", help="Also run the prompts against Mistral and Semantic Scholar.")
+    parser.add_argument("--prompts", type=int, nargs="*", default=None, help="Prompt indices for --live (default: all).")
+    args = parser.parse_args()
+
+    results = {"parser": benchmark_parser(args.iterations)}
+    if args.live:
+        results["live"] = benchmark_live(args.prompts if args.prompts is not None else list(range(len(TEST_PROMPTS_FULL))))
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,109 @@
+import argparse
+import json
+import time
+from prescorer import CRITIC_SKIPPING_VERDICTS, compute_prescore_facts
+from query_parser import parse_search_request
+from test_prompts import TEST_PROMPTS_FULL
+
+ASSISTANT_NAME = "PaperSearchAssistant"
+USER_PROXY_NAME = "UserQueryProxy"
+
+
+# Papers that satisfy the parsed constraints (the year/citation values the tool would return).
+def _matching_papers(arguments: dict) -> list:
+    year = arguments.get("year", 2020)
+    year = {"before": year - 1, "after": year + 1}.get(arguments.get("year_filter"), year)
+    citations = max(arguments.get("min_citations") or 0, 0)
+    return [
+        {"paperId": f"p{i}", "title": f"Paper {i} on {arguments['topic']}", "authors": "A. Author", "year": year,
+         "citationCount": citations + 10 * i, "url": f"https://www.semanticscholar.org/paper/p{i}"}
+        for i in range(max(arguments.get("limit", 5), 1))
+    ]
+
+
+def _transcript(prompt: str, arguments: dict, papers: list, final: str) -> list:
+    history = [{"role": "assistant", "name": USER_PROXY_NAME, "content": prompt}]
+    if papers is not None:
+        tool_call = {"id": "call_0", "type": "function", "function": {"name": "search_research_papers", "arguments": json.dumps(arguments)}}
+        history.append({"role": "assistant", "content": None, "tool_calls": [tool_call]})
+        history.append({"role": "tool", "content": json.dumps(papers), "tool_responses": [{"tool_call_id": "call_0", "role": "tool", "content": json.dumps(papers)}]})
+    history.append({"role": "user", "name": ASSISTANT_NAME, "content": final})
+    return history
+
+
+# Builds typical agent outcomes for every test prompt: a correct run, a hallucinated answer,
+# a run whose papers violate the constraints and a clarifying question.
+def synthetic_cases() -> list:
+    cases = []
+    for prompt in TEST_PROMPTS_FULL:
+        parsed = parse_search_request(prompt)
+        arguments = parsed.to_tool_arguments() if parsed.topic else {"topic": "unknown", "limit": 5}
+        papers = _matching_papers(arguments)
+        listing = "\n".join(f"{i + 1}. {paper['title']} ({paper['year']}), {paper['citationCount']} citations" for i, paper in enumerate(papers))
+        violating = [dict(papers[0], year=(papers[0]["year"] or 2020) + 50, citationCount=0)] + papers[1:]
+
+        for scenario, case_papers, final in (
+            ("correct", papers, f"{listing}\nTERMINATE"),
+            ("hallucinated", None, "Title: Imagined results, 420 citations\nTERMINATE"),
+            ("constraint_violation", violating, f"{listing}\nTERMINATE"),
+            ("clarification", None, "Which years and how many papers would you like? TERMINATE"),
+        ):
+            cases.append({"scenario": scenario, "prompt": prompt, "final": final, "history": _transcript(prompt, arguments, case_papers, final)})
+    return cases
+
+
+def _summarize(cases: list, verdicts: list, elapsed: float, iterations: int) -> dict:
+    critic_calls_with_prescorer = sum(verdict not in CRITIC_SKIPPING_VERDICTS for verdict in verdicts)
+    by_scenario = {}
+    for case, verdict in zip(cases, verdicts):
+        counts = by_scenario.setdefault(case.get("scenario", "live"), {"pass": 0, "fail": 0, "unclear": 0})
+        counts[verdict] += 1
+    return {
+        "transcripts": len(cases),
+        "critic_calls_without_prescorer": len(cases),
+        "critic_calls_with_prescorer": critic_calls_with_prescorer,
+        "critic_calls_saved": len(cases) - critic_calls_with_prescorer,
+        "critic_call_reduction_percent": round(100 * (len(cases) - critic_calls_with_prescorer) / len(cases), 1) if cases else 0.0,
+        "prescore_microseconds_per_transcript": round(elapsed / (len(cases) * iterations) * 1e6, 2) if cases else 0.0,
+        "verdicts_by_scenario": by_scenario,
+    }
+
+
+def benchmark_synthetic(iterations: int) -> dict:
+    cases = synthetic_cases()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        verdicts = [compute_prescore_facts(case["prompt"], case["final"], case["history"]).verdict for case in cases]
+    elapsed = time.perf_counter() - started
+    return {"mode": "synthetic", "iterations": iterations, **_summarize(cases, verdicts, elapsed, iterations)}
+
+
+# Runs the real agent on the given prompts and pre-scores the transcripts (the critic itself is not called).
+def benchmark_live(prompt_indices: list) -> dict:
+    from main_agent import create_paper_search_agents, run_paper_search_chat
+
+    user_proxy, assistant = create_paper_search_agents()
+    cases, verdicts, elapsed = [], [], 0.0
+    for index in prompt_indices:
+        prompt = TEST_PROMPTS_FULL[index]
+        final, history = run_paper_search_chat(prompt, user_proxy, assistant)
+        started = time.perf_counter()
+        facts = compute_prescore_facts(prompt, final, history)
+        elapsed += time.perf_counter() - started
+        cases.append({"prompt": prompt})
+        verdicts.append(facts.verdict)
+        print(f"[{facts.verdict}] {prompt}\n    {facts.verdict_reason}")
+    return {"mode": "live", **_summarize(cases, verdicts, elapsed, 1)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure how many critic LLM calls the rule-based pre-scorer avoids.")
+    parser.add_argument("--iterations", type=int, default=100, help="Pre-scorer iterations over the synthetic transcripts.")
+    parser.add_argument("--live", action="store_true", help="Also run the agent against Mistral and Semantic Scholar and pre-score the real transcripts.")
+    parser.add_argument("--prompts", type=int, nargs="*", default=None, help="Prompt indices for --live (default: all).")
+    args = parser.parse_args()
+
+    results = {"synthetic": benchmark_synthetic(args.iterations)}
+    if args.live:
+        results["live"] = benchmark_live(args.prompts if args.prompts is not None else list(range(len(TEST_PROMPTS_FULL))))
+    print(json.dumps(results, indent=2))
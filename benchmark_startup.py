@@ -0,0 +1,83 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+DEFAULT_RUNS = 5
+# Modules that must not be imported just to run a search (each costs seconds or ~100 ms)
+HEAVY_MODULES = ("autogen", "openai", "mistralai", "httpx", "asyncio", "dotenv")
+
+# What each scenario runs in a fresh interpreter. "tool_search" is a full tool-only search
+# against an empty local index, so it measures startup without any network time.
+STARTUP_SCENARIOS = {
+    "import_research_tools": "import research_tools",
+    "import_main_agent": "import main_agent",
+    "import_evaluation": "import evaluation",
+    "import_run_evaluation_suite": "import run_evaluation_suite",
+    "tool_search": "import research_tools; research_tools.search_research_papers(topic='graph neural networks', limit=3)",
+}
+
+
+# Parses `python -X importtime` output into {module: (self_us, cumulative_us, depth)}.
+def _parse_importtime(stderr: str) -> dict:
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        modules[name.strip()] = (int(self_us), int(cumulative_us), depth)
+    return modules
+
+
+def _run_once(code: str, env: dict) -> tuple[float, dict]:
+    # The interpreter's own clock, so process spawn overhead is left out
+    wrapped = f"import time; _started = time.perf_counter()\n{code}\nprint(time.perf_counter() - _started)"
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", wrapped], capture_output=True, text=True, env=env, cwd=os.path.dirname(os.path.abspath(__file__)))
+    if result.returncode != 0:
+        raise RuntimeError(f"Startup scenario failed:\n{result.stderr[-2000:]}")
+    return float(result.stdout.strip().splitlines()[-1]), _parse_importtime(result.stderr)
+
+
+def benchmark_scenario(code: str, runs: int, env: dict, top: int = 5) -> dict:
+    timings, modules = [], {}
+    for _ in range(runs):
+        seconds, modules = _run_once(code, env)
+        timings.append(seconds)
+    top_level = sorted(((name, cumulative) for name, (_, cumulative, depth) in modules.items() if depth == 1), key=lambda item: -item[1])
+    return {
+        "runs": runs,
+        "min_ms": round(min(timings) * 1000, 1),
+        "median_ms": round(statistics.median(timings) * 1000, 1),
+        "imported_modules": len(modules),
+        "heavy_modules_imported": [name for name in HEAVY_MODULES if name in modules],
+        "slowest_top_level_imports_ms": {name: round(cumulative / 1000, 1) for name, cumulative in top_level[:top]},
+    }
+
+
+def benchmark_startup(scenarios: list, runs: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        env = {
+            **os.environ,
+            "S2_SEARCH_BACKEND": "local",
+            "LOCAL_PAPER_INDEX_PATH": os.path.join(tmp, "paper_index.db"),
+            "S2_CACHE_DISABLED": "1",
+        }
+        return {name: benchmark_scenario(STARTUP_SCENARIOS[name], runs, env) for name in scenarios}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cold-start time of the CLI entry points, measured in fresh interpreters with -X importtime.")
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS, help="Fresh interpreters per scenario.")
+    parser.add_argument("--scenarios", nargs="*", choices=list(STARTUP_SCENARIOS), default=list(STARTUP_SCENARIOS))
+    parser.add_argument("--max-ms", type=float, default=None, help="Exit with 1 if the tool_search median is above this.")
+    args = parser.parse_args()
+
+    results = benchmark_startup(args.scenarios, args.runs)
+    print(json.dumps(results, indent=2))
+    tool_search = results.get("tool_search")
+    if args.max_ms is not None and tool_search and tool_search["median_ms"] > args.max_ms:
+        sys.exit(1)
@@ -0,0 +1,254 @@
+import json
+import os
+import threading
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+import httpx
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from response_cache import make_cache_key
+
+# Record/replay of every LLM completion and Semantic Scholar HTTP exchange.
+# Enable with CASSETTE_MODE=record|replay (and optionally CASSETTE_PATH) before running the suite.
+CASSETTE_MODES = ("record", "replay")
+DEFAULT_CASSETTE_PATH = os.path.join(".cache", "cassettes", "evaluation.jsonl")
+# Request fields that differ between machines but do not change the response
+LLM_KEY_EXCLUDED_PARAMS = ("api_key",)
+# Dropped from replayed responses because the stored body is already decoded
+_HOP_HEADERS = ("content-encoding", "content-length", "transfer-encoding", "connection")
+
+
+class CassetteMissError(RuntimeError):
+    pass
+
+
+class Cassette:
+    """
+    JSONL file of recorded exchanges, one line per request/response pair.
+
+    Entries are matched by a hash of the request (method + normalized URL for HTTP,
+    completion params for the LLM). Identical requests are replayed in recording order,
+    and the last response is repeated once the recorded ones run out.
+
+    A recording starts from an empty file unless resume is set (worker processes append
+    to the recording their parent started).
+    """
+
+    def __init__(self, path: str = DEFAULT_CASSETTE_PATH, mode: str = "replay", resume: bool = False):
+        if mode not in CASSETTE_MODES:
+            raise ValueError(f"Unknown cassette mode '{mode}'. Valid modes: {list(CASSETTE_MODES)}")
+        self.path = path
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._positions = {}
+        self._stats = {"recorded": 0, "replayed": 0, "misses": 0}
+
+        if mode == "replay":
+            self._load()
+        elif not resume:
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            open(path, "w").close()  # a recording always starts from an empty cassette
+
+    def _load(self) -> None:
+        if not os.path.exists(self.path):
+            raise FileNotFoundError(f"No cassette at {self.path}. Record one first with CASSETTE_MODE=record.")
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                entry = json.loads(line)
+                self._entries.setdefault((entry["kind"], entry["key"]), []).append(entry["response"])
+
+    def record(self, kind: str, key: str, request, response) -> None:
+        line = json.dumps({"kind": kind, "key": key, "request": request, "response": response}, ensure_ascii=False, default=str)
+        with self._lock:
+            # Appends of one line are not interleaved, so worker processes can share the file
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+            self._stats["recorded"] += 1
+
+    def replay(self, kind: str, key: str):
+        with self._lock:
+            responses = self._entries.get((kind, key))
+            if not responses:
+                self._stats["misses"] += 1
+                raise CassetteMissError(f"No recorded {kind} response for request {key[:12]} in {self.path}")
+            position = self._positions.get((kind, key), 0)
+            self._positions[(kind, key)] = position + 1
+            self._stats["replayed"] += 1
+            return responses[min(position, len(responses) - 1)]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"mode": self.mode, "path": self.path, **self._stats}
+
+    def wrap_adapter(self, adapter: BaseAdapter) -> BaseAdapter:
+        return CassetteAdapter(self, adapter)
+
+    def wrap_async_transport(self, transport: httpx.AsyncBaseTransport) -> httpx.AsyncBaseTransport:
+        return CassetteAsyncTransport(self, transport)
+
+
+# Query parameters are sorted so the key does not depend on their order in the URL.
+def _http_key(method: str, url: str) -> str:
+    parts = urlsplit(str(url))
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return make_cache_key({"method": method.upper(), "url": urlunsplit((parts.scheme, parts.netloc, parts.path, query, ""))})
+
+
+def _replay_headers(headers: dict) -> dict:
+    return {name: value for name, value in headers.items() if name.lower() not in _HOP_HEADERS}
+
+
+class CassetteAdapter(BaseAdapter):
+    """requests transport adapter that records through, or replays instead of, the wrapped adapter."""
+
+    def __init__(self, cassette: Cassette, inner: BaseAdapter):
+        super().__init__()
+        self.cassette = cassette
+        self.inner = inner
+
+    def send(self, request, **kwargs) -> requests.Response:
+        key = _http_key(request.method, request.url)
+        if self.cassette.mode == "replay":
+            recorded = self.cassette.replay("http", key)
+            response = requests.Response()
+            response.status_code = recorded["status"]
+            response.headers = CaseInsensitiveDict(_replay_headers(recorded["headers"]))
+            response._content = recorded["body"].encode("utf-8")
+            response.encoding = "utf-8"
+            response.url = request.url
+            response.request = request
+            return response
+
+        response = self.inner.send(request, **kwargs)
+        self.cassette.record(
+            "http", key,
+            {"method": request.method, "url": request.url},
+            {"status": response.status_code, "headers": dict(response.headers), "body": response.text},
+        )
+        return response
+
+    def close(self) -> None:
+        self.inner.close()
+
+
+class CassetteAsyncTransport(httpx.AsyncBaseTransport):
+    """httpx equivalent of CassetteAdapter for S2Client.aget."""
+
+    def __init__(self, cassette: Cassette, inner: httpx.AsyncBaseTransport):
+        self.cassette = cassette
+        self.inner = inner
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        key = _http_key(request.method, str(request.url))
+        if self.cassette.mode == "replay":
+            recorded = self.cassette.replay("http", key)
+            return httpx.Response(
+                recorded["status"],
+                headers=_replay_headers(recorded["headers"]),
+                content=recorded["body"].encode("utf-8"),
+                request=request,
+            )
+
+        response = await self.inner.handle_async_request(request)
+        await response.aread()
+        self.cassette.record(
+            "http", key,
+            {"method": request.method, "url": str(request.url)},
+            {"status": response.status_code, "headers": dict(response.headers), "body": response.text},
+        )
+        return response
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
+
+
+_active_cassette = None
+_original_creates = {}
+
+
+def _llm_request(params: dict) -> dict:
+    return {name: value for name, value in params.items() if name not in LLM_KEY_EXCLUDED_PARAMS}
+
+
+def _cassette_create(original_create):
+    def create(client_self, params):
+        from openai.types.chat import ChatCompletion
+
+        request = _llm_request(params)
+        key = make_cache_key(request)
+        if _active_cassette.mode == "replay":
+            return ChatCompletion.model_validate(_active_cassette.replay("llm", key))
+        response = original_create(client_self, params)
+        _active_cassette.record("llm", key, request, response.model_dump())
+        return response
+    return create
+
+
+def _llm_client_classes() -> list:
+    # The autogen model clients LLM_CONFIG can resolve to; each returns an OpenAI ChatCompletion
+    from autogen.oai.client import OpenAIClient
+    from autogen.oai.mistral import MistralAIClient
+    from streaming import StreamingMistralClient
+    return [MistralAIClient, StreamingMistralClient, OpenAIClient]
+
+
+def install_cassette(cassette: Cassette) -> Cassette:
+    """
+    Routes LLM completions and S2 requests through the cassette for the rest of the process.
+    The S2 and critic caches are turned off so every exchange is actually recorded or
+    replayed; call this before they are first used.
+
+    The mode and path are also exported as CASSETTE_MODE / CASSETTE_PATH. Worker processes
+    do not inherit the patched clients under the spawn start method, so they have to call
+    install_cassette_from_env(resume=True) themselves (forked workers keep this one).
+    """
+    global _active_cassette
+    from s2_client import configure_s2_client
+    from s2_rate_limit import S2RateLimiter
+
+    if _active_cassette is not None:
+        uninstall_cassette()
+    _active_cassette = cassette
+    for client_class in _llm_client_classes():
+        _original_creates[client_class] = client_class.create
+        client_class.create = _cassette_create(client_class.create)
+
+    os.environ["S2_CACHE_DISABLED"] = "1"
+    os.environ["CRITIC_CACHE_DISABLED"] = "1"
+    os.environ["CASSETTE_MODE"] = cassette.mode
+    os.environ["CASSETTE_PATH"] = cassette.path
+    # Replayed requests never reach the network, so they do not need the shared rate limit
+    configure_s2_client(rate_limiter=None if cassette.mode == "replay" else S2RateLimiter(), cassette=cassette)
+    return cassette
+
+
+def uninstall_cassette() -> None:
+    global _active_cassette
+    from s2_client import configure_s2_client
+
+    for client_class, original_create in _original_creates.items():
+        client_class.create = original_create
+    _original_creates.clear()
+    _active_cassette = None
+    os.environ.pop("CASSETTE_MODE", None)
+    os.environ.pop("CASSETTE_PATH", None)
+    configure_s2_client()
+
+
+# Installs a cassette if CASSETTE_MODE is set. Returns it, or None when recording/replay is off.
+# resume=True is for worker processes: a recording is appended to instead of restarted, and a
+# cassette inherited through fork is kept as is.
+def install_cassette_from_env(resume: bool = False) -> Cassette | None:
+    mode = os.getenv("CASSETTE_MODE", "").lower()
+    if not mode:
+        return None
+    path = os.getenv("CASSETTE_PATH", DEFAULT_CASSETTE_PATH)
+    if resume and _active_cassette is not None and (_active_cassette.mode, _active_cassette.path) == (mode, path):
+        return _active_cassette
+    return install_cassette(Cassette(path, mode, resume=resume))
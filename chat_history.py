@@ -0,0 +1,115 @@
+import json
+from dataclasses import dataclass
+
+TOOL_RESPONSE_PREFIX = "***** Response from calling tool"
+NO_HISTORY_TEXT = "No conversation history provided."
+NEWLINE = "\n"
+
+
+def split_message(msg: dict) -> tuple[str, list]:
+    """
+    Returns (kind, payload) for one chat message: ("tool_call", [tool_call dicts]),
+    ("tool_response", [result strings]) or ("text", [content]). Handles autogen's message
+    dicts as well as tool calls/responses serialized into the content string.
+    """
+    if msg.get("tool_calls"):
+        return "tool_call", list(msg["tool_calls"])
+    if msg.get("tool_responses"):
+        return "tool_response", [str(response.get("content", "")) for response in msg["tool_responses"]]
+
+    content = msg.get("content")
+    if isinstance(content, str) and content.lstrip().startswith("[{"):
+        try:
+            content = json.loads(content)
+        except json.JSONDecodeError:
+            pass
+    if isinstance(content, list) and content and isinstance(content[0], dict):
+        if "tool_calls" in content[0]:
+            return "tool_call", list(content[0]["tool_calls"])
+        if "tool_call_id" in content[0]:
+            return "tool_response", [str(item.get("content", "")) for item in content]
+
+    if msg.get("role") == "tool" or (isinstance(content, str) and content.startswith(TOOL_RESPONSE_PREFIX)):
+        return "tool_response", [str(content)]
+    return "text", ["" if content is None else str(content)]
+
+
+@dataclass(slots=True)
+class HistoryMessage:
+    """One chat message, classified once when the history is built."""
+    sender: str  # "NAME (role)" or "ROLE", as shown to the critic
+    name: str | None
+    kind: str  # "text", "tool_call" or "tool_response"
+    payload: list  # [text], tool_call dicts or tool result strings
+
+    @classmethod
+    def from_message(cls, msg: dict) -> "HistoryMessage":
+        kind, payload = split_message(msg)
+        role = msg.get("role", "unknown_role")
+        name = msg.get("name")
+        return cls(
+            sender=role.upper() if not name or name == role else f"{name} ({role})",
+            name=name,
+            kind=kind,
+            payload=payload,
+        )
+
+    @property
+    def text(self) -> str:
+        return self.payload[0] if self.kind == "text" else ""
+
+    # The message as it appears in the full (uncompacted) critic transcript.
+    def transcript_text(self) -> str:
+        if self.kind == "tool_call":
+            return f"ASSISTANT_SUGGESTS_TOOL_CALL: {json.dumps(self.payload)}"
+        if self.kind == "tool_response":
+            return "TOOL_RESPONSE:\n" + "\n".join(self.payload)
+        return self.payload[0]
+
+
+class ChatHistory(list):
+    """
+    A chat's message dicts (it is still the plain list autogen produced, so it can be
+    indexed, pickled and JSON-encoded as before) plus a HistoryMessage per message in
+    `records`. Final-response extraction, the prescorer, critic formatting and the JSONL
+    export all read the records instead of re-classifying the raw dicts.
+
+    It is a snapshot: appending to it does not update the records.
+    """
+
+    __slots__ = ("records",)
+
+    def __init__(self, messages=(), records: list = None):
+        super().__init__(messages)
+        self.records = records if records is not None else [HistoryMessage.from_message(msg) for msg in self]
+
+    def snapshot(self) -> "ChatHistory":
+        """Copies the message dicts (e.g. before the agents are reset) and shares the classification."""
+        return ChatHistory([dict(msg) for msg in self], records=self.records)
+
+    def final_response(self, assistant_name: str) -> str | None:
+        """Text of the assistant's last non-empty text message, or None."""
+        for record in reversed(self.records):
+            if record.kind == "text" and record.name == assistant_name and record.text.strip():
+                return record.text
+        return None
+
+    def format_transcript(self) -> str:
+        if not self.records:
+            return NO_HISTORY_TEXT
+        return "\n".join(
+            f"FROM {record.sender}:\n{record.transcript_text().replace(NEWLINE, ' <NEWLINE> ')}\n-----------------------------"
+            for record in self.records
+        )
+
+    def to_jsonl(self) -> str:
+        """One JSON line per message: the original dict plus its sender and kind."""
+        return "\n".join(
+            json.dumps({"sender": record.sender, "kind": record.kind, **msg}, default=str) for record, msg in zip(self.records, self)
+        )
+
+
+def as_chat_history(conversation_history: list) -> ChatHistory:
+    if isinstance(conversation_history, ChatHistory):
+        return conversation_history
+    return ChatHistory(conversation_history or [])
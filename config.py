@@ -1,29 +1,45 @@
 import os
-from dotenv import load_dotenv
-
-load_dotenv()
-
-mistral_api_key = os.getenv("MISTRAL_API_KEY")
-
-if not mistral_api_key:
-    raise ValueError("MISTRAL_API_KEY not found in .env file or environment variables.")
-
-LLM_CONFIG = {
-    "config_list": [
-        {
-            "model": "open-mistral-nemo",
-            "api_key": mistral_api_key,
-            "api_type": "mistral",
-            "api_rate_limit": 0.1,      
-            "repeat_penalty": 1.1,     
-            "temperature": 0.0,        
-            "seed": 42,                
-            "stream": False,           
-            "native_tool_calls": False,
-            "cache_seed": None,        
-        }
-    ],
-}
+from functools import lru_cache
+
+
+# Built on first use, so importing this module (e.g. for a tool-only search) neither
+# reads .env nor requires MISTRAL_API_KEY. `from config import LLM_CONFIG` still works.
+@lru_cache(maxsize=None)
+def get_llm_config() -> dict:
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    mistral_api_key = os.getenv("MISTRAL_API_KEY")
+
+    # Replaying a cassette (see cassette.py) never reaches Mistral, so no real key is needed
+    if not mistral_api_key and os.getenv("CASSETTE_MODE", "").lower() == "replay":
+        mistral_api_key = "cassette-replay"
+
+    if not mistral_api_key:
+        raise ValueError("MISTRAL_API_KEY not found in .env file or environment variables.")
+
+    return {
+        "config_list": [
+            {
+                "model": "open-mistral-nemo",
+                "api_key": mistral_api_key,
+                "api_type": "mistral",
+                "api_rate_limit": 0.1,      
+                "repeat_penalty": 1.1,     
+                "temperature": 0.0,        
+                "seed": 42,                
+                "stream": False,           
+                "native_tool_calls": False,
+                "cache_seed": None,        
+            }
+        ],
+    }
+
+
+def __getattr__(name: str):
+    if name == "LLM_CONFIG":
+        return get_llm_config()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 '''
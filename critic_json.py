@@ -0,0 +1,185 @@
+import json
+import logging
+import re
+import threading
+from collections import Counter
+
+try:
+    import orjson  # optional; a few times faster than json for the strict tier
+except ImportError:
+    orjson = None
+
+# Parses the critic's JSON reply in tiers, cheapest first. Most replies are valid JSON and
+# are done after the first json.loads; repair_json is only run for genuinely broken output.
+#   strict    - the reply as is
+#   fenced    - the body of a ```json ... ``` block
+#   extracted - the first balanced {...} / [...] in the reply (text before or after it)
+#   repaired  - fix_busted_json.repair_json on that {...} (or the whole reply if there is none)
+PARSE_TIERS = ("strict", "fenced", "extracted", "repaired", "failed")
+SCORE_FIELDS = (
+    "completeness_score",
+    "quality_accuracy_score",
+    "robustness_score",
+    "tool_usage_score",
+    "efficiency_conciseness_score",
+)
+SCORE_RANGE = (1, 5)
+
+logger = logging.getLogger(__name__)
+
+_FENCE_RE = re.compile(r"```(?:json)?\s*([\s\S]*?)\s*```", re.IGNORECASE)
+_tier_counts = Counter()
+_tier_counts_lock = threading.Lock()
+
+
+class CriticJsonError(ValueError):
+    pass
+
+
+def _loads(text: str):
+    if orjson is not None:
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError as e:
+            raise json.JSONDecodeError(str(e), text, 0) from None
+    return json.loads(text)
+
+
+# The first complete top-level JSON object or array in text, found by bracket matching outside strings.
+def _extract_balanced(text: str) -> str | None:
+    starts = [position for position in (text.find("{"), text.find("[")) if position != -1]
+    if not starts:
+        return None
+    start = min(starts)
+    closers = {"{": "}", "[": "]"}
+    stack = []
+    in_string = escaped = False
+    for position in range(start, len(text)):
+        char = text[position]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == "\\":
+                escaped = True
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char in closers:
+            stack.append(closers[char])
+        elif stack and char == stack[-1]:
+            stack.pop()
+            if not stack:
+                return text[start:position + 1]
+    return None
+
+
+def _count(tier: str) -> None:
+    with _tier_counts_lock:
+        _tier_counts[tier] += 1
+
+
+def parse_critic_json(text: str, repair: bool = True) -> tuple:
+    """
+    Returns (parsed_value, tier) for a critic reply; tier is one of PARSE_TIERS.
+    Raises CriticJsonError (tier "failed") if no tier produces JSON.
+    """
+    stripped = (text or "").strip()
+    try:
+        value = _loads(stripped)
+        _count("strict")
+        return value, "strict"
+    except json.JSONDecodeError:
+        pass
+
+    if "```" in stripped:
+        match = _FENCE_RE.search(stripped)
+        if match:
+            stripped = match.group(1).strip()
+            try:
+                value = _loads(stripped)
+                _count("fenced")
+                return value, "fenced"
+            except json.JSONDecodeError:
+                pass
+
+    candidate = _extract_balanced(stripped)
+    if candidate is not None:
+        try:
+            value = _loads(candidate)
+            _count("extracted")
+            return value, "extracted"
+        except json.JSONDecodeError:
+            pass
+
+    if repair:
+        from fix_busted_json import repair_json  # only needed for broken replies
+        from stage_metrics import stage_timer
+
+        try:
+            with stage_timer("critic_json_repair"):
+                value = json.loads(repair_json(candidate if candidate is not None else stripped))
+            _count("repaired")
+            return value, "repaired"
+        except Exception as e:  # repair_json raises its own error types on hopeless input
+            logger.debug("repair_json failed: %s", e)
+
+    _count("failed")
+    raise CriticJsonError("Critic reply is not valid JSON, even after repair.")
+
+
+def validate_critic_scores(evaluation: dict) -> list:
+    """
+    Checks the five *_score fields: present and an integer in SCORE_RANGE. Integral floats and
+    digit strings ("4") are converted in place. Returns a list of problems (empty if valid).
+    """
+    problems = []
+    low, high = SCORE_RANGE
+    for field in SCORE_FIELDS:
+        score = evaluation.get(field)
+        if isinstance(score, float) and score.is_integer():
+            score = int(score)
+        elif isinstance(score, str) and score.strip().isdigit():
+            score = int(score.strip())
+        if score is None:
+            problems.append(f"{field} is missing")
+        elif isinstance(score, bool) or not isinstance(score, int):
+            problems.append(f"{field} is not an integer: {score!r}")
+        elif not low <= score <= high:
+            problems.append(f"{field} is outside {low}-{high}: {score}")
+        else:
+            evaluation[field] = score
+    return problems
+
+
+def critic_parse_stats() -> dict:
+    """Replies parsed per tier since start (or the last reset), plus the share that needed no repair."""
+    with _tier_counts_lock:
+        counts = {tier: _tier_counts[tier] for tier in PARSE_TIERS}
+    total = sum(counts.values())
+    return {**counts, "total": total, "no_repair_rate": round((total - counts["repaired"] - counts["failed"]) / total, 3) if total else None}
+
+
+def reset_critic_parse_stats() -> None:
+    with _tier_counts_lock:
+        _tier_counts.clear()
+
+
+if __name__ == "__main__":
+    import time
+
+    valid = json.dumps({field: 4 for field in SCORE_FIELDS} | {"overall_assessment": "Good.", "positive_feedback": "Called the tool.", "areas_for_improvement": "None."})
+    samples = {
+        "strict": valid,
+        "fenced": f"```json\n{valid}\n```",
+        "extracted": f"Here is my evaluation:\n{valid}\nHope this helps!",
+        "repaired": "Evaluation: " + valid.replace('"Good."', "'Good.'").replace("}", ",}"),
+    }
+    iterations = 2000
+    for name, sample in samples.items():
+        started = time.perf_counter()
+        for _ in range(iterations):
+            value, tier = parse_critic_json(sample)
+        elapsed_us = (time.perf_counter() - started) / iterations * 1e6
+        print(f"{name:>9}: tier={tier}, {elapsed_us:.1f} us/parse, score problems: {validate_critic_scores(value)}")
+    print(f"Tier counts: {critic_parse_stats()}")
@@ -1,10 +1,14 @@
-import autogen
-from autogen.agentchat import AssistantAgent
-from config import LLM_CONFIG
+from config import get_llm_config
 import json
-from fix_busted_json import repair_json
-import traceback
-import re
+import logging
+import os
+from critic_json import CriticJsonError, parse_critic_json, validate_critic_scores
+from response_cache import ResponseCache, make_cache_key
+from chat_history import as_chat_history
+from history_compaction import CRITIC_HISTORY_TOKEN_BUDGET, compact_history, count_tokens, format_compacted_history
+from prescorer import compute_prescore_facts, format_facts_for_critic, rule_based_evaluation, settles_without_critic
+from stage_metrics import stage_timer
+from tracing import configure_logging, span, trace_llm_client
 
 CRITIC_AGENT_NAME = "PaperSearchCriticAgent"
 
@@ -14,7 +18,12 @@ the 'PaperSearchAssistant', which is designed to find research papers using a to
 You will be given:
 1. The original 'User Prompt' given to the PaperSearchAssistant.
 2. The 'Agent's Final Response' (the last user-facing message from PaperSearchAssistant).
-3. The full 'Conversation History' between the User Proxy and the PaperSearchAssistant.
+3. The 'Conversation History' between the User Proxy and the PaperSearchAssistant. It is compacted: tool results
+   are summarized as paper count, year range, citation range and titles, and identical consecutive messages or
+   retried tool calls are shown once with a '[repeated Nx]' marker.
+4. Usually, 'Verified Facts' computed deterministically from the history (tool calls, returned papers checked
+   against the prompt's year/citation constraints, turn count, termination). Treat these as ground truth and do
+   not contradict them; use your judgement for everything they do not cover.
 
 Based on this information, evaluate the PaperSearchAssistant's performance according to the following criteria,
 providing a score from 1 (Poor) to 5 (Excellent) for each:
@@ -51,55 +60,90 @@ Focus your evaluation solely on the provided prompt, response, and history. Do n
 Be objective and fair. Ensure your output is a single, valid JSON object.
 """
 
-critic_llm_config = LLM_CONFIG.copy()
-
-critic_agent = AssistantAgent(
-    name=CRITIC_AGENT_NAME,
-    llm_config=critic_llm_config,
-    system_message=CRITIC_SYSTEM_MESSAGE
-)
+logger = logging.getLogger(__name__)
+
+# Critic results are memoized on disk (set CRITIC_CACHE_DISABLED=1 to bypass).
+# Only safe because LLM_CONFIG pins temperature 0 and a seed.
+CRITIC_CACHE_PATH = os.path.join(".cache", "critic", "cache.db")
+CRITIC_CACHE_TTL_SECONDS = 30 * 24 * 60 * 60
+CRITIC_CACHE_MAX_MEMORY_ENTRIES = 128
+CRITIC_CACHE_MAX_DISK_ENTRIES = 2000
+
+# Batched critic mode: several transcripts share one request (and one copy of the system message)
+CRITIC_BATCH_TOKEN_BUDGET = 6000
+# Clear failures (see prescorer.CRITIC_SKIPPING_VERDICTS) are scored by rules instead of the LLM critic
+PRESCORER_SKIPS_CRITIC = True
+
+_critic_agent = None
+_critic_cache = None
+
+# The critic (and autogen with it) is only built once a transcript actually needs the LLM,
+# so pre-scored runs and imports for the constants stay cheap.
+def get_critic_agent():
+    global _critic_agent
+    if _critic_agent is None:
+        from autogen.agentchat import AssistantAgent
+
+        _critic_agent = AssistantAgent(
+            name=CRITIC_AGENT_NAME,
+            llm_config=get_llm_config().copy(),
+            system_message=CRITIC_SYSTEM_MESSAGE
+        )
+        trace_llm_client(_critic_agent, "critic")
+    return _critic_agent
+
+# Kept for code that still imports critic_agent / critic_llm_config directly.
+def __getattr__(name: str):
+    if name == "critic_agent":
+        return get_critic_agent()
+    if name == "critic_llm_config":
+        return get_llm_config()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def get_critic_cache() -> ResponseCache:
+    global _critic_cache
+    if _critic_cache is None:
+        _critic_cache = ResponseCache(
+            CRITIC_CACHE_PATH,
+            ttl_seconds=CRITIC_CACHE_TTL_SECONDS,
+            max_memory_entries=CRITIC_CACHE_MAX_MEMORY_ENTRIES,
+            max_disk_entries=CRITIC_CACHE_MAX_DISK_ENTRIES,
+            enabled=os.getenv("CRITIC_CACHE_DISABLED", "").lower() not in ("1", "true", "yes"),
+        )
+    return _critic_cache
+
+# Fingerprint of one critic evaluation: the single-case request prompt plus everything else the critic sees.
+# Batched cases are keyed by the prompt they would have on their own, so both paths share entries.
+def _critic_cache_key(critic_request_prompt: str) -> str:
+    critic_config = [
+        {key: value for key, value in config.items() if key != "api_key"}
+        for config in get_llm_config()["config_list"]
+    ]
+    return make_cache_key({
+        "system_message": CRITIC_SYSTEM_MESSAGE,
+        "config": critic_config,
+        "prompt": critic_request_prompt,
+    })
 
 
 # Formats the conversation history for inclusion in the critic's prompt.
-def format_history_for_critic(conversation_history: list) -> str:
-    formatted_messages = []
-    for msg in conversation_history:
-        role = msg.get("role", "unknown_role")
-        
-        sender_name = msg.get("name")
-        if not sender_name or sender_name == role:
-            sender_display = role.upper()
-        else:
-            sender_display = f"{sender_name} ({role})"
-
-        content = msg.get("content", "")
-        content_str = ""
-
-        if isinstance(content, str):
-            if content.startswith("***** Response from calling tool"):
-                content_str = f"TOOL_RESPONSE:\n{content}"
-            else:
-                content_str = content
-        elif isinstance(content, list) and content and isinstance(content[0], dict) and "tool_calls" in content[0]:
-            content_str = f"ASSISTANT_SUGGESTS_TOOL_CALL: {json.dumps(content[0]['tool_calls'])}"
-
-        else:
-            content_str = str(content)
-
-        content_str_oneline = content_str.replace("\n", " <NEWLINE> ")
-        formatted_messages.append(f"FROM {sender_display}:\n{content_str_oneline}\n-----------------------------")
-    
-    return "\n".join(formatted_messages) if formatted_messages else "No conversation history provided."
-
+# With a token_budget the history is compacted (see history_compaction.py); None gives the full transcript.
+def format_history_for_critic(conversation_history: list, token_budget: int | None = CRITIC_HISTORY_TOKEN_BUDGET) -> str:
+    history = as_chat_history(conversation_history)
+    if token_budget is not None:
+        return format_compacted_history(compact_history(history, token_budget))
+    return history.format_transcript()
 
-# Uses the LLM Critic agent to evaluate the paper search agent's response.
-def evaluate_agent_response(user_prompt: str, agent_final_response: str, conversation_history: list) -> dict:
-    history_str = format_history_for_critic(conversation_history)
 
-    if not isinstance(agent_final_response, str):
-        agent_final_response = str(agent_final_response)
+# The prompt/response/history block the critic sees for one transcript.
+def _critic_case_sections(user_prompt: str, agent_final_response: str, history_str: str, facts_str: str = None) -> str:
+    facts_section = f"""
 
-    critic_request_prompt = f"""User Prompt to PaperSearchAssistant:
+Verified Facts (computed deterministically from the history, treat as ground truth):
+==========================================================================
+{facts_str}
+==========================================================================""" if facts_str else ""
+    return f"""User Prompt to PaperSearchAssistant:
 ====================================
 {user_prompt}
 ====================================
@@ -112,16 +156,58 @@ PaperSearchAssistant's Final User-Facing Response:
 Full Conversation History (between UserQueryProxy and PaperSearchAssistant):
 ==========================================================================
 {history_str}
-==========================================================================
+=========================================================================={facts_section}"""
+
+
+# The critic request for a single case.
+def _critic_request_prompt(case_sections: str) -> str:
+    return f"""{case_sections}
 
 Please provide your evaluation as a single, valid JSON object based on the criteria outlined in your system message.
 Do not include any explanatory text before or after the JSON object itself.
 """
 
-    print(f"\n🔍 Critic evaluating response for prompt: '{user_prompt[:50]}...'")
-    critic_response_message = critic_agent.generate_reply(
-        messages=[{"role": "user", "content": critic_request_prompt}]
-    )
+
+# Uses the LLM Critic agent to evaluate the paper search agent's response.
+def evaluate_agent_response(user_prompt: str, agent_final_response: str, conversation_history: list, use_cache: bool = True, use_prescorer: bool = True) -> dict:
+    with span("critic.evaluate", prompt=user_prompt[:80]) as critic_span:
+        evaluation = _evaluate_agent_response(user_prompt, agent_final_response, conversation_history, use_cache, use_prescorer, critic_span)
+        critic_span.set_attribute("parse_ok", isinstance(evaluation, dict) and "error" not in evaluation)
+        return evaluation
+
+
+def _evaluate_agent_response(user_prompt: str, agent_final_response: str, conversation_history: list, use_cache: bool, use_prescorer: bool, critic_span) -> dict:
+    if not isinstance(agent_final_response, str):
+        agent_final_response = str(agent_final_response)
+    conversation_history = as_chat_history(conversation_history)  # classified once for the pre-scorer and the critic prompt
+
+    facts = compute_prescore_facts(user_prompt, agent_final_response, conversation_history) if use_prescorer else None
+    if facts is not None:
+        critic_span.set_attribute("prescorer_verdict", facts.verdict)
+    if facts is not None and PRESCORER_SKIPS_CRITIC and settles_without_critic(facts):
+        logger.info("🔍 Pre-scorer settled prompt '%s...' without the critic: %s", user_prompt[:50], facts.verdict)
+        return rule_based_evaluation(facts)
+
+    history_str = format_history_for_critic(conversation_history)
+    facts_str = format_facts_for_critic(facts) if facts is not None else None
+
+    critic_request_prompt = _critic_request_prompt(_critic_case_sections(user_prompt, agent_final_response, history_str, facts_str))
+
+    cache_key = _critic_cache_key(critic_request_prompt)
+    if use_cache:
+        cached_evaluation = get_critic_cache().get(cache_key)
+        if cached_evaluation is not None:
+            critic_span.set_attribute("cache_hit", True)
+            logger.info("🔍 Critic result for prompt '%s...' served from cache", user_prompt[:50])
+            return _with_facts(cached_evaluation, facts)
+
+    prompt_tokens = _estimate_tokens(critic_request_prompt)
+    critic_span.set_attributes(cache_hit=False, prompt_tokens_estimate=prompt_tokens)
+    logger.info("🔍 Critic evaluating response for prompt: '%s...' (~%d tokens)", user_prompt[:50], prompt_tokens)
+    with stage_timer("critic_call"):
+        critic_response_message = get_critic_agent().generate_reply(
+            messages=[{"role": "user", "content": critic_request_prompt}]
+        )
 
     critic_evaluation_str = ""
     if isinstance(critic_response_message, dict) and "content" in critic_response_message:
@@ -129,49 +215,178 @@ Do not include any explanatory text before or after the JSON object itself.
     elif isinstance(critic_response_message, str):
         critic_evaluation_str = critic_response_message
     else:
-         print(f"Warning: Critic response was not in expected format. RAW CRITIC RESPONSE: {critic_response_message}")
+         logger.warning("Critic response was not in expected format. RAW CRITIC RESPONSE: %s", critic_response_message)
          return {"error": "Critic returned unexpected response format", "raw_response": str(critic_response_message)}
 
-    print(f" Critic raw response (full): >>>\n{critic_evaluation_str}\n<<<")
-
-    text_to_parse = critic_evaluation_str.strip()
-    match = re.search(r"```(?:json)?\s*([\s\S]*?)\s*```", critic_evaluation_str, re.IGNORECASE)
-    if match:
-        text_to_parse = match.group(1).strip()
-    else:
-        text_to_parse = critic_evaluation_str.strip()
-    
-    print(f" Text after stripping markdown: >>>\n{text_to_parse}\n<<<")
-
-    repaired_json_str = ""
     try:
-        print(f" String being passed to repair_json: >>>\n{text_to_parse}\n<<<")
-        repaired_json_str = repair_json(text_to_parse)
-        print(f" String after repair_json: >>>\n{repaired_json_str}\n<<<")
-
-        evaluation_json = json.loads(repaired_json_str)
-        return evaluation_json
-
-    except json.JSONDecodeError as e:
-        print(f" Error decoding JSON even after repair_json: {e}")
-        print(f"   Problematic string (after repair_json) was: >>>\n{repaired_json_str}\n<<<")
+        evaluation_json, parse_tier = parse_critic_json(critic_evaluation_str)
+    except CriticJsonError as e:
+        critic_span.set_attribute("parse_tier", "failed")
+        logger.warning(" %s Raw critic response: >>>\n%s\n<<<", e, critic_evaluation_str)
         return {
             "error": "Failed to decode JSON from critic even after repairing",
             "original_raw_response": critic_evaluation_str,
-            "markdown_stripped_response": text_to_parse,
-            "repaired_attempt_response": repaired_json_str,
         }
-    except Exception as e:
-        print(f" An unexpected error occurred during JSON repairing or parsing: {e}")
-        traceback.print_exc()
+    critic_span.set_attribute("parse_tier", parse_tier)
+    if parse_tier != "strict":
+        logger.debug(" Critic reply needed the %s parse tier: >>>\n%s\n<<<", parse_tier, critic_evaluation_str)
+    if not isinstance(evaluation_json, dict):
+        return evaluation_json
+
+    if _scores_valid(evaluation_json) and use_cache:
+        get_critic_cache().set(cache_key, evaluation_json)
+    return _with_facts(evaluation_json, facts)
+
+
+# Checks the score fields; problems are recorded on the evaluation, which is then not cached.
+def _scores_valid(evaluation_json: dict) -> bool:
+    problems = validate_critic_scores(evaluation_json)
+    if problems:
+        logger.warning(" Critic evaluation failed schema validation: %s", "; ".join(problems))
+        evaluation_json["schema_errors"] = problems
+    return not problems
+
+
+# Copy of a critic evaluation with the pre-scorer facts it was given attached.
+def _with_facts(evaluation_json: dict, facts) -> dict:
+    evaluation_json = dict(evaluation_json)
+    if facts is not None:
+        evaluation_json["prescore_facts"] = facts.to_dict()
+    return evaluation_json
+
+
+def _estimate_tokens(text: str) -> int:
+    return count_tokens(text)
+
+
+def _critic_text_from_reply(critic_response_message) -> str | None:
+    if isinstance(critic_response_message, dict) and "content" in critic_response_message:
+        return critic_response_message["content"]
+    if isinstance(critic_response_message, str):
+        return critic_response_message
+    return None
+
+
+# Parses a batched critic reply into {case_id: evaluation}. Returns None if it is unusable.
+def _parse_critic_batch_reply(critic_evaluation_str: str) -> dict | None:
+    try:
+        parsed, _ = parse_critic_json(critic_evaluation_str)
+    except CriticJsonError:
+        return None
+
+    if isinstance(parsed, dict):
+        parsed = parsed.get("evaluations", parsed.get("results"))
+    if not isinstance(parsed, list):
+        return None
+    return {
+        str(item["case_id"]): {key: value for key, value in item.items() if key != "case_id"}
+        for item in parsed
+        if isinstance(item, dict) and "case_id" in item
+    }
+
+
+def _evaluate_critic_batch(batch: list, use_cache: bool, use_prescorer: bool) -> dict:
+    """
+    One critic call for a list of prepared cases. If the reply cannot be parsed or misses
+    cases, the batch is split in half and retried; single cases use evaluate_agent_response.
+    """
+    if len(batch) == 1:
+        case = batch[0]["case"]
+        return {batch[0]["case_id"]: evaluate_agent_response(
+            case["user_prompt"], case["agent_final_response"], case["conversation_history"], use_cache=use_cache, use_prescorer=use_prescorer
+        )}
+
+    case_ids = [item["case_id"] for item in batch]
+    blocks = "\n\n".join(item["block"] for item in batch)
+    critic_request_prompt = f"""You will evaluate {len(batch)} separate transcripts. Evaluate each one independently.
+
+{blocks}
+
+Please provide your evaluations as a single, valid JSON object of the form {{"evaluations": [...]}}, where the array
+holds exactly one object per case, in the order given. Each object must contain "case_id" (one of:
+{", ".join(json.dumps(case_id) for case_id in case_ids)}) and all the fields outlined in your system message.
+Do not include any explanatory text before or after the JSON object itself.
+"""
+
+    prompt_tokens = _estimate_tokens(critic_request_prompt)
+    logger.info("🔍 Critic evaluating a batch of %d transcripts (~%d tokens)", len(batch), prompt_tokens)
+    with span("critic.evaluate_batch", cases=len(batch), prompt_tokens_estimate=prompt_tokens) as batch_span:
+        with stage_timer("critic_call"):
+            critic_response_message = get_critic_agent().generate_reply(
+                messages=[{"role": "user", "content": critic_request_prompt}]
+            )
+        critic_evaluation_str = _critic_text_from_reply(critic_response_message)
+        parsed = _parse_critic_batch_reply(critic_evaluation_str) if critic_evaluation_str else None
+        batch_span.set_attribute("parse_ok", parsed is not None and all(case_id in parsed for case_id in case_ids))
+
+    if parsed is None or any(case_id not in parsed for case_id in case_ids):
+        logger.warning(" Batched critic reply unusable for %d cases, splitting the batch and retrying", len(batch))
+        middle = len(batch) // 2
         return {
-            "error": "Unexpected error during JSON repairing/parsing",
-            "original_raw_response": critic_evaluation_str,
-            "details": str(e)
+            **_evaluate_critic_batch(batch[:middle], use_cache, use_prescorer),
+            **_evaluate_critic_batch(batch[middle:], use_cache, use_prescorer),
         }
 
+    results = {}
+    for item in batch:
+        evaluation_json = parsed[item["case_id"]]
+        if _scores_valid(evaluation_json) and use_cache:
+            get_critic_cache().set(item["cache_key"], evaluation_json)
+        results[item["case_id"]] = _with_facts(evaluation_json, item["facts"])
+    return results
+
+
+def evaluate_agent_responses_batch(cases: list, token_budget: int = CRITIC_BATCH_TOKEN_BUDGET, use_cache: bool = True, use_prescorer: bool = True) -> dict:
+    """
+    Evaluates several transcripts with as few critic calls as possible.
+
+    Each case is a dict with "case_id", "user_prompt", "agent_final_response" and
+    "conversation_history". Cases are packed greedily into requests of at most
+    token_budget estimated tokens. Clear-cut cases are settled by the pre-scorer
+    first. Returns {case_id: evaluation}.
+    """
+    results = {}
+    prepared = []
+    for case in cases:
+        case_id = str(case["case_id"])
+        final_response = str(case["agent_final_response"])
+        history = as_chat_history(case["conversation_history"])
+        facts = compute_prescore_facts(case["user_prompt"], final_response, history) if use_prescorer else None
+        if facts is not None and PRESCORER_SKIPS_CRITIC and settles_without_critic(facts):
+            results[case_id] = rule_based_evaluation(facts)
+            continue
+
+        history_str = format_history_for_critic(history)
+        facts_str = format_facts_for_critic(facts) if facts is not None else None
+        case_sections = _critic_case_sections(case["user_prompt"], final_response, history_str, facts_str)
+        cache_key = _critic_cache_key(_critic_request_prompt(case_sections))
+        block = f"### CASE {case_id}\n{case_sections}"
+        if use_cache:
+            cached_evaluation = get_critic_cache().get(cache_key)
+            if cached_evaluation is not None:
+                results[case_id] = _with_facts(cached_evaluation, facts)
+                continue
+        prepared.append({"case_id": case_id, "case": case, "block": block, "cache_key": cache_key, "facts": facts})
+    if results:
+        logger.info("🔍 %d of %d transcripts settled by the pre-scorer or the critic cache", len(results), len(cases))
+
+    batch, batch_tokens = [], 0
+    for item in prepared:
+        block_tokens = _estimate_tokens(item["block"])
+        if batch and batch_tokens + block_tokens > token_budget:
+            results.update(_evaluate_critic_batch(batch, use_cache, use_prescorer))
+            batch, batch_tokens = [], 0
+        batch.append(item)
+        batch_tokens += block_tokens
+    if batch:
+        results.update(_evaluate_critic_batch(batch, use_cache, use_prescorer))
+
+    return results
+
+
 # Tests for evaluation.py
 if __name__ == "__main__":
+    configure_logging()
     print("--- Testing Critic Agent ---")
     sample_user_prompt = "Find me 2 papers on 'AI ethics' published after 2022."
     sample_agent_response = """
@@ -202,4 +417,17 @@ TERMINATE
     ]
     evaluation_hallucinated = evaluate_agent_response(sample_user_prompt, hallucinated_agent_response, hallucinated_history)
     print("\nCritic's Evaluation (Hallucinated):")
-    print(json.dumps(evaluation_hallucinated, indent=2))
\ No newline at end of file
+    print(json.dumps(evaluation_hallucinated, indent=2))
+
+    # Re-scoring the same transcript should be served from the critic cache
+    print("\n--- Re-testing Critic with the first transcript (cached) ---")
+    evaluate_agent_response(sample_user_prompt, sample_agent_response, sample_history)
+    print(f"Critic cache stats: {get_critic_cache().stats()}")
+
+    # Both transcripts in one critic call
+    print("\n--- Testing Batched Critic ---")
+    batch_evaluations = evaluate_agent_responses_batch([
+        {"case_id": "good", "user_prompt": sample_user_prompt, "agent_final_response": sample_agent_response, "conversation_history": sample_history},
+        {"case_id": "hallucinated", "user_prompt": sample_user_prompt, "agent_final_response": hallucinated_agent_response, "conversation_history": hallucinated_history},
+    ])
+    print(json.dumps(batch_evaluations, indent=2))
\ No newline at end of file
@@ -0,0 +1,182 @@
+import inspect
+import json
+import logging
+import time
+from difflib import SequenceMatcher
+
+# Per-chat limits for the paper search agents. MAX_CONSECUTIVE_AUTO_REPLY in main_agent.py
+# still applies; these stop a looping chat earlier and cap its latency and token cost.
+GOVERNOR_MAX_CHAT_SECONDS = 90.0
+GOVERNOR_MAX_CHAT_TOKENS = 24000
+# Identical tool calls answered from memory before the chat is stopped
+GOVERNOR_MAX_REPEATED_TOOL_CALLS = 1
+# Assistant messages at least this similar to an earlier one count as a loop
+GOVERNOR_NEAR_DUPLICATE_RATIO = 0.9
+
+TERMINATE_KEYWORD = "TERMINATE"
+
+logger = logging.getLogger(__name__)
+
+
+def _call_key(name: str, arguments) -> tuple:
+    if isinstance(arguments, str):
+        try:
+            arguments = json.loads(arguments)
+        except json.JSONDecodeError:
+            return name, arguments
+    return name, json.dumps(arguments, sort_keys=True)
+
+
+def ends_with_terminate(message: dict) -> bool:
+    # Tool-call messages have content None
+    return (message.get("content") or "").rstrip().endswith(TERMINATE_KEYWORD)
+
+
+class ConversationGovernor:
+    """
+    Watches one agent pair's chats and stops them when they loop or run over budget.
+
+    Wire it in with wrap_function_map() (identical tool calls are answered from memory),
+    user_proxy_termination_check / assistant_termination_check as is_termination_msg,
+    and track_llm_client() for the token budget. start() begins a new chat;
+    termination_reason tells why the last one ended.
+    """
+
+    def __init__(
+        self,
+        max_seconds: float = GOVERNOR_MAX_CHAT_SECONDS,
+        max_tokens: int = GOVERNOR_MAX_CHAT_TOKENS,
+        max_repeated_tool_calls: int = GOVERNOR_MAX_REPEATED_TOOL_CALLS,
+        near_duplicate_ratio: float = GOVERNOR_NEAR_DUPLICATE_RATIO,
+    ):
+        self.max_seconds = max_seconds
+        self.max_tokens = max_tokens
+        self.max_repeated_tool_calls = max_repeated_tool_calls
+        self.near_duplicate_ratio = near_duplicate_ratio
+        self.start()
+
+    def start(self) -> None:
+        self.started_at = time.monotonic()
+        self.tokens_used = 0
+        self.repeated_tool_calls = 0
+        self.termination_reason = None
+        self._tool_results = {}
+        self._seen_tool_calls = set()
+        self._assistant_texts = []
+
+    def finish(self) -> str:
+        if self.termination_reason is None:
+            self.termination_reason = "ended_without_terminate"  # auto-reply limit or an empty reply
+        return self.termination_reason
+
+    def _stop(self, reason: str) -> bool:
+        if self.termination_reason is None:
+            self.termination_reason = reason
+            if reason != "terminate_keyword":
+                logger.warning("Stopping chat: %s", reason)
+        return True
+
+    def _budget_exceeded(self) -> str | None:
+        if self.max_seconds is not None and time.monotonic() - self.started_at > self.max_seconds:
+            return "wall_clock_budget"
+        if self.max_tokens is not None and self.tokens_used > self.max_tokens:
+            return "token_budget"
+        return None
+
+    def _is_near_duplicate(self, text: str) -> bool:
+        for earlier in self._assistant_texts:
+            if text == earlier:
+                return True
+            matcher = SequenceMatcher(None, earlier, text, autojunk=False)
+            # The quick ratios are upper bounds of ratio() and rule out most pairs cheaply
+            if matcher.real_quick_ratio() < self.near_duplicate_ratio or matcher.quick_ratio() < self.near_duplicate_ratio:
+                continue
+            if matcher.ratio() >= self.near_duplicate_ratio:
+                return True
+        return False
+
+    def record_tool_calls(self, tool_calls: list) -> bool:
+        """Notes the calls of one assistant message; True if every one of them was made before in this chat."""
+        keys = [_call_key(call["function"]["name"], call["function"].get("arguments")) for call in tool_calls]
+        repeated = all(key in self._seen_tool_calls for key in keys)
+        if repeated:
+            self.repeated_tool_calls += 1
+        self._seen_tool_calls.update(keys)
+        return repeated
+
+    # is_termination_msg for the user proxy, which receives every assistant message.
+    def user_proxy_termination_check(self, message: dict) -> bool:
+        if ends_with_terminate(message):
+            return self._stop("terminate_keyword")
+        budget_reason = self._budget_exceeded()
+        if budget_reason:
+            return self._stop(budget_reason)
+
+        tool_calls = message.get("tool_calls") or []
+        if tool_calls:
+            if self.record_tool_calls(tool_calls) and self.repeated_tool_calls > self.max_repeated_tool_calls:
+                return self._stop("repeated_tool_call")
+            return False
+
+        text = (message.get("content") or "").strip()
+        if text:
+            if self._is_near_duplicate(text):
+                return self._stop("near_duplicate_assistant_message")
+            self._assistant_texts.append(text)
+        return False
+
+    # is_termination_msg for the assistant: keeps it from spending another LLM call once a budget is used up.
+    def assistant_termination_check(self, message: dict) -> bool:
+        budget_reason = self._budget_exceeded()
+        if budget_reason:
+            return self._stop(budget_reason)
+        return (message.get("content") or "").strip() == TERMINATE_KEYWORD
+
+    def wrap(self, name: str, function):
+        if inspect.iscoroutinefunction(function):
+            async def tool(**arguments):
+                key = _call_key(name, arguments)
+                if key in self._tool_results:
+                    logger.info("Answering repeated %s call from memory", name)
+                    return self._tool_results[key]
+                result = await function(**arguments)
+                self._tool_results[key] = result
+                return result
+        else:
+            def tool(**arguments):
+                key = _call_key(name, arguments)
+                if key in self._tool_results:
+                    logger.info("Answering repeated %s call from memory", name)
+                    return self._tool_results[key]
+                result = function(**arguments)
+                self._tool_results[key] = result
+                return result
+
+        tool.__name__ = getattr(function, "__name__", name)
+        tool.__doc__ = function.__doc__
+        return tool
+
+    def wrap_function_map(self, function_map: dict) -> dict:
+        return {name: self.wrap(name, function) for name, function in function_map.items()}
+
+    # Counts the tokens of every completion the agent's client returns.
+    def track_llm_client(self, agent) -> None:
+        original_create = agent.client.create
+
+        def counted_create(*args, **kwargs):
+            response = original_create(*args, **kwargs)
+            usage = getattr(response, "usage", None)
+            if usage is not None:
+                self.tokens_used += usage.total_tokens or 0
+            return response
+
+        agent.client.create = counted_create
+
+    def stats(self) -> dict:
+        return {
+            "termination_reason": self.termination_reason,
+            "elapsed_seconds": round(time.monotonic() - self.started_at, 3),
+            "tokens_used": self.tokens_used,
+            "repeated_tool_calls": self.repeated_tool_calls,
+            "tool_results_memoized": len(self._tool_results),
+        }
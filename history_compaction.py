@@ -0,0 +1,279 @@
+import csv
+import heapq
+import io
+import json
+import time
+from chat_history import NO_HISTORY_TEXT, TOOL_RESPONSE_PREFIX, HistoryMessage, as_chat_history
+
+# The critic only needs to know what the agent asked for and roughly what came back,
+# so the history is squeezed into about this many tokens before it is put in the critic prompt.
+CRITIC_HISTORY_TOKEN_BUDGET = 1500
+CHARS_PER_TOKEN_ESTIMATE = 4
+# Token counts are estimates: the critic runs on Mistral, whose tokenizer is not available
+# locally, so an OpenAI encoding (when tiktoken has it cached) or chars/4 stands in for it.
+TOKENIZER_ENCODING = "cl100k_base"
+MAX_SUMMARY_TITLES = 5
+MAX_TITLE_CHARS = 80
+MIN_MESSAGE_CHARS = 200
+
+_BOILERPLATE_CONTENTS = {"", "none", "null", "continue", "please continue."}
+
+_tokenizer = None
+_tokenizer_loaded = False
+
+
+# tiktoken is optional and downloads its encoding on first use; without it (or offline) we fall back to chars/4.
+def _get_tokenizer():
+    global _tokenizer, _tokenizer_loaded
+    if not _tokenizer_loaded:
+        _tokenizer_loaded = True
+        try:
+            import tiktoken
+            _tokenizer = tiktoken.get_encoding(TOKENIZER_ENCODING)
+        except Exception:
+            _tokenizer = None
+    return _tokenizer
+
+
+def count_tokens(text: str) -> int:
+    """
+    Estimated token count of text: tiktoken's TOKENIZER_ENCODING if it can be loaded, else chars/4.
+    Neither is Mistral's tokenizer, so treat the result as an approximation of the prompt size.
+    """
+    tokenizer = _get_tokenizer()
+    if tokenizer is not None:
+        return len(tokenizer.encode(text, disallowed_special=()))
+    return len(text) // CHARS_PER_TOKEN_ESTIMATE + 1
+
+
+def _shorten(text: str, max_chars: int) -> str:
+    text = " ".join(str(text).split())
+    return text if len(text) <= max_chars else text[:max_chars - 3].rstrip() + "..."
+
+
+def _summarize_papers(papers: list) -> str:
+    years = [paper.get("year") for paper in papers if isinstance(paper.get("year"), int)]
+    citations = [paper.get("citationCount") for paper in papers if isinstance(paper.get("citationCount"), int)]
+    parts = [f"{len(papers)} paper(s)"]
+    if years:
+        parts.append(f"years {min(years)}-{max(years)}")
+    if citations:
+        parts.append(f"citations {min(citations)}-{max(citations)}")
+    titles = [_shorten(paper.get("title", ""), MAX_TITLE_CHARS) for paper in papers[:MAX_SUMMARY_TITLES] if paper.get("title")]
+    summary = ", ".join(parts)
+    if titles:
+        summary += "; titles: " + " | ".join(titles)
+        if len(papers) > len(titles):
+            summary += f" | (+{len(papers) - len(titles)} more)"
+    return summary
+
+
+def _parse_table(text: str) -> list | None:
+    rows = list(csv.DictReader(io.StringIO(text)))
+    if not rows or "title" not in rows[0]:
+        return None
+    for row in rows:
+        for key in ("year", "citationCount"):
+            if (row.get(key) or "").isdigit():
+                row[key] = int(row[key])
+    return rows
+
+
+# Strips autogen's "***** Response from calling tool" banner from a tool result, if present.
+def _strip_tool_banner(content: str) -> str:
+    text = content.strip()
+    if text.startswith(TOOL_RESPONSE_PREFIX):
+        text = text.split("\n", 1)[1].strip() if "\n" in text else ""
+        text = text.rstrip("*").strip()
+    return text
+
+
+def parse_tool_output(content: str) -> dict:
+    """
+    Reads a search tool result (JSON list, CSV table, batch object, error or message).
+    Returns {"papers": list | None, "error": str | None, "message": str | None,
+    "queries": int | None, "text": str}; unrecognised output only has "text" set.
+    """
+    text = _strip_tool_banner(content)
+    result = {"papers": None, "error": None, "message": None, "queries": None, "text": text}
+    try:
+        parsed = json.loads(text)
+    except (json.JSONDecodeError, ValueError):
+        result["papers"] = _parse_table(text) if "\n" in text else None
+        return result
+
+    if isinstance(parsed, list) and all(isinstance(item, dict) for item in parsed):
+        result["papers"] = parsed
+    elif isinstance(parsed, dict):
+        if isinstance(parsed.get("papers"), list):  # search_research_papers_batch
+            result["papers"] = parsed["papers"]
+        if "error" in parsed:
+            result["error"] = str(parsed["error"])
+        if "message" in parsed:
+            result["message"] = str(parsed["message"])
+        if "queries" in parsed:
+            result["queries"] = len(parsed["queries"])
+    return result
+
+
+def summarize_tool_output(content: str) -> str:
+    """
+    Structural summary of a search tool result: paper count, year range, citation range
+    and titles. Errors and messages are kept as-is; anything unrecognised is truncated.
+    """
+    output = parse_tool_output(content)
+    if output["papers"] is not None:
+        summary = _summarize_papers(output["papers"]) if output["papers"] else "0 papers"
+        return summary if output["queries"] is None else f"{summary}; from {output['queries']} queries"
+    if output["error"] is not None:
+        return f"error: {_shorten(output['error'], MIN_MESSAGE_CHARS)}"
+    if output["message"] is not None:
+        return _shorten(output["message"], MIN_MESSAGE_CHARS)
+    return _shorten(output["text"], MIN_MESSAGE_CHARS)
+
+
+def _describe_tool_calls(tool_calls: list) -> str:
+    calls = []
+    for tool_call in tool_calls:
+        function = tool_call.get("function", {})
+        arguments = function.get("arguments", "")
+        if not isinstance(arguments, str):
+            arguments = json.dumps(arguments, separators=(",", ":"))
+        calls.append(f"{function.get('name', '?')}({' '.join(arguments.split())})")
+    return "; ".join(calls)
+
+
+# The compacted text of one classified message.
+def _compact_text(record: HistoryMessage) -> str:
+    if record.kind == "tool_call":
+        return _describe_tool_calls(record.payload)
+    if record.kind == "tool_response":
+        return " || ".join(summarize_tool_output(content) for content in record.payload)
+    return " ".join(record.payload[0].split())
+
+
+def _same_message(first: dict, second: dict) -> bool:
+    return (first["sender"], first["kind"], first["text"]) == (second["sender"], second["kind"], second["text"])
+
+
+def compact_history(conversation_history: list, token_budget: int = CRITIC_HISTORY_TOKEN_BUDGET) -> list:
+    """
+    Returns the history as a list of (sender, kind, text) entries that fit token_budget
+    (in estimated tokens, see count_tokens).
+
+    Tool results become structural summaries, boilerplate messages are dropped and
+    consecutive identical messages (retries) are collapsed into one with a repeat count.
+    If that is still too long, the longest middle messages are truncated and, as a last
+    resort, middle messages are dropped. The first and last messages are always kept,
+    and are only truncated if they alone exceed the budget.
+    """
+    entries = []
+    for record in as_chat_history(conversation_history).records:
+        text = _compact_text(record)
+        if record.kind == "text" and text.lower() in _BOILERPLATE_CONTENTS:
+            continue
+
+        entry = {"sender": record.sender, "kind": record.kind, "text": text, "repeats": 1}
+        if entries and _same_message(entries[-1], entry):
+            entries[-1]["repeats"] += 1
+            continue
+        # A retried tool call shows up as a repeated (call, response) pair
+        if len(entries) >= 3 and _same_message(entries[-2], entry) and _same_message(entries[-3], entries[-1]):
+            entries.pop()
+            entries[-2]["repeats"] += 1
+            entries[-1]["repeats"] += 1
+            continue
+        entries.append(entry)
+
+    # Token counts are kept per entry and summed as entries change, so each truncation or
+    # drop re-tokenizes one line instead of the whole history.
+    for entry in entries:
+        entry["tokens"] = _entry_tokens(entry)
+    total = sum(entry["tokens"] for entry in entries)
+
+    def truncate_longest(candidates: list) -> None:
+        nonlocal total
+        # Max-heap on text length; ties go to the earlier message
+        heap = [(-len(entry["text"]), position, entry) for position, entry in enumerate(candidates)]
+        heapq.heapify(heap)
+        while heap and total > token_budget:
+            _, position, longest = heapq.heappop(heap)
+            if len(longest["text"]) <= MIN_MESSAGE_CHARS:
+                return
+            longest["text"] = _shorten(longest["text"], max(MIN_MESSAGE_CHARS, len(longest["text"]) // 2))
+            tokens = _entry_tokens(longest)
+            total += tokens - longest["tokens"]
+            longest["tokens"] = tokens
+            heapq.heappush(heap, (-len(longest["text"]), position, longest))
+
+    # Truncate the longest middle messages first
+    truncate_longest(entries[1:-1])
+
+    # Then drop middle messages, oldest first, leaving a marker
+    dropped = 0
+    while len(entries) > 3 and total > token_budget:
+        if entries[1]["kind"] == "omitted":
+            total -= entries.pop(1)["tokens"]
+        total -= entries.pop(1)["tokens"]
+        dropped += 1
+        marker = {"sender": "...", "kind": "omitted", "text": f"{dropped} message(s) omitted to fit the token budget", "repeats": 1}
+        marker["tokens"] = _entry_tokens(marker)
+        total += marker["tokens"]
+        entries.insert(1, marker)
+
+    # Only an oversized prompt or final answer is left; shorten those too
+    truncate_longest(entries)
+
+    return _entries_to_tuples(entries)
+
+
+def _entry_tuple(entry: dict) -> tuple:
+    return entry["sender"], entry["kind"], entry["text"] + (f" [repeated {entry['repeats']}x]" if entry["repeats"] > 1 else "")
+
+
+def _entries_to_tuples(entries: list) -> list:
+    return [_entry_tuple(entry) for entry in entries]
+
+
+_KIND_LABELS = {"tool_call": "TOOL_CALL: ", "tool_response": "TOOL_RESPONSE (summary): ", "omitted": "", "text": ""}
+
+
+def _format_line(sender: str, kind: str, text: str) -> str:
+    return f"FROM {sender}: {_KIND_LABELS.get(kind, '')}{text}"
+
+
+# Estimated tokens of the entry's line in format_compacted_history, including its newline.
+def _entry_tokens(entry: dict) -> int:
+    return count_tokens(_format_line(*_entry_tuple(entry)) + "\n")
+
+
+def format_compacted_history(compacted: list) -> str:
+    if not compacted:
+        return NO_HISTORY_TEXT
+    return "\n".join(_format_line(sender, kind, text) for sender, kind, text in compacted)
+
+
+if __name__ == "__main__":
+    from evaluation import format_history_for_critic
+
+    papers = [
+        {"paperId": f"id{i}", "title": f"Transformer study number {i} on language modelling", "authors": "A. Author, B. Author, C. Author",
+         "year": 2021, "citationCount": 200 + i * 37, "url": f"https://www.semanticscholar.org/paper/id{i}", "doi": f"10.1000/{i}"}
+        for i in range(25)
+    ]
+    tool_call = {"id": "call_0", "type": "function", "function": {"name": "search_research_papers", "arguments": json.dumps({"topic": "transformer models in NLP", "year": 2021, "year_filter": "in", "min_citations": 201, "limit": 25})}}
+    sample_history = [{"role": "user", "name": "UserQueryProxy", "content": "Find 25 papers on 'transformer models in NLP' published in 2021 with more than 200 citations."}]
+    for _ in range(3):  # the assistant retrying the same call
+        sample_history.append({"role": "assistant", "name": "PaperSearchAssistant", "content": None, "tool_calls": [tool_call]})
+        sample_history.append({"role": "tool", "content": json.dumps(papers, indent=2), "tool_responses": [{"tool_call_id": "call_0", "role": "tool", "content": json.dumps(papers, indent=2)}]})
+    sample_history.append({"role": "assistant", "name": "PaperSearchAssistant", "content": "Here are the papers ... TERMINATE"})
+
+    raw = format_history_for_critic(sample_history, token_budget=None)
+    started = time.perf_counter()
+    compacted = format_compacted_history(compact_history(sample_history))
+    elapsed_ms = (time.perf_counter() - started) * 1000
+
+    print(compacted)
+    print(f"\nToken estimate: {'tiktoken ' + TOKENIZER_ENCODING if _get_tokenizer() else f'chars/{CHARS_PER_TOKEN_ESTIMATE}'} (not Mistral's tokenizer, so approximate)")
+    print(f"Raw history: ~{count_tokens(raw)} estimated tokens, compacted: ~{count_tokens(compacted)} estimated tokens "
+          f"(budget {CRITIC_HISTORY_TOKEN_BUDGET}), compaction took {elapsed_ms:.2f} ms")
@@ -1,16 +1,38 @@
-import autogen
-from autogen.agentchat import AssistantAgent, UserProxyAgent
-from config import LLM_CONFIG
-from research_tools import search_research_papers, search_research_papers_tool_schema
+from __future__ import annotations
+from typing import TYPE_CHECKING
+from config import get_llm_config
+from research_tools import (
+    search_research_papers,
+    asearch_research_papers,
+    search_research_papers_batch,
+    search_research_papers_tool_schema,
+    search_research_papers_batch_tool_schema,
+)
+from query_parser import ParsedQuery, parse_search_request
+from governor import ConversationGovernor
+from s2_client import get_s2_client
+from chat_history import ChatHistory
+from tracing import configure_logging, span, trace_llm_client
+import asyncio
+import inspect
 import json
+import logging
+
+if TYPE_CHECKING:
+    from autogen.agentchat import AssistantAgent, UserProxyAgent
+
+logger = logging.getLogger(__name__)
 
 ASSISTANT_AGENT_NAME = "PaperSearchAssistant"
 USER_PROXY_AGENT_NAME = "UserQueryProxy"
 MAX_CONSECUTIVE_AUTO_REPLY = 5
+NO_FINAL_RESPONSE = "No suitable user-facing response found from assistant."
 
 ASSISTANT_SYSTEM_MESSAGE = f"""You are a helpful AI assistant specialized in finding research papers.
 You have access to a function 'search_research_papers' to search Semantic Scholar.
 The schema for this function is: {json.dumps(search_research_papers_tool_schema, indent=2)}
+You also have 'search_research_papers_batch', which runs several searches at once and merges the results.
+The schema for this function is: {json.dumps(search_research_papers_batch_tool_schema, indent=2)}
 
 Your goal is to fulfill the user's request for research papers.
 When a user asks for research papers, carefully analyze their request to extract:
@@ -24,6 +46,8 @@ When a user asks for research papers, carefully analyze their request to extract
 2.  If crucial information like 'topic' is missing, or if terms like 'recent' are used without specific years, you MUST ask clarifying questions.
 3.  If you ask a clarifying question and the user (UserQueryProxy) provides an empty or unhelpful response, state that you cannot proceed without the necessary clarification and then reply TERMINATE. Do NOT proceed with default assumptions if clarification was sought but not adequately provided.
 4.  When calling the 'search_research_papers' function, ensure you provide arguments matching the schema.
+    If you want to try several topic variants or phrasings, make ONE 'search_research_papers_batch' call instead of several separate searches.
+    Results are shorter with 'output_format': 'table' and 'max_authors' (e.g. 3); only restrict 'fields' if the user does not need the rest.
 5.  Do not make up paper details or sources. Only provide information returned by the function.
 
 **Presenting Results:**
@@ -37,16 +61,52 @@ When a user asks for research papers, carefully analyze their request to extract
 - Do not ask "Is there anything else?" or similar follow-up questions after the task is complete.
 """
 
-def create_paper_search_agents() -> tuple[UserProxyAgent, AssistantAgent]:
-    """Initializes and returns the UserProxyAgent and AssistantAgent."""
-    
+def create_paper_search_agents(use_async_tools: bool = False, stream: bool = False, on_token=None) -> tuple[UserProxyAgent, AssistantAgent]:
+    """
+    Initializes and returns the UserProxyAgent and AssistantAgent.
+
+    With use_async_tools=True the tool is backed by asearch_research_papers, so chats
+    started with a_initiate_chat (see arun_paper_search_chat) do not block the event loop.
+
+    With stream=True the assistant streams its completions (see streaming.py): text is
+    passed to on_token as it arrives, and a search call is started as soon as its
+    arguments are complete instead of after the whole message.
+
+    Every pair gets a ConversationGovernor (user_proxy.governor) that answers repeated
+    identical tool calls from memory, stops looping chats and enforces the per-chat
+    time and token budgets; run_paper_search_chat records why each chat ended.
+    """
+    # autogen takes seconds to import, so it is only loaded once agents are actually needed
+    from autogen.agentchat import AssistantAgent, UserProxyAgent
+
+    search_function = asearch_research_papers if use_async_tools else search_research_papers
+    function_map = {
+        search_research_papers_tool_schema["name"]: search_function,
+        search_research_papers_batch_tool_schema["name"]: search_research_papers_batch,
+    }
+    governor = ConversationGovernor()
+    function_map = governor.wrap_function_map(function_map)
+    llm_config = get_llm_config()
+    dispatcher = None
+    if stream:
+        from streaming import EarlyToolDispatcher, streaming_llm_config
+
+        llm_config = streaming_llm_config(llm_config)
+        if not use_async_tools:  # coroutine tools are awaited by the agent and cannot be started early
+            dispatcher = EarlyToolDispatcher(function_map)
+            function_map = dispatcher.wrap_function_map()
+
     assistant_llm_config_tools = {
-        **LLM_CONFIG,
+        **llm_config,
         "tools": [
             {
                 "type": "function",
                 "function": search_research_papers_tool_schema,
-            }
+            },
+            {
+                "type": "function",
+                "function": search_research_papers_batch_tool_schema,
+            },
         ],
     }
     
@@ -54,83 +114,191 @@ def create_paper_search_agents() -> tuple[UserProxyAgent, AssistantAgent]:
         name=ASSISTANT_AGENT_NAME,
         llm_config=assistant_llm_config_tools,
         system_message=ASSISTANT_SYSTEM_MESSAGE,
-        function_map={
-            search_research_papers_tool_schema["name"]: search_research_papers
-        }
+        is_termination_msg=governor.assistant_termination_check,
+        function_map=function_map
     )
     
     user_proxy = UserProxyAgent(
         name=USER_PROXY_AGENT_NAME,
         human_input_mode="NEVER",
         max_consecutive_auto_reply=MAX_CONSECUTIVE_AUTO_REPLY,
-        is_termination_msg=lambda x: x.get("content", "").rstrip().endswith("TERMINATE"),
+        is_termination_msg=governor.user_proxy_termination_check,
         code_execution_config=False,
-        function_map={
-            search_research_papers_tool_schema["name"]: search_research_papers
-        }
+        function_map=function_map
     )
+    if stream:
+        from streaming import StreamingMistralClient
+
+        assistant.register_model_client(model_client_cls=StreamingMistralClient, dispatcher=dispatcher, on_token=on_token)
+    trace_llm_client(assistant)
+    governor.track_llm_client(assistant)
+    user_proxy.governor = governor
     return user_proxy, assistant
 
-def run_paper_search_chat(task_message: str, user_proxy: UserProxyAgent, assistant: AssistantAgent) -> tuple[str, list]:
+def run_paper_search_chat(
+    task_message: str,
+    user_proxy: UserProxyAgent,
+    assistant: AssistantAgent,
+    use_fast_path: bool = True
+) -> tuple[str, list]:
     """
     Runs a chat between the provided UserProxyAgent and AssistantAgent for a given task.
     Resets agents before chat.
 
+    If use_fast_path is set and query_parser extracts the search parameters with high
+    confidence, the search runs directly and the LLM is only asked to present the
+    results. Otherwise the full agent loop runs.
+
     Args:
         task_message (str): The user's request/prompt.
         user_proxy (UserProxyAgent): The user proxy agent.
         assistant (AssistantAgent): The assistant agent.
+        use_fast_path (bool): Try the rule-based parameter extractor first.
 
     Returns:
-        tuple: (agent_final_user_facing_response_str, full_conversation_history_list)
+        tuple: (agent_final_user_facing_response_str, full_conversation_history) where the
+        history is a ChatHistory: the list of message dicts, each also classified once
+        (see chat_history.py) for the prescorer and critic.
     """
     # Reset agents to clear previous state/history for this specific chat
     user_proxy.reset()
     assistant.reset()
+    governor = _start_governor(user_proxy)
+
+    with span("agent.chat", prompt_chars=len(task_message)) as chat_span:
+        parsed_query = parse_search_request(task_message) if use_fast_path else None
+        fast_path = parsed_query is not None and parsed_query.is_confident
+        chat_span.set_attribute("fast_path", fast_path)
+        if fast_path:
+            logger.info(" Fast path for task: '%s' -> %s (confidence %s)", task_message, parsed_query.to_tool_arguments(), parsed_query.confidence)
+            _run_fast_path_chat(task_message, parsed_query, user_proxy, assistant)
+        else:
+            logger.info(" %s initiating chat with %s for task: '%s'", user_proxy.name, assistant.name, task_message)
+            user_proxy.initiate_chat(
+                recipient=assistant,
+                message=task_message,
+            )
+        logger.info(" Chat completed for task: '%s'", task_message)
+
+        final_response, history = _extract_final_response(user_proxy, assistant)
+        chat_span.set_attributes(messages=len(history), final_response_chars=len(final_response))
+        _record_termination(governor, chat_span)
+        return final_response, history
+
+
+def _start_governor(user_proxy: UserProxyAgent) -> ConversationGovernor | None:
+    governor = getattr(user_proxy, "governor", None)
+    if governor is not None:
+        governor.start()
+    return governor
+
 
-    print(f" {user_proxy.name} initiating chat with {assistant.name} for task: '{task_message}'")
-    user_proxy.initiate_chat(
-        recipient=assistant,
-        message=task_message,
+def _record_termination(governor: ConversationGovernor | None, chat_span) -> None:
+    if governor is None:
+        return
+    reason = governor.finish()
+    stats = governor.stats()
+    chat_span.set_attributes(
+        termination_reason=reason,
+        chat_tokens=stats["tokens_used"],
+        repeated_tool_calls=stats["repeated_tool_calls"],
     )
-    print(f" Chat completed for task: '{task_message}'")
-
-    # --- Extracting Final Response and History ---
-    agent_final_user_facing_response = "No suitable user-facing response found from assistant."
-
-    full_conversation_history = user_proxy.chat_messages.get(assistant, [])
-
-    if not full_conversation_history:
-        print(f"Warning: No chat history found in {user_proxy.name} for {assistant.name}.")
-        return agent_final_user_facing_response, []
-
-    # Find the last user-facing message from the ASSISTANT
-    for msg in reversed(full_conversation_history):
-        if msg.get("role") == "assistant":
-            content = msg.get("content")
-            
-            is_tool_call_generated = False
-            if isinstance(content, str):
-                try:
-                    if "tool_calls" in content or "function_call" in content:
-                        potential_tool_call_data = json.loads(content)
-                        if isinstance(potential_tool_call_data, dict) and \
-                           (potential_tool_call_data.get("tool_calls") or potential_tool_call_data.get("function_call")):
-                            is_tool_call_generated = True
-                except json.JSONDecodeError:
-                    pass 
-            elif isinstance(content, list) and content and isinstance(content[0], dict) and "tool_calls" in content[0]:
-                 is_tool_call_generated = True 
-            
-            if not is_tool_call_generated and isinstance(content, str) and content.strip():
-                agent_final_user_facing_response = content
-                break 
-
-    return agent_final_user_facing_response, full_conversation_history
+    logger.info(" Chat ended: %s", stats)
+
+
+def get_termination_reason(user_proxy: UserProxyAgent) -> str | None:
+    """Why the last chat run with this user proxy ended (see governor.py), or None for agents without a governor."""
+    governor = getattr(user_proxy, "governor", None)
+    return governor.termination_reason if governor is not None else None
+
+
+# Replays the extraction turn without the LLM: the parsed tool call and its result are
+# recorded in both agents' histories, then the assistant only writes the presentation.
+def _run_fast_path_chat(task_message: str, parsed_query: ParsedQuery, user_proxy: UserProxyAgent, assistant: AssistantAgent) -> None:
+    tool_arguments = parsed_query.to_tool_arguments()
+    tool_call_id = "fast_path_call_0"
+    tool_name = search_research_papers_tool_schema["name"]
+    tool_calls = [{
+        "id": tool_call_id,
+        "type": "function",
+        "function": {"name": tool_name, "arguments": json.dumps(tool_arguments)},
+    }]
+
+    user_proxy.send(task_message, assistant, request_reply=False, silent=True)
+    assistant.send({"role": "assistant", "content": None, "tool_calls": tool_calls}, user_proxy, request_reply=False, silent=True)
+
+    # Executed by the user proxy like any tool call: through its function map (so the governor
+    # remembers the result), and coroutine tools (use_async_tools=True) are run to completion
+    governor = getattr(user_proxy, "governor", None)
+    if governor is not None:
+        governor.record_tool_calls(tool_calls)
+    tool_call_message = {"role": "assistant", "content": None, "tool_calls": tool_calls}
+    if inspect.iscoroutinefunction(user_proxy.function_map.get(tool_name)):
+        tool_reply = asyncio.run(_aexecute_fast_path_tool_calls(user_proxy, tool_call_message))
+    else:
+        _, tool_reply = user_proxy.generate_tool_calls_reply(messages=[tool_call_message])
+    user_proxy.send(tool_reply, assistant, request_reply=False, silent=True)
+
+    presentation = assistant.generate_reply(sender=user_proxy)
+    if presentation is None:
+        return
+    # If the model still wants another tool call, hand over to the normal agent loop
+    wants_tool_call = isinstance(presentation, dict) and (presentation.get("tool_calls") or presentation.get("function_call"))
+    assistant.send(presentation, user_proxy, request_reply=bool(wants_tool_call))
+    # Without a reply request the user proxy never runs is_termination_msg, so let the
+    # governor see the presentation (e.g. its TERMINATE) before the chat is recorded
+    if not wants_tool_call and governor is not None:
+        governor.user_proxy_termination_check(presentation if isinstance(presentation, dict) else {"content": presentation})
+
+
+# Async tools run in an event loop of their own here. The S2 client keeps one httpx.AsyncClient
+# per loop, so it is closed before the loop ends instead of leaking its connections.
+async def _aexecute_fast_path_tool_calls(user_proxy: UserProxyAgent, tool_call_message: dict) -> dict:
+    try:
+        _, tool_reply = await user_proxy.a_generate_tool_calls_reply(messages=[tool_call_message])
+        return tool_reply
+    finally:
+        await get_s2_client().aclose()
+
+
+async def arun_paper_search_chat(task_message: str, user_proxy: UserProxyAgent, assistant: AssistantAgent) -> tuple[str, list]:
+    """
+    Async version of run_paper_search_chat. Use with agents created by
+    create_paper_search_agents(use_async_tools=True).
+    """
+    user_proxy.reset()
+    assistant.reset()
+    governor = _start_governor(user_proxy)
+
+    with span("agent.chat", prompt_chars=len(task_message), fast_path=False, asynchronous=True) as chat_span:
+        logger.info(" %s initiating async chat with %s for task: '%s'", user_proxy.name, assistant.name, task_message)
+        await user_proxy.a_initiate_chat(
+            recipient=assistant,
+            message=task_message,
+        )
+        logger.info(" Chat completed for task: '%s'", task_message)
+
+        final_response, history = _extract_final_response(user_proxy, assistant)
+        chat_span.set_attributes(messages=len(history), final_response_chars=len(final_response))
+        _record_termination(governor, chat_span)
+        return final_response, history
+
+
+# Pulls the last user-facing assistant message and the full history out of a finished chat.
+# In the user proxy's history the assistant's text replies carry its name (their role is "user").
+def _extract_final_response(user_proxy: UserProxyAgent, assistant: AssistantAgent) -> tuple[str, ChatHistory]:
+    history = ChatHistory(user_proxy.chat_messages.get(assistant, []))
+    if not history:
+        logger.warning("Warning: No chat history found in %s for %s.", user_proxy.name, assistant.name)
+        return NO_FINAL_RESPONSE, history
+
+    final_response = history.final_response(assistant.name)
+    return (final_response if final_response is not None else NO_FINAL_RESPONSE), history
 
 
 # Module for testing main_agent.py
 if __name__ == "__main__":
+    configure_logging()
     print("--- Testing Paper Search Agent Module ---")
     
     user_proxy_agent, assistant_agent = create_paper_search_agents()
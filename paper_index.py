@@ -0,0 +1,271 @@
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+
+# Local, offline alternative to the Semantic Scholar bulk search endpoint.
+# Select it with S2_SEARCH_BACKEND=local (see research_tools._fetch_s2_page).
+LOCAL_INDEX_PATH = os.path.join(".cache", "s2", "paper_index.db")
+LOCAL_PAGE_SIZE = 100
+INGEST_BATCH_SIZE = 1000
+
+
+# Makes a raw record (S2 Graph API JSON or the lower-case S2 datasets dump) look like an API result.
+def normalize_s2_record(record: dict) -> dict | None:
+    paper_id = record.get("paperId") or record.get("paperid")
+    url = record.get("url")
+    if not paper_id and record.get("corpusid") is not None:
+        paper_id = f"CorpusId:{record['corpusid']}"
+        url = url or f"https://api.semanticscholar.org/CorpusID:{record['corpusid']}"
+    if not paper_id:
+        return None
+
+    external_ids = record.get("externalIds") or record.get("externalids") or {}
+    citation_count = record.get("citationCount", record.get("citationcount"))
+    return {
+        "paperId": paper_id,
+        "title": record.get("title"),
+        "authors": [{"name": author.get("name")} for author in record.get("authors") or [] if author.get("name")],
+        "year": record.get("year"),
+        "citationCount": citation_count if citation_count is not None else 0,
+        "url": url or f"https://www.semanticscholar.org/paper/{paper_id}",
+        "externalIds": external_ids,
+    }
+
+
+# Turns the S2 'year' parameter ("2021", "-2019", "2022-", "2019-2021") into an inclusive range.
+def parse_year_range(year_param) -> tuple[int | None, int | None]:
+    if year_param is None or year_param == "":
+        return None, None
+    year_param = str(year_param).strip()
+    if "-" not in year_param:
+        return int(year_param), int(year_param)
+    start, _, end = year_param.partition("-")
+    return (int(start) if start else None), (int(end) if end else None)
+
+
+# Quotes every term so user input can never be parsed as FTS5 query syntax; terms are AND-ed.
+def _to_fts_query(query: str) -> str:
+    terms = [term.replace('"', '""') for term in query.replace("'", " ").split()]
+    return " ".join(f'"{term}"' for term in terms if term)
+
+
+# Indexes built before titles-only search also had an authors column; rebuilds those from the stored records.
+def _drop_author_column(conn: sqlite3.Connection) -> None:
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(papers_fts)")]
+    if "authors" not in columns:
+        return
+    conn.executescript(
+        """
+        DROP TABLE papers_fts;
+        CREATE VIRTUAL TABLE papers_fts USING fts5(title);
+        INSERT INTO papers_fts (rowid, title) SELECT id, json_extract(record, '$.title') FROM papers;
+        """
+    )
+    conn.commit()
+
+
+class LocalPaperIndex:
+    """
+    SQLite index over S2 paper records: FTS5 on the title for the query text (S2 bulk
+    search does not match author names either), plus plain B-tree indexes on year and
+    citation count for the range filters.
+
+    search_page() accepts the params dict built by _construct_s2_api_params and returns
+    a page shaped like the bulk search response ({"data": [...], "token": ...}).
+    """
+
+    def __init__(self, db_path: str = LOCAL_INDEX_PATH, page_size: int = LOCAL_PAGE_SIZE):
+        self.db_path = db_path
+        self.page_size = page_size
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _get_conn(self) -> sqlite3.Connection:
+        if self._conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, check_same_thread=False)
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS papers (
+                    id INTEGER PRIMARY KEY,
+                    paper_id TEXT NOT NULL UNIQUE,
+                    year INTEGER,
+                    citation_count INTEGER NOT NULL DEFAULT 0,
+                    record TEXT NOT NULL,
+                    content_hash TEXT NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_papers_year_citations ON papers(year, citation_count);
+                CREATE INDEX IF NOT EXISTS idx_papers_citations ON papers(citation_count);
+                CREATE VIRTUAL TABLE IF NOT EXISTS papers_fts USING fts5(title);
+                """
+            )
+            _drop_author_column(conn)
+            self._conn = conn
+        return self._conn
+
+    def ingest_records(self, records) -> dict:
+        """Upserts records by paperId. Unchanged records are skipped, so re-ingesting a dump is cheap."""
+        counts = {"inserted": 0, "updated": 0, "unchanged": 0, "skipped": 0}
+        with self._lock:
+            conn = self._get_conn()
+            pending = 0
+            for raw_record in records:
+                record = normalize_s2_record(raw_record)
+                if record is None or not record.get("title"):
+                    counts["skipped"] += 1
+                    continue
+
+                record_json = json.dumps(record, sort_keys=True)
+                content_hash = hashlib.sha1(record_json.encode("utf-8")).hexdigest()
+                row = conn.execute(
+                    "SELECT id, content_hash FROM papers WHERE paper_id = ?", (record["paperId"],)
+                ).fetchone()
+                if row is None:
+                    cursor = conn.execute(
+                        "INSERT INTO papers (paper_id, year, citation_count, record, content_hash) VALUES (?, ?, ?, ?, ?)",
+                        (record["paperId"], record["year"], record["citationCount"], record_json, content_hash),
+                    )
+                    conn.execute(
+                        "INSERT INTO papers_fts (rowid, title) VALUES (?, ?)",
+                        (cursor.lastrowid, record["title"]),
+                    )
+                    counts["inserted"] += 1
+                elif row[1] != content_hash:
+                    conn.execute(
+                        "UPDATE papers SET year = ?, citation_count = ?, record = ?, content_hash = ? WHERE id = ?",
+                        (record["year"], record["citationCount"], record_json, content_hash, row[0]),
+                    )
+                    conn.execute("DELETE FROM papers_fts WHERE rowid = ?", (row[0],))
+                    conn.execute(
+                        "INSERT INTO papers_fts (rowid, title) VALUES (?, ?)",
+                        (row[0], record["title"]),
+                    )
+                    counts["updated"] += 1
+                else:
+                    counts["unchanged"] += 1
+                    continue
+
+                pending += 1
+                if pending >= INGEST_BATCH_SIZE:
+                    conn.commit()
+                    pending = 0
+            conn.commit()
+        return counts
+
+    def ingest_file(self, path: str) -> dict:
+        return self.ingest_records(iter_dump_records(path))
+
+    def search_page(self, api_params: dict) -> dict:
+        fts_query = _to_fts_query(api_params.get("query", ""))
+        if not fts_query:
+            return {"data": []}
+
+        conditions = ["papers_fts MATCH ?"]
+        values = [fts_query]
+        year_from, year_to = parse_year_range(api_params.get("year"))
+        if year_from is not None:
+            conditions.append("p.year >= ?")
+            values.append(year_from)
+        if year_to is not None:
+            conditions.append("p.year <= ?")
+            values.append(year_to)
+        if api_params.get("minCitationCount") is not None:
+            conditions.append("p.citation_count >= ?")
+            values.append(int(api_params["minCitationCount"]))
+
+        offset = int(api_params.get("token") or 0)
+        sql = (
+            "SELECT p.record FROM papers_fts JOIN papers p ON p.id = papers_fts.rowid "
+            f"WHERE {' AND '.join(conditions)} ORDER BY papers_fts.rank LIMIT ? OFFSET ?"
+        )
+        with self._lock:
+            rows = self._get_conn().execute(sql, (*values, self.page_size + 1, offset)).fetchall()
+
+        has_more = len(rows) > self.page_size
+        page = {"data": [json.loads(row[0]) for row in rows[:self.page_size]]}
+        if has_more:
+            page["token"] = str(offset + self.page_size)
+        return page
+
+    def count(self) -> int:
+        with self._lock:
+            return self._get_conn().execute("SELECT COUNT(*) FROM papers").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# Yields records from a JSONL dump (optionally .gz) or, if pyarrow is installed, a Parquet file.
+def iter_dump_records(path: str):
+    if path.endswith(".parquet"):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise RuntimeError("Reading Parquet dumps requires pyarrow (pip install pyarrow).") from e
+        for batch in pq.ParquetFile(path).iter_batches():
+            yield from batch.to_pylist()
+        return
+
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+_default_index = None
+
+
+def get_local_index() -> LocalPaperIndex:
+    global _default_index
+    if _default_index is None:
+        _default_index = LocalPaperIndex(os.getenv("LOCAL_PAPER_INDEX_PATH", LOCAL_INDEX_PATH))
+    return _default_index
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or query the local offline paper index.")
+    parser.add_argument("--index", default=os.getenv("LOCAL_PAPER_INDEX_PATH", LOCAL_INDEX_PATH))
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    ingest_parser = subcommands.add_parser("ingest", help="Add or update records from JSONL(.gz)/Parquet dumps.")
+    ingest_parser.add_argument("paths", nargs="+")
+
+    search_parser = subcommands.add_parser("search", help="Run a search against the local index.")
+    search_parser.add_argument("topic")
+    search_parser.add_argument("--year", type=int)
+    search_parser.add_argument("--year-filter", choices=["in", "before", "after"])
+    search_parser.add_argument("--min-citations", type=int)
+    search_parser.add_argument("--limit", type=int, default=5)
+
+    args = parser.parse_args()
+    index = LocalPaperIndex(args.index)
+
+    if args.command == "ingest":
+        for path in args.paths:
+            print(f"Ingesting {path} ...")
+            print(f"  {index.ingest_file(path)}")
+        print(f"Index now holds {index.count()} papers.")
+    else:
+        # research_tools reads both settings when it is imported
+        os.environ["S2_SEARCH_BACKEND"] = "local"
+        os.environ["LOCAL_PAPER_INDEX_PATH"] = args.index
+        from research_tools import search_research_papers
+
+        print(search_research_papers(
+            topic=args.topic,
+            year=args.year,
+            year_filter=args.year_filter,
+            min_citations=args.min_citations,
+            limit=args.limit,
+        ))
@@ -0,0 +1,83 @@
+import csv
+import io
+import json
+from dataclasses import dataclass, field
+
+# Output field -> Semantic Scholar API field it is built from
+PAPER_FIELD_SOURCES = {
+    "paperId": "paperId",
+    "title": "title",
+    "authors": "authors",
+    "year": "year",
+    "citationCount": "citationCount",
+    "url": "url",
+    "doi": "externalIds",
+}
+PAPER_FIELDS = tuple(PAPER_FIELD_SOURCES)
+OUTPUT_FORMATS = ("json", "table")
+
+
+# Comma-separated S2 'fields' parameter for the requested output fields (title is always needed).
+def s2_fields_param(fields=None) -> str:
+    requested = ["title", *(fields or PAPER_FIELDS)]
+    unknown = [name for name in requested if name not in PAPER_FIELD_SOURCES]
+    if unknown:
+        raise ValueError(f"Unknown paper fields: {unknown}. Valid fields: {list(PAPER_FIELDS)}")
+    sources = ["paperId"]  # always needed to de-duplicate
+    for name in requested:
+        if PAPER_FIELD_SOURCES[name] not in sources:
+            sources.append(PAPER_FIELD_SOURCES[name])
+    return ",".join(sources)
+
+
+@dataclass(slots=True)
+class PaperRecord:
+    paperId: str | None
+    title: str
+    authors: list = field(default_factory=list)
+    year: int | None = None
+    citationCount: int = 0
+    url: str | None = None
+    doi: str | None = None
+
+    @classmethod
+    def from_s2(cls, paper_s2_format: dict) -> "PaperRecord | None":
+        paper_title = paper_s2_format.get('title')
+        if not paper_title:
+            return None  # Skip papers without titles
+        return cls(
+            paperId=paper_s2_format.get('paperId'),
+            title=paper_title,
+            authors=[author['name'] for author in paper_s2_format.get('authors') or [] if author.get('name')],
+            year=paper_s2_format.get('year'),
+            citationCount=paper_s2_format.get('citationCount') or 0,
+            url=paper_s2_format.get('url'),
+            doi=(paper_s2_format.get('externalIds') or {}).get('DOI'),
+        )
+
+    def authors_str(self, max_authors: int = None) -> str:
+        if max_authors is not None and len(self.authors) > max_authors:
+            return ", ".join(self.authors[:max_authors]) + " et al."
+        return ", ".join(self.authors)
+
+    def to_dict(self, fields=None, max_authors: int = None) -> dict:
+        result = {}
+        for name in fields or PAPER_FIELDS:
+            result[name] = self.authors_str(max_authors) if name == "authors" else getattr(self, name)
+        return result
+
+
+# Serializes records for the LLM: "json" is a compact JSON list, "table" a header row plus CSV rows.
+def encode_paper_records(records: list, fields=None, output_format: str = "json", max_authors: int = None) -> str:
+    fields = list(fields or PAPER_FIELDS)
+    if output_format == "table":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerow(fields)
+        for record in records:
+            row = record.to_dict(fields, max_authors)
+            writer.writerow(["" if row[name] is None else row[name] for name in fields])
+        return buffer.getvalue().rstrip("\n")
+    if output_format != "json":
+        raise ValueError(f"Unknown output_format '{output_format}'. Valid formats: {list(OUTPUT_FORMATS)}")
+    return json.dumps([record.to_dict(fields, max_authors) for record in records], ensure_ascii=False)
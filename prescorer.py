@@ -0,0 +1,244 @@
+import json
+import re
+from dataclasses import asdict, dataclass, field
+
+from chat_history import as_chat_history
+from history_compaction import parse_tool_output
+from query_parser import DEFAULT_LIMIT, parse_search_request
+
+ASSISTANT_NAME = "PaperSearchAssistant"
+SEARCH_TOOL_NAME = "search_research_papers"
+SEARCH_TOOL_NAMES = (SEARCH_TOOL_NAME, "search_research_papers_batch")
+# A clean run is: tool call, final answer (plus at most one extra assistant message)
+EFFICIENT_MAX_ASSISTANT_TURNS = 3
+# Verdicts settled without the LLM critic. Only "fail" (paper details presented without any
+# search) is: "pass" only shows the run matched what query_parser read from the prompt, which
+# on fast-path chats is also where the tool arguments came from, and says nothing about
+# relevance, presentation or robustness. Those runs go to the critic with the facts attached.
+CRITIC_SKIPPING_VERDICTS = ("fail",)
+
+# Signs that a final answer presents paper details (titles, citation counts, links)
+_PAPER_LISTING_RE = re.compile(
+    r"\btitle\s*:|\bcitations?\s*:|\bcited\s+by\b|\b\d+\s+citations\b|https?://|\bdoi\b",
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class PrescoreFacts:
+    """Facts about one transcript that can be checked without an LLM."""
+    tool_called: bool = False
+    tool_calls: int = 0
+    tool_arguments: list = field(default_factory=list)
+    tool_errors: list = field(default_factory=list)
+    papers_returned: int = 0
+    no_results_reported: bool = False
+    requested: dict | None = None  # constraints parsed from the prompt, only when the parse is confident
+    argument_mismatches: list = field(default_factory=list)
+    constraint_violations: list = field(default_factory=list)
+    titles_missing_from_response: list = field(default_factory=list)
+    assistant_turns: int = 0
+    total_messages: int = 0
+    ends_with_terminate: bool = False
+    final_response_lists_papers: bool = False
+    verdict: str = "unclear"  # "pass", "fail" or "unclear"
+    verdict_reason: str = ""
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def _tool_call_arguments(tool_call: dict) -> dict:
+    arguments = tool_call.get("function", {}).get("arguments") or {}
+    if isinstance(arguments, str):
+        try:
+            arguments = json.loads(arguments)
+        except json.JSONDecodeError:
+            return {}
+    return arguments if isinstance(arguments, dict) else {}
+
+
+def _paper_violations(paper: dict, requested: dict) -> list:
+    title = paper.get("title", "?")
+    violations = []
+    year = paper.get("year")
+    if "year" in requested and isinstance(year, int):
+        target, year_filter = requested["year"], requested.get("year_filter")
+        if (year_filter == "in" and year != target) or (year_filter == "before" and year >= target) \
+                or (year_filter == "after" and year <= target):
+            violations.append(f"'{title}' is from {year}, expected {year_filter} {target}")
+    citations = paper.get("citationCount")
+    if "min_citations" in requested and isinstance(citations, int) and citations < requested["min_citations"]:
+        violations.append(f"'{title}' has {citations} citations, expected at least {requested['min_citations']}")
+    return violations
+
+
+def _argument_mismatches(arguments: dict, requested: dict) -> list:
+    mismatches = []
+    if str(arguments.get("topic", "")).strip().lower() != requested["topic"].lower():
+        mismatches.append(f"topic {arguments.get('topic')!r} != {requested['topic']!r}")
+    for key in ("year", "year_filter", "min_citations", "limit"):
+        expected = requested.get(key)
+        actual = arguments.get(key)
+        if key == "year_filter" and expected == "in" and actual is None and arguments.get("year") is not None:
+            continue  # a bare year is treated as 'in' by the tool
+        if expected != actual and not (key == "limit" and actual is None and expected == DEFAULT_LIMIT):
+            mismatches.append(f"{key} {actual!r} != {expected!r}")
+    return mismatches
+
+
+def compute_prescore_facts(user_prompt: str, agent_final_response: str, conversation_history: list, assistant_name: str = ASSISTANT_NAME) -> PrescoreFacts:
+    """
+    Walks the conversation history once and records what the agent objectively did:
+    tool calls and their results, whether returned papers satisfy the prompt's year and
+    citation constraints, turn count and termination. Then sets a verdict: "pass" and
+    "fail" are clear-cut enough to skip the critic, "unclear" needs the critic.
+    """
+    history = as_chat_history(conversation_history)
+    facts = PrescoreFacts(total_messages=len(history))
+    parsed = parse_search_request(user_prompt)
+    if parsed.is_confident:
+        facts.requested = parsed.to_tool_arguments()
+
+    returned_papers = []
+    for record in history.records:
+        kind, payload = record.kind, record.payload
+        if kind == "tool_call":
+            facts.assistant_turns += 1
+            for tool_call in payload:
+                name = tool_call.get("function", {}).get("name")
+                if name not in SEARCH_TOOL_NAMES:
+                    continue
+                facts.tool_called = True
+                facts.tool_calls += 1
+                arguments = _tool_call_arguments(tool_call)
+                facts.tool_arguments.append({"name": name, **arguments})
+                if name == SEARCH_TOOL_NAME and facts.requested:
+                    facts.argument_mismatches.extend(_argument_mismatches(arguments, facts.requested))
+        elif kind == "tool_response":
+            for content in payload:
+                output = parse_tool_output(content)
+                if output["error"] is not None:
+                    facts.tool_errors.append(output["error"])
+                elif output["papers"] is not None:
+                    returned_papers.extend(output["papers"])
+                elif output["message"] is not None:
+                    facts.no_results_reported = True
+        elif record.name == assistant_name:
+            facts.assistant_turns += 1
+
+    final_text = agent_final_response if isinstance(agent_final_response, str) else str(agent_final_response)
+    facts.papers_returned = len(returned_papers)
+    facts.ends_with_terminate = final_text.rstrip().endswith("TERMINATE")
+    facts.final_response_lists_papers = bool(_PAPER_LISTING_RE.search(final_text))
+    if facts.requested:
+        for paper in returned_papers:
+            facts.constraint_violations.extend(_paper_violations(paper, facts.requested))
+        if facts.papers_returned > facts.requested["limit"]:
+            facts.constraint_violations.append(f"{facts.papers_returned} papers returned, {facts.requested['limit']} requested")
+    lowered_final = final_text.lower()
+    facts.titles_missing_from_response = [
+        paper.get("title") for paper in returned_papers if paper.get("title") and paper["title"].lower() not in lowered_final
+    ]
+
+    facts.verdict, facts.verdict_reason = _verdict(facts)
+    return facts
+
+
+def _verdict(facts: PrescoreFacts) -> tuple[str, str]:
+    if not facts.tool_called and facts.final_response_lists_papers:
+        return "fail", "The final answer presents paper details but the search tool was never called."
+    if not facts.requested:
+        return "unclear", "The prompt could not be parsed with confidence, so its constraints are unknown."
+    problems = []
+    if facts.tool_calls != 1:
+        problems.append(f"{facts.tool_calls} search tool calls")
+    if facts.tool_errors:
+        problems.append("tool returned an error")
+    if facts.argument_mismatches:
+        problems.append("tool arguments differ from the prompt")
+    if facts.constraint_violations:
+        problems.append("returned papers violate the prompt's constraints")
+    if facts.papers_returned == 0:
+        problems.append("no papers returned")
+    if facts.titles_missing_from_response:
+        problems.append("final answer leaves out returned papers")
+    if not facts.ends_with_terminate:
+        problems.append("final message does not end with TERMINATE")
+    if facts.assistant_turns > EFFICIENT_MAX_ASSISTANT_TURNS:
+        problems.append(f"{facts.assistant_turns} assistant turns")
+    if problems:
+        return "unclear", "; ".join(problems)
+    return "pass", "One correct tool call; every returned paper matches the constraints and is reported; the chat terminated cleanly."
+
+
+def settles_without_critic(facts: PrescoreFacts) -> bool:
+    return facts.verdict in CRITIC_SKIPPING_VERDICTS
+
+
+def rule_based_evaluation(facts: PrescoreFacts) -> dict:
+    """
+    Critic-shaped evaluation for a "fail" verdict, so the LLM critic can be skipped. The critic's
+    rubric scores hallucinated papers without a tool call at 1, and a fabricated answer completes
+    none of the request, so every criterion gets 1.
+    """
+    if not settles_without_critic(facts):
+        raise ValueError(f"A '{facts.verdict}' verdict needs the critic; only {CRITIC_SKIPPING_VERDICTS} are scored by rules.")
+    return {
+        "completeness_score": 1,
+        "quality_accuracy_score": 1,
+        "robustness_score": 1,
+        "tool_usage_score": 1,
+        "efficiency_conciseness_score": 1,
+        "overall_assessment": f"Scored by rule-based pre-scorer ({facts.verdict}): {facts.verdict_reason}",
+        "positive_feedback": "",
+        "areas_for_improvement": "Call search_research_papers instead of answering from memory.",
+        "evaluated_by": "prescorer",
+        "prescore_facts": facts.to_dict(),
+    }
+
+
+def format_facts_for_critic(facts: PrescoreFacts) -> str:
+    lines = [
+        f"- search tool called: {facts.tool_called} ({facts.tool_calls} call(s))",
+        f"- tool arguments: {json.dumps(facts.tool_arguments)}",
+        f"- papers returned by the tool: {facts.papers_returned}",
+        f"- assistant turns: {facts.assistant_turns} of {facts.total_messages} messages",
+        f"- final message ends with TERMINATE: {facts.ends_with_terminate}",
+    ]
+    if facts.requested:
+        # On fast-path chats the tool arguments were built by the same parser, so they always agree
+        lines.append(f"- constraints parsed from the prompt by the rule-based parser that also builds fast-path tool arguments"
+                     f" (so agreement with the arguments is not independent evidence): {json.dumps(facts.requested)}")
+    if facts.tool_errors:
+        lines.append(f"- tool errors: {json.dumps(facts.tool_errors)}")
+    if facts.no_results_reported:
+        lines.append("- the tool reported that no papers matched")
+    for label, items in (
+        ("argument mismatches", facts.argument_mismatches),
+        ("constraint violations in returned papers", facts.constraint_violations),
+        ("returned papers missing from the final answer", facts.titles_missing_from_response),
+    ):
+        if items:
+            lines.append(f"- {label}: {'; '.join(str(item) for item in items)}")
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    prompt = "Find 2 papers on 'AI ethics' published after 2022."
+    papers = [{"title": "The Moral Machine Experiment", "year": 2023, "citationCount": 150}, {"title": "Algorithmic Bias and Fairness", "year": 2024, "citationCount": 90}]
+    final = "1. The Moral Machine Experiment (2023), 150 citations\n2. Algorithmic Bias and Fairness (2024), 90 citations\nTERMINATE"
+    history = [
+        {"role": "assistant", "name": "UserQueryProxy", "content": prompt},
+        {"role": "assistant", "content": None, "tool_calls": [{"id": "call_0", "type": "function", "function": {"name": "search_research_papers", "arguments": json.dumps({"topic": "AI ethics", "year": 2022, "year_filter": "after", "limit": 2})}}]},
+        {"role": "tool", "content": json.dumps(papers), "tool_responses": [{"tool_call_id": "call_0", "role": "tool", "content": json.dumps(papers)}]},
+        {"role": "user", "name": "PaperSearchAssistant", "content": final},
+    ]
+    for label, final_response, conversation in (
+        ("clean run", final, history),
+        ("hallucinated", "Title: Future of AI, 2077, 900 citations. TERMINATE", [history[0], {"role": "user", "name": "PaperSearchAssistant", "content": "Title: Future of AI, 2077, 900 citations. TERMINATE"}]),
+        ("incomplete answer", "Here is one: The Moral Machine Experiment. TERMINATE", history[:3]),
+    ):
+        facts = compute_prescore_facts(prompt, final_response, conversation)
+        print(f"\n--- {label}: {facts.verdict} ({facts.verdict_reason}) ---")
+        print(format_facts_for_critic(facts))
@@ -0,0 +1,232 @@
+import re
+from dataclasses import dataclass, field
+
+# Prompts parsed with at least this confidence can skip the LLM's parameter-extraction turn
+FAST_PATH_MIN_CONFIDENCE = 0.8
+DEFAULT_LIMIT = 5
+
+NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5,
+    "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10,
+}
+_NUMBER = r"(\d+|" + "|".join(NUMBER_WORDS) + r")"
+
+# Words that mean the user left something for the agent to clarify or judge
+VAGUE_TERMS = ("recent", "latest", "newest", "new", "good", "best", "top", "some", "important", "influential", "famous")
+
+_QUOTED_TOPIC_RE = re.compile(r"(?:^|\s)['\"“‘]([^'\"“”‘’]*)['\"”’](?=\W|$)")
+_UNQUOTED_TOPIC_RE = re.compile(
+    r"\b(?:papers?|articles?|research|publications?)\s+(?:on|about|regarding|covering)\s+(.+?)"
+    r"(?=\s+(?:published|from|with|that|which|before|after|since|prior|in\s+(?:the\s+year\s+)?\d{4})\b|[.?!]*$)",
+    re.IGNORECASE,
+)
+_LIMIT_RE = re.compile(
+    r"\b(?:up\s+to\s+|at\s+most\s+)?" + _NUMBER + r"\s+(?:[\w-]+\s+){0,3}?(?:research\s+)?(?:papers|paper|articles|article|publications)\b",
+    re.IGNORECASE,
+)
+_YEAR_RE = re.compile(
+    r"\b(in|before|after|since|prior\s+to)\s+(?:the\s+year\s+)?(\d{4})\b",
+    re.IGNORECASE,
+)
+_CITATIONS_RE = re.compile(
+    r"\b(more\s+than|over|greater\s+than|above|at\s+least|a\s+minimum\s+of|minimum\s+of|exactly|with)\s+"
+    r"(-?\d[\d,]*)\s*\+?\s+citations?\b",
+    re.IGNORECASE,
+)
+_CITATIONS_PLUS_RE = re.compile(r"\b(\d[\d,]*)\+\s+citations?\b", re.IGNORECASE)
+# Upper bounds and negations cannot be expressed as a minimum / in-before-after filter, and the
+# regexes above would read them as their opposite ("no more than 10 citations" -> min 11)
+_UPPER_BOUND_RE = re.compile(
+    r"\b(?:no\s+more\s+than|not\s+more\s+than|less\s+than|fewer\s+than|under|below|at\s+most|up\s+to|(?:a\s+)?maximum\s+of|max\.?)\s+"
+    r"\d[\d,]*\s*\+?\s+citations?\b",
+    re.IGNORECASE,
+)
+_NEGATION_RE = re.compile(r"\b(?:not|no|never|without|excluding|except)\b|n't\b", re.IGNORECASE)
+# Constraints search_research_papers has no argument for, or that need more than one year filter.
+# Left in the prompt, they would be silently dropped by the fast path.
+_YEAR_NUMBER_RE = re.compile(r"\b\d{4}\b(?!\s*\+?\s*citations?\b)", re.IGNORECASE)
+LANGUAGE_NAMES = ("english", "french", "german", "spanish", "italian", "portuguese", "chinese", "japanese", "korean", "russian", "arabic")
+_YEAR_CONJUNCTION_RE = re.compile(
+    r"\b\d{4}\s+(?:or|and)\b|\b(?:or|and)\s+(?:(?:in|before|after|since|prior\s+to)\s+)?(?:the\s+year\s+)?\d{4}\b",
+    re.IGNORECASE,
+)
+_AUTHOR_RE = re.compile(r"\b(?i:by|authored\s+by|written\s+by|from\s+author)\s+[A-Z][\w.'-]+|\b(?i:authors?|authored)\b")
+_VENUE_RE = re.compile(
+    r"\b(?i:in|at|from)\s+(?:the\s+)?[A-Z][\w&-]*|\b(?i:journal|conference|proceedings|workshop|venue)s?\b"
+)
+_LANGUAGE_RE = re.compile(r"\b(?:in|written\s+in)\s+(?:" + "|".join(LANGUAGE_NAMES) + r")\b", re.IGNORECASE)
+
+
+@dataclass
+class ParsedQuery:
+    topic: str | None = None
+    year: int | None = None
+    year_filter: str | None = None
+    min_citations: int | None = None
+    limit: int = DEFAULT_LIMIT
+    confidence: float = 0.0
+    notes: list = field(default_factory=list)
+
+    @property
+    def is_confident(self) -> bool:
+        return self.confidence >= FAST_PATH_MIN_CONFIDENCE
+
+    def to_tool_arguments(self) -> dict:
+        """Arguments for search_research_papers, leaving out anything not found in the prompt."""
+        arguments = {"topic": self.topic, "limit": self.limit}
+        if self.year is not None:
+            arguments["year"] = self.year
+            arguments["year_filter"] = self.year_filter
+        if self.min_citations is not None:
+            arguments["min_citations"] = self.min_citations
+        return arguments
+
+
+def _to_int(number: str) -> int:
+    number = number.lower()
+    return NUMBER_WORDS[number] if number in NUMBER_WORDS else int(number.replace(",", ""))
+
+
+def parse_search_request(prompt: str) -> ParsedQuery:
+    """
+    Extracts search_research_papers arguments from a well-formed request with regular
+    expressions. Confidence starts at 1.0 and is lowered for every sign that the LLM
+    should handle the prompt instead (vague wording, unquoted topic, odd constraints).
+    """
+    parsed = ParsedQuery()
+    confidence = 1.0
+    text = prompt.strip()
+
+    quoted = _QUOTED_TOPIC_RE.search(text)
+    if quoted:
+        parsed.topic = quoted.group(1).strip()
+    else:
+        unquoted = _UNQUOTED_TOPIC_RE.search(text)
+        if unquoted:
+            parsed.topic = unquoted.group(1).strip(" .?!'\"")
+            confidence -= 0.15
+            parsed.notes.append("topic was not quoted")
+    if not parsed.topic:
+        parsed.notes.append("no topic found")
+        parsed.confidence = 0.0
+        return parsed
+
+    limit_match = _LIMIT_RE.search(text)
+    if limit_match:
+        parsed.limit = _to_int(limit_match.group(1))
+        if parsed.limit <= 0:
+            confidence -= 0.5
+            parsed.notes.append("non-positive limit")
+
+    year_match = _YEAR_RE.search(text.replace(parsed.topic, " "))
+    if year_match:
+        keyword = " ".join(year_match.group(1).lower().split())
+        year = int(year_match.group(2))
+        if keyword == "since":
+            parsed.year, parsed.year_filter = year - 1, "after"  # 'since 2020' includes 2020
+        elif keyword == "prior to":
+            parsed.year, parsed.year_filter = year, "before"
+        else:
+            parsed.year, parsed.year_filter = year, keyword
+    elif re.search(r"\b\d{4}\b", text.replace(parsed.topic, " ")):
+        confidence -= 0.3
+        parsed.notes.append("year mentioned without in/before/after")
+
+    citation_match = _CITATIONS_RE.search(text)
+    plus_match = _CITATIONS_PLUS_RE.search(text)
+    if citation_match:
+        comparator = " ".join(citation_match.group(1).lower().split())
+        count = int(citation_match.group(2).replace(",", ""))
+        if count < 0:
+            confidence = 0.0
+            parsed.notes.append("negative citation count")
+        elif comparator in ("more than", "over", "greater than", "above"):
+            parsed.min_citations = count + 1  # S2's minCitationCount is inclusive
+        else:
+            parsed.min_citations = count
+            if comparator == "exactly":
+                confidence -= 0.5
+                parsed.notes.append("exact citation count cannot be expressed as a minimum")
+            elif comparator == "with":
+                confidence -= 0.15
+                parsed.notes.append("'with N citations' read as a minimum")
+    elif plus_match:
+        parsed.min_citations = int(plus_match.group(1).replace(",", ""))
+    elif re.search(r"\bcit(?:ed|ations?)\b", text, re.IGNORECASE):
+        confidence -= 0.4
+        parsed.notes.append("citation constraint without a number")
+
+    outside_topic = text.lower().replace(parsed.topic.lower(), " ")
+    if _UPPER_BOUND_RE.search(outside_topic):
+        confidence -= 0.5
+        parsed.notes.append("upper bound on citations")
+    negation = _NEGATION_RE.search(outside_topic)
+    if negation:
+        confidence -= 0.5
+        parsed.notes.append(f"negation '{negation.group(0)}'")
+    # Constraints the regexes above did not turn into arguments
+    if len(_YEAR_NUMBER_RE.findall(outside_topic)) > 1:
+        confidence -= 0.5
+        parsed.notes.append("more than one year")
+    elif _YEAR_CONJUNCTION_RE.search(outside_topic):
+        confidence -= 0.5
+        parsed.notes.append("year clauses joined by 'or'/'and'")
+    # Case-sensitive checks need the original capitalisation; a leading capital is not a name
+    rest = re.sub(re.escape(parsed.topic), " ", text, flags=re.IGNORECASE)
+    rest = rest[:1].lower() + rest[1:]
+    if _LANGUAGE_RE.search(rest):
+        confidence -= 0.5
+        parsed.notes.append("language constraint")
+    elif _VENUE_RE.search(rest):
+        confidence -= 0.5
+        parsed.notes.append("venue constraint")
+    if _AUTHOR_RE.search(rest):
+        confidence -= 0.5
+        parsed.notes.append("author constraint")
+    for term in VAGUE_TERMS:
+        if re.search(rf"\b{term}\b", outside_topic):
+            confidence -= 0.5
+            parsed.notes.append(f"vague term '{term}'")
+
+    parsed.confidence = round(max(confidence, 0.0), 2)
+    return parsed
+
+
+# Prompts the regexes would read as the opposite constraint; none of them may take the fast path
+NEGATION_SELF_TEST_PROMPTS = (
+    "Find 3 papers on 'graph neural networks' with no more than 10 citations.",
+    "Find 3 papers on 'graph neural networks' not published before 2020.",
+    "Find 5 papers on 'reinforcement learning' with less than 50 citations.",
+    "Find 5 papers on 'reinforcement learning' with fewer than 50 citations published after 2019.",
+    "Find 2 papers on 'transformers' with under 100 citations.",
+    "Find 2 papers on 'transformers' with at most 100 citations.",
+    "Find 4 papers on 'federated learning' that weren't published in 2021.",
+)
+
+# Prompts with constraints the fast path would drop or read as a single year filter
+UNPARSED_CONSTRAINT_SELF_TEST_PROMPTS = (
+    "Find 3 papers on 'CRISPR' published in 2021 or 2022.",
+    "Find 3 papers on 'CRISPR' published after 2020 and before 2023.",
+    "Find 3 papers on 'CRISPR' published in 2020 or later.",
+    "Find 3 papers on 'CRISPR' by Jennifer Doudna.",
+    "Find 3 papers on 'CRISPR' in Nature published after 2018.",
+    "Find 3 papers on 'CRISPR' from the journal Science.",
+    "Find 3 papers on 'CRISPR' in French.",
+)
+
+
+if __name__ == "__main__":
+    from test_prompts import TEST_PROMPTS_FULL
+
+    for prompt in TEST_PROMPTS_FULL:
+        result = parse_search_request(prompt)
+        print(f"\n{prompt}\n  -> {result.to_tool_arguments()} confidence={result.confidence} fast_path={result.is_confident} notes={result.notes}")
+
+    print("\n--- Negations, upper bounds and unparsed constraints (must not take the fast path) ---")
+    failures = 0
+    for prompt in NEGATION_SELF_TEST_PROMPTS + UNPARSED_CONSTRAINT_SELF_TEST_PROMPTS:
+        result = parse_search_request(prompt)
+        failures += result.is_confident
+        print(f"{'FAIL' if result.is_confident else 'ok  '} {prompt} confidence={result.confidence} notes={result.notes}")
+    if failures:
+        raise SystemExit(f"{failures} self-test prompt(s) would take the fast path")
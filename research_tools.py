@@ -1,21 +1,65 @@
+from __future__ import annotations
+import logging
 import requests
 import os
-from dotenv import load_dotenv
 import json
 import traceback
+from concurrent.futures import ThreadPoolExecutor
+from s2_client import get_s2_client
+from response_cache import ResponseCache, make_cache_key
+from paper_index import get_local_index
+from paper_records import PaperRecord, PAPER_FIELDS, OUTPUT_FORMATS, s2_fields_param, encode_paper_records
+from result_reuse import get_result_store
+from stage_metrics import stage_timer
+from tracing import configure_logging, current_span, span
+from typing import TYPE_CHECKING
+
+# asyncio and httpx are imported inside the async variants only, to keep tool-only startup fast
+if TYPE_CHECKING:
+    import httpx
 
 # Semantic Scholar API endpoint
 S2_API_URL = "https://api.semanticscholar.org/graph/v1/paper/search/bulk"
 
+# "api" queries Semantic Scholar, "local" queries the offline index built with paper_index.py
+S2_SEARCH_BACKEND = os.getenv("S2_SEARCH_BACKEND", "api")
+
+# Response cache for S2 pages (set S2_CACHE_DISABLED=1 to bypass it entirely)
+S2_CACHE_PATH = os.path.join(".cache", "s2", "cache.db")
+S2_CACHE_TTL_SECONDS = 24 * 60 * 60
+S2_CACHE_MAX_MEMORY_ENTRIES = 256
+S2_CACHE_MAX_DISK_ENTRIES = 5000
+
+# Upper bound on concurrent S2 searches issued by search_research_papers_batch
+S2_BATCH_MAX_WORKERS = 4
+S2_BATCH_QUERY_KEYS = ("topic", "year", "year_filter", "min_citations", "limit", "fields", "max_authors")
+
+logger = logging.getLogger(__name__)
+
+_s2_cache = None
+
+def get_s2_cache() -> ResponseCache:
+    global _s2_cache
+    if _s2_cache is None:
+        _s2_cache = ResponseCache(
+            S2_CACHE_PATH,
+            ttl_seconds=S2_CACHE_TTL_SECONDS,
+            max_memory_entries=S2_CACHE_MAX_MEMORY_ENTRIES,
+            max_disk_entries=S2_CACHE_MAX_DISK_ENTRIES,
+            enabled=os.getenv("S2_CACHE_DISABLED", "").lower() not in ("1", "true", "yes"),
+        )
+    return _s2_cache
+
 def _construct_s2_api_params(
     topic: str,
     year: int = None,
     year_filter: str = None,
-    min_citations: int = None
+    min_citations: int = None,
+    fields: list = None
 ) -> dict:
     params = {
         'query': topic,
-        'fields': 'paperId,title,authors,year,citationCount,url,externalIds',
+        'fields': s2_fields_param(fields),
     }
     if year is not None and year_filter is not None:
         if year_filter == "in":
@@ -25,7 +69,7 @@ def _construct_s2_api_params(
         elif year_filter == "after":
             params['year'] = f"{year + 1}-"
         else:
-            print(f"Warning: Invalid year_filter '{year_filter}'. Year filtering will be skipped.")
+            logger.warning("Invalid year_filter '%s'. Year filtering will be skipped.", year_filter)
     elif year is not None and year_filter is None:
         params['year'] = str(year)
 
@@ -34,25 +78,63 @@ def _construct_s2_api_params(
     return params
 
 def _format_paper_details(paper_s2_format: dict) -> dict | None:
-    paper_title = paper_s2_format.get('title')
-    if not paper_title:
-        return None # Skip papers without titles
-
-    return {
-        "paperId": paper_s2_format.get('paperId'),
-        "title": paper_title,
-        "authors": ", ".join([author['name'] for author in paper_s2_format.get('authors', []) if author.get('name')]),
-        "year": paper_s2_format.get('year'),
-        "citationCount": paper_s2_format.get('citationCount', 0),
-        "url": paper_s2_format.get('url'),
-        "doi": paper_s2_format.get('externalIds', {}).get('DOI')
-    }
+    paper_record = PaperRecord.from_s2(paper_s2_format)
+    return paper_record.to_dict() if paper_record else None
+
+# Cache key for one page request: normalized query params plus the pagination token.
+def _s2_cache_key(api_params: dict) -> str:
+    normalized = {key: str(value) for key, value in api_params.items()}
+    normalized['query'] = " ".join(normalized.get('query', '').lower().split())
+    return make_cache_key({"url": S2_API_URL, "params": normalized})
+
+def _fetch_s2_page(api_params: dict, headers: dict, use_cache: bool = True) -> dict:
+    with span("s2.page", backend=S2_SEARCH_BACKEND, paged='token' in api_params) as page_span:
+        if S2_SEARCH_BACKEND == "local":
+            return get_local_index().search_page(api_params)
+
+        cache_key = _s2_cache_key(api_params)
+        if use_cache:
+            cached_page = get_s2_cache().get(cache_key)
+            if cached_page is not None:
+                page_span.set_attribute("cache_hit", True)
+                return cached_page
+
+        with stage_timer("s2_page"):
+            response = get_s2_client().get(S2_API_URL, headers=headers, params=api_params)
+            response.raise_for_status()
+            data = response.json()
+        page_span.set_attributes(cache_hit=False, status=response.status_code, bytes=len(response.content))
+        if use_cache:
+            get_s2_cache().set(cache_key, data)
+        return data
+
+async def _afetch_s2_page(api_params: dict, headers: dict, use_cache: bool = True) -> dict:
+    with span("s2.page", backend=S2_SEARCH_BACKEND, paged='token' in api_params) as page_span:
+        if S2_SEARCH_BACKEND == "local":
+            import asyncio
+            return await asyncio.to_thread(get_local_index().search_page, api_params)
+
+        cache_key = _s2_cache_key(api_params)
+        if use_cache:
+            cached_page = get_s2_cache().get(cache_key)
+            if cached_page is not None:
+                page_span.set_attribute("cache_hit", True)
+                return cached_page
+
+        with stage_timer("s2_page"):
+            response = await get_s2_client().aget(S2_API_URL, headers=headers, params=api_params)
+            response.raise_for_status()
+            data = response.json()
+        page_span.set_attributes(cache_hit=False, status=response.status_code, bytes=len(response.content))
+        if use_cache:
+            get_s2_cache().set(cache_key, data)
+        return data
 
 def _handle_request_errors(e: requests.exceptions.RequestException, response_obj=None) -> str:
     if isinstance(e, requests.exceptions.HTTPError):
         error_content = "Could not retrieve error content from response."
         try:
-            if response_obj and hasattr(response_obj, 'text'):
+            if response_obj is not None and hasattr(response_obj, 'text'):
                 error_content = response_obj.text
         except Exception:
             pass
@@ -64,61 +146,349 @@ def _handle_request_errors(e: requests.exceptions.RequestException, response_obj
     else: 
         return json.dumps({"error": f"An unexpected error occurred with the request: {e}"})
 
+# Follows S2 pagination tokens, yielding PaperRecords page by page until `limit` is reached.
+# Narrower repeats of a recent query are served from its result set (see result_reuse.py).
+# With capture_results=False the fetched pages are not kept for reuse, so streaming a large
+# limit holds one page at a time.
+def _iter_papers(api_params: dict, headers: dict, limit: int, use_cache: bool = True, capture_results: bool = True):
+    if use_cache:
+        reused_papers = get_result_store().lookup(api_params, limit)
+        if reused_papers is not None:
+            current_span().set_attribute("reused_result_set", True)
+            yield from reused_papers
+            return
+    result_set = get_result_store().start(api_params) if use_cache and capture_results else None
+
+    found = 0
+    next_token = None
+    data = None
+
+    while found < limit:
+        current_api_params = api_params.copy()
+        if next_token:
+            current_api_params['token'] = next_token
+        else:
+            current_api_params.pop('token', None)
+
+        data = _fetch_s2_page(current_api_params, headers, use_cache=use_cache)
+        if result_set is not None:
+            result_set.add_page(data.get('data') or [])
+
+        page_records = []
+        with stage_timer("paper_parse"):
+            for paper_s2_format in data.get('data') or []:
+                paper_record = PaperRecord.from_s2(paper_s2_format)
+                if paper_record:
+                    page_records.append(paper_record)
+                if found + len(page_records) >= limit:
+                    break
+        found += len(page_records)
+        yield from page_records
+
+        if 'token' in data and data['token'] and found < limit:
+            next_token = data['token']
+        else:
+            break
+
+    if result_set is not None and data is not None:
+        result_set.complete = not data.get('token')
+        get_result_store().store(result_set)
+
+def _collect_papers(api_params: dict, headers: dict, limit: int, use_cache: bool = True) -> list:
+    return list(_iter_papers(api_params, headers, limit, use_cache=use_cache))
+
+# Compact (non-indented) JSON for streamed records
+def _dumps_compact(obj) -> str:
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+
+def _handle_async_request_errors(e: httpx.HTTPError) -> str:
+    import httpx
+
+    if isinstance(e, httpx.HTTPStatusError):
+        return json.dumps({"error": f"HTTP error occurred: {e}", "details": e.response.text})
+    elif isinstance(e, httpx.ConnectError):
+        return json.dumps({"error": f"Connection error occurred: {e}"})
+    elif isinstance(e, httpx.TimeoutException):
+        return json.dumps({"error": f"Timeout error occurred: {e}"})
+    else:
+        return json.dumps({"error": f"An unexpected error occurred with the request: {e}"})
+
 def search_research_papers(
     topic: str,
     year: int = None,
     year_filter: str = None,
     min_citations: int = None,
-    limit: int = 5
+    limit: int = 5,
+    fields: list = None,
+    output_format: str = "json",
+    max_authors: int = None,
+    use_cache: bool = True
 ) -> str:
     if not topic:
         return json.dumps({"error": "Topic cannot be empty."})
+    if output_format not in OUTPUT_FORMATS:
+        return json.dumps({"error": f"Invalid output_format '{output_format}'. Use one of {list(OUTPUT_FORMATS)}."})
 
     headers = {}
     # if SEMANTIC_SCHOLAR_API_KEY: # uncomment if i have an API key
     #     headers['x-api-key'] = SEMANTIC_SCHOLAR_API_KEY
 
-    api_params = _construct_s2_api_params(topic, year, year_filter, min_citations)
-    print(f"🔍 Searching Semantic Scholar (bulk) with params: {api_params} and headers: {headers}")
+    try:
+        api_params = _construct_s2_api_params(topic, year, year_filter, min_citations, fields)
+    except ValueError as e:
+        return json.dumps({"error": str(e)})
+    logger.info("🔍 Searching Semantic Scholar (bulk) with params: %s and headers: %s", api_params, headers)
 
-    all_found_papers = []
-    next_token = None
-    current_response = None
+    with span("tool.search_research_papers", topic=topic, limit=limit, output_format=output_format) as tool_span:
+        try:
+            all_found_papers = _collect_papers(api_params, headers, limit, use_cache=use_cache)
+            tool_span.set_attribute("papers_returned", min(len(all_found_papers), limit))
+
+            if not all_found_papers:
+                return json.dumps({"message": "No papers found matching your criteria."})
+            with stage_timer("paper_format"):
+                return encode_paper_records(all_found_papers[:limit], fields, output_format, max_authors)
+
+        except requests.exceptions.RequestException as req_err:
+            tool_span.set_attribute("error", f"{type(req_err).__name__}: {req_err}")
+            return _handle_request_errors(req_err, req_err.response)
+        except Exception as e: 
+            tool_span.set_attribute("error", f"{type(e).__name__}: {e}")
+            return json.dumps({"error": f"An unexpected programming error occurred: {str(e)}", "trace": traceback.format_exc()})
 
-    try:
-        while len(all_found_papers) < limit:
-            current_api_params = api_params.copy()
-            if next_token:
-                current_api_params['token'] = next_token
-            else:
-                current_api_params.pop('token', None)
-
-            current_response = requests.get(S2_API_URL, headers=headers, params=current_api_params, timeout=20)
-            current_response.raise_for_status() 
-            data = current_response.json()
-
-            if 'data' in data and data['data']:
-                for paper_s2_format in data['data']:
-                    formatted_paper = _format_paper_details(paper_s2_format)
-                    if formatted_paper:
-                        all_found_papers.append(formatted_paper)
-                    if len(all_found_papers) >= limit:
-                        break
-
-            if 'token' in data and data['token'] and len(all_found_papers) < limit:
-                next_token = data['token']
-            else:
-                break
-
-        if not all_found_papers:
-            return json.dumps({"message": "No papers found matching your criteria."})
-        return json.dumps(all_found_papers[:limit], indent=2)
 
+def iter_research_papers(
+    topic: str,
+    year: int = None,
+    year_filter: str = None,
+    min_citations: int = None,
+    limit: int = 5,
+    fields: list = None,
+    max_authors: int = None,
+    use_cache: bool = True
+):
+    """
+    Streaming variant of search_research_papers: yields each paper dict as soon as its
+    page has been parsed. Request errors are raised to the caller. Only the current page is
+    held in memory; the pages are not stored for result reuse (an earlier result set can
+    still serve the stream).
+    """
+    if not topic:
+        raise ValueError("Topic cannot be empty.")
+    api_params = _construct_s2_api_params(topic, year, year_filter, min_citations, fields)
+    logger.info("🔍 Searching Semantic Scholar (bulk, streaming) with params: %s", api_params)
+    for paper_record in _iter_papers(api_params, {}, limit, use_cache=use_cache, capture_results=False):
+        yield paper_record.to_dict(fields, max_authors)
+
+def stream_research_papers(
+    topic: str,
+    year: int = None,
+    year_filter: str = None,
+    min_citations: int = None,
+    limit: int = 5,
+    fields: list = None,
+    max_authors: int = None,
+    use_cache: bool = True
+):
+    """
+    Yields one compact JSON line per paper (NDJSON), for UIs and exporters that want the
+    first results early. Errors and "no results" are yielded as a final JSON line with
+    the same shape search_research_papers returns.
+    """
+    if not topic:
+        yield _dumps_compact({"error": "Topic cannot be empty."})
+        return
+
+    found_any = False
+    try:
+        for paper in iter_research_papers(topic, year, year_filter, min_citations, limit, fields, max_authors, use_cache):
+            found_any = True
+            yield _dumps_compact(paper)
     except requests.exceptions.RequestException as req_err:
-        return _handle_request_errors(req_err, current_response)
-    except Exception as e: 
-        return json.dumps({"error": f"An unexpected programming error occurred: {str(e)}", "trace": traceback.format_exc()})
+        yield _handle_request_errors(req_err, req_err.response)
+        return
+    except Exception as e:
+        yield _dumps_compact({"error": f"An unexpected programming error occurred: {str(e)}"})
+        return
+
+    if not found_any:
+        yield _dumps_compact({"message": "No papers found matching your criteria."})
+
+
+async def asearch_research_papers(
+    topic: str,
+    year: int = None,
+    year_filter: str = None,
+    min_citations: int = None,
+    limit: int = 5,
+    fields: list = None,
+    output_format: str = "json",
+    max_authors: int = None,
+    use_cache: bool = True
+) -> str:
+    """
+    Async counterpart of search_research_papers for async agent runtimes.
 
+    The next page's token is only known once the current page is decoded, so the
+    request for page N+1 is started right after that and runs while page N is
+    formatted. It is cancelled as soon as the limit is met.
+    """
+    if not topic:
+        return json.dumps({"error": "Topic cannot be empty."})
+    if output_format not in OUTPUT_FORMATS:
+        return json.dumps({"error": f"Invalid output_format '{output_format}'. Use one of {list(OUTPUT_FORMATS)}."})
+
+    import asyncio
+    import httpx
+
+    headers = {}
+    try:
+        api_params = _construct_s2_api_params(topic, year, year_filter, min_citations, fields)
+    except ValueError as e:
+        return json.dumps({"error": str(e)})
+    logger.info("🔍 Searching Semantic Scholar (bulk, async) with params: %s and headers: %s", api_params, headers)
+
+    with span("tool.search_research_papers", topic=topic, limit=limit, output_format=output_format, mode="async") as tool_span:
+        reused_papers = get_result_store().lookup(api_params, limit) if use_cache else None
+        if reused_papers is not None:
+            tool_span.set_attributes(reused_result_set=True, papers_returned=len(reused_papers))
+            if not reused_papers:
+                return json.dumps({"message": "No papers found matching your criteria."})
+            with stage_timer("paper_format"):
+                return encode_paper_records(reused_papers, fields, output_format, max_authors)
+        result_set = get_result_store().start(api_params) if use_cache else None
+
+        all_found_papers = []
+        pending_page = asyncio.ensure_future(_afetch_s2_page(api_params.copy(), headers, use_cache=use_cache))
+
+        try:
+            while pending_page is not None:
+                data = await pending_page
+                pending_page = None
+                page_papers = data.get('data') or []
+                if result_set is not None:
+                    result_set.add_page(page_papers)
+
+                # Only prefetch when this page cannot satisfy the limit on its own
+                next_token = data.get('token')
+                if next_token and len(all_found_papers) + len(page_papers) < limit:
+                    next_params = {**api_params, 'token': next_token}
+                    pending_page = asyncio.ensure_future(_afetch_s2_page(next_params, headers, use_cache=use_cache))
+
+                with stage_timer("paper_parse"):
+                    for paper_s2_format in page_papers:
+                        paper_record = PaperRecord.from_s2(paper_s2_format)
+                        if paper_record:
+                            all_found_papers.append(paper_record)
+                        if len(all_found_papers) >= limit:
+                            break
+
+                if len(all_found_papers) >= limit:
+                    break
+                if pending_page is None and next_token:
+                    # Papers without titles were skipped, so one more page is needed after all
+                    next_params = {**api_params, 'token': next_token}
+                    pending_page = asyncio.ensure_future(_afetch_s2_page(next_params, headers, use_cache=use_cache))
+
+            if result_set is not None:
+                result_set.complete = not data.get('token')
+                get_result_store().store(result_set)
+            tool_span.set_attribute("papers_returned", min(len(all_found_papers), limit))
+            if not all_found_papers:
+                return json.dumps({"message": "No papers found matching your criteria."})
+            with stage_timer("paper_format"):
+                return encode_paper_records(all_found_papers[:limit], fields, output_format, max_authors)
+
+        except httpx.HTTPError as req_err:
+            tool_span.set_attribute("error", f"{type(req_err).__name__}: {req_err}")
+            return _handle_async_request_errors(req_err)
+        except Exception as e:
+            tool_span.set_attribute("error", f"{type(e).__name__}: {e}")
+            return json.dumps({"error": f"An unexpected programming error occurred: {str(e)}", "trace": traceback.format_exc()})
+        finally:
+            if pending_page is not None and not pending_page.done():
+                pending_page.cancel()
+
+# Identity keys used to spot the same paper returned by different queries.
+def _paper_identity_keys(paper: PaperRecord) -> list:
+    keys = []
+    if paper.paperId:
+        keys.append(("paperId", paper.paperId))
+    if paper.doi:
+        keys.append(("doi", paper.doi.lower()))
+    return keys
+
+def _run_batch_query(query: dict, use_cache: bool = True) -> list:
+    unknown_keys = set(query) - set(S2_BATCH_QUERY_KEYS)
+    if unknown_keys:
+        raise ValueError(f"Unknown query fields: {sorted(unknown_keys)}")
+    if not query.get("topic"):
+        raise ValueError("Topic cannot be empty.")
+
+    api_params = _construct_s2_api_params(
+        query["topic"], query.get("year"), query.get("year_filter"), query.get("min_citations"), query.get("fields")
+    )
+    logger.info("🔍 Searching Semantic Scholar (bulk, batch) with params: %s", api_params)
+    return _collect_papers(api_params, {}, query.get("limit", 5), use_cache=use_cache)
+
+def search_research_papers_batch(
+    queries: list,
+    max_workers: int = S2_BATCH_MAX_WORKERS,
+    use_cache: bool = True
+) -> str:
+    """
+    Runs several search_research_papers queries concurrently and merges the results.
+
+    Papers returned by more than one query (same paperId or DOI) are listed once and
+    tagged with every query index that found them.
+    """
+    if not queries:
+        return json.dumps({"error": "At least one query is required."})
+    if not all(isinstance(query, dict) for query in queries):
+        return json.dumps({"error": "Each query must be an object with at least a 'topic'."})
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(queries)))) as executor:
+        futures = [executor.submit(_run_batch_query, query, use_cache) for query in queries]
+
+    merged_papers = []
+    papers_by_key = {}
+    query_summaries = []
+    for query_index, (query, future) in enumerate(zip(queries, futures)):
+        summary = {"query_index": query_index, "query": query}
+        try:
+            papers = future.result()
+        except requests.exceptions.RequestException as req_err:
+            summary["error"] = json.loads(_handle_request_errors(req_err, req_err.response))["error"]
+            query_summaries.append(summary)
+            continue
+        except Exception as e:
+            summary["error"] = str(e)
+            query_summaries.append(summary)
+            continue
+
+        new_papers = 0
+        for paper in papers:
+            identity_keys = _paper_identity_keys(paper)
+            existing = next((papers_by_key[key] for key in identity_keys if key in papers_by_key), None)
+            if existing is not None:
+                if query_index not in existing["query_indices"]:
+                    existing["query_indices"].append(query_index)
+                continue
+            merged_paper = {**paper.to_dict(query.get("fields"), query.get("max_authors")), "query_indices": [query_index]}
+            merged_papers.append(merged_paper)
+            for key in identity_keys:
+                papers_by_key[key] = merged_paper
+            new_papers += 1
+
+        summary["papers_found"] = len(papers)
+        summary["new_unique_papers"] = new_papers
+        query_summaries.append(summary)
+
+    if not merged_papers and all("error" in summary for summary in query_summaries):
+        return json.dumps({"error": "All queries failed.", "queries": query_summaries})
+    if not merged_papers:
+        return json.dumps({"message": "No papers found matching your criteria.", "queries": query_summaries})
+    return json.dumps({"papers": merged_papers, "queries": query_summaries})
 
 
 search_research_papers_tool_schema = {
@@ -151,13 +521,54 @@ Returns a JSON string containing a list of found papers or an error message.""",
                 "description": "Optional. The maximum number of papers to return. Defaults to 5 if not specified by the user, but the agent can choose a different limit if appropriate.",
                 "default": 5,
             },
+            "fields": {
+                "type": "array",
+                "description": "Optional. Only return these fields for each paper (e.g., ['title', 'year', 'citationCount']). Defaults to all fields.",
+                "items": {"type": "string", "enum": list(PAPER_FIELDS)},
+            },
+            "max_authors": {
+                "type": "integer",
+                "description": "Optional. List at most this many authors per paper, followed by 'et al.'.",
+            },
+            "output_format": {
+                "type": "string",
+                "description": "Optional. 'json' (a JSON list, default) or 'table' (a header row followed by one CSV row per paper, which is shorter).",
+                "enum": list(OUTPUT_FORMATS),
+                "default": "json",
+            },
         },
         "required": ["topic"],
     },
 }
 
+search_research_papers_batch_tool_schema = {
+    "name": "search_research_papers_batch",
+    "description": """Runs several Semantic Scholar searches at once (e.g. different phrasings of the same topic)
+and returns one merged, de-duplicated JSON result. Each query takes the same fields as search_research_papers.
+Prefer this over several separate search_research_papers calls.""",
+    "parameters": {
+        "type": "object",
+        "properties": {
+            "queries": {
+                "type": "array",
+                "description": "The searches to run. Each item has the same fields as the search_research_papers parameters.",
+                "items": {
+                    **search_research_papers_tool_schema["parameters"],
+                    "properties": {
+                        name: prop for name, prop in search_research_papers_tool_schema["parameters"]["properties"].items()
+                        if name in S2_BATCH_QUERY_KEYS
+                    },
+                },
+                "minItems": 1,
+            },
+        },
+        "required": ["queries"],
+    },
+}
+
 # basic tests
 if __name__ == "__main__":
+    configure_logging()
     print("--- Testing search_research_papers (using /paper/search/bulk) ---")
 
     # Test Case 1 Basic topic search
@@ -201,6 +612,37 @@ if __name__ == "__main__":
     #print(results8)
 
 
+    # Test Case 9: Repeat of Test Case 1, should be served from the response cache
+    print("\nTest Case 9: Repeat of Test Case 1 (cached)")
+    results9 = search_research_papers(topic="machine learning", limit=2)
+    print(results9)
+
+    # Test Case 10: Async variant with page prefetch
+    print("\nTest Case 10: Async search (graph neural networks, limit 3)")
+    import asyncio
+    results10 = asyncio.run(asearch_research_papers(topic="graph neural networks", limit=3))
+    print(results10)
+
+    # Test Case 11: Batch of topic variants, merged and de-duplicated
+    print("\nTest Case 11: Batch search (transformer NLP variants)")
+    results11 = search_research_papers_batch([
+        {"topic": "transformer NLP", "limit": 3},
+        {"topic": "transformers language models", "limit": 3},
+    ])
+    print(results11)
+
+    # Test Case 12: Streaming, one compact JSON line per paper
+    print("\nTest Case 12: Streaming search (deep learning, limit 3)")
+    for line in stream_research_papers(topic="deep learning", limit=3):
+        print(line)
+
+    # Test Case 13: Projected fields in the compact table encoding
+    print("\nTest Case 13: Table output with projected fields (machine learning, limit 3)")
+    results13 = search_research_papers(topic="machine learning", limit=3, fields=["title", "year", "citationCount"], output_format="table")
+    print(results13)
+
+    print(f"\nS2 client connection stats: {get_s2_client().stats()}")
+    print(f"S2 response cache stats: {get_s2_cache().stats()}")
     print("\n--- Testing Finished ---")
 
 
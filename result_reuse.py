@@ -0,0 +1,215 @@
+import os
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from dataclasses import dataclass
+from paper_records import PaperRecord
+
+# In-memory store of recent S2 result sets. A narrower follow-up query (same topic, tighter
+# year range or higher citation floor) is answered by filtering a broader cached set instead
+# of paginating S2 again. Turned off together with the S2 page cache (S2_CACHE_DISABLED=1).
+RESULT_REUSE_MAX_SETS = 32
+RESULT_REUSE_TTL_SECONDS = 60 * 60
+
+
+@dataclass(frozen=True, slots=True)
+class QueryConstraints:
+    topic: str
+    year_min: int | None
+    year_max: int | None
+    min_citations: int
+    fields: frozenset
+
+    @classmethod
+    def from_api_params(cls, api_params: dict) -> "QueryConstraints | None":
+        """Constraints of an S2 bulk search request, or None if the request cannot be reused (e.g. it is paginated)."""
+        if api_params.get("token"):
+            return None
+        year_range = _parse_year_param(api_params.get("year"))
+        if year_range is None:
+            return None
+        return cls(
+            topic=" ".join(str(api_params.get("query", "")).lower().split()),
+            year_min=year_range[0],
+            year_max=year_range[1],
+            min_citations=max(int(api_params.get("minCitationCount") or 0), 0),
+            fields=frozenset(str(api_params.get("fields", "")).split(",")),
+        )
+
+    # True if every paper matching `other` also matches self, and self fetched the fields needed to tell.
+    def covers(self, other: "QueryConstraints") -> bool:
+        if self.topic != other.topic or not other.fields <= self.fields:
+            return False
+        if self.year_min is not None and (other.year_min is None or other.year_min < self.year_min):
+            return False
+        if self.year_max is not None and (other.year_max is None or other.year_max > self.year_max):
+            return False
+        if other.min_citations < self.min_citations:
+            return False
+        narrower_years = (other.year_min, other.year_max) != (self.year_min, self.year_max)
+        if narrower_years and "year" not in self.fields:
+            return False
+        return other.min_citations == self.min_citations or "citationCount" in self.fields
+
+
+# S2 year parameter ("2021", "-2019", "2023-", "2019-2021") -> (min, max); (None, None) when absent.
+def _parse_year_param(year_param) -> tuple | None:
+    if not year_param:
+        return (None, None)
+    start, separator, end = str(year_param).partition("-")
+    try:
+        if not separator:
+            return (int(start), int(start))
+        return (int(start) if start else None, int(end) if end else None)
+    except ValueError:
+        return None
+
+
+class ResultSet:
+    """
+    Papers from the S2 pages fetched for one query, in S2 order. Raw pages are kept until
+    the first lookup, which parses them once and builds sorted year and citation indexes.
+    """
+
+    def __init__(self, constraints: QueryConstraints):
+        self.constraints = constraints
+        self.complete = False  # True once S2 had no further pages for this query
+        self.created_at = time.monotonic()
+        self._pages = []
+        self._records = None
+        self._year_index = None
+        self._citation_index = None
+
+    def add_page(self, page_papers: list) -> None:
+        self._pages.append(page_papers)
+
+    def _build_index(self) -> None:
+        records = [record for page in self._pages for record in map(PaperRecord.from_s2, page) if record]
+        self._pages = []
+        self._records = records
+        self._year_index = sorted((record.year, position) for position, record in enumerate(records) if record.year is not None)
+        self._citation_index = sorted((record.citationCount, position) for position, record in enumerate(records))
+
+    def filter(self, constraints: QueryConstraints, limit: int) -> list | None:
+        """The first `limit` papers matching the narrower constraints, or None if this set may hold too few."""
+        if self._records is None:
+            self._build_index()
+        low, high = constraints.year_min, constraints.year_max
+        has_year_filter = (low, high) != (None, None)
+
+        # Start from whichever index narrows the candidates more, then apply the other filter
+        if has_year_filter:
+            start = bisect_left(self._year_index, (low,)) if low is not None else 0
+            end = bisect_right(self._year_index, (high, len(self._records))) if high is not None else len(self._year_index)
+            year_candidates = end - start
+        else:
+            year_candidates = len(self._records)
+        citation_start = bisect_left(self._citation_index, (constraints.min_citations,))
+        citation_candidates = len(self._citation_index) - citation_start
+
+        if has_year_filter and year_candidates <= citation_candidates:
+            positions = [position for _, position in self._year_index[start:end]
+                         if self._records[position].citationCount >= constraints.min_citations]
+        else:
+            positions = [position for _, position in self._citation_index[citation_start:]
+                         if not has_year_filter or _year_in_range(self._records[position].year, low, high)]
+        positions.sort()
+
+        if len(positions) < limit and not self.complete:
+            return None
+        return [self._records[position] for position in positions[:limit]]
+
+
+def _year_in_range(year, low, high) -> bool:
+    return year is not None and (low is None or year >= low) and (high is None or year <= high)
+
+
+class ResultStore:
+    """LRU of recent result sets, looked up by query subsumption."""
+
+    def __init__(self, max_sets: int = RESULT_REUSE_MAX_SETS, ttl_seconds: float = RESULT_REUSE_TTL_SECONDS, enabled: bool = True):
+        self.max_sets = max_sets
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self._sets = OrderedDict()  # constraints -> ResultSet
+        self._lock = threading.Lock()
+        self._stats = {"exact_hits": 0, "subsumed_hits": 0, "misses": 0, "sets_stored": 0}
+
+    def lookup(self, api_params: dict, limit: int) -> list | None:
+        """Papers for the request if a cached result set answers it, else None."""
+        constraints = QueryConstraints.from_api_params(api_params) if self.enabled else None
+        if constraints is None:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            for key in [key for key, result_set in self._sets.items() if now - result_set.created_at > self.ttl_seconds]:
+                del self._sets[key]
+            # Most recently stored sets first; they are the likeliest to be the broader query just run
+            for key, result_set in reversed(self._sets.items()):
+                if not result_set.constraints.covers(constraints):
+                    continue
+                papers = result_set.filter(constraints, limit)
+                if papers is None:
+                    continue
+                self._sets.move_to_end(key)
+                self._stats["exact_hits" if key == constraints else "subsumed_hits"] += 1
+                return papers
+            self._stats["misses"] += 1
+        return None
+
+    def start(self, api_params: dict) -> ResultSet | None:
+        """A ResultSet to fill while the request is paginated, or None if it cannot be reused."""
+        constraints = QueryConstraints.from_api_params(api_params) if self.enabled else None
+        return ResultSet(constraints) if constraints is not None else None
+
+    def store(self, result_set: ResultSet) -> None:
+        with self._lock:
+            self._sets[result_set.constraints] = result_set
+            self._sets.move_to_end(result_set.constraints)
+            while len(self._sets) > self.max_sets:
+                self._sets.popitem(last=False)
+            self._stats["sets_stored"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sets.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"sets": len(self._sets), **self._stats}
+
+
+_result_store = None
+_result_store_lock = threading.Lock()
+
+
+def get_result_store() -> ResultStore:
+    global _result_store
+    if _result_store is None:
+        with _result_store_lock:
+            if _result_store is None:
+                _result_store = ResultStore(enabled=os.getenv("S2_CACHE_DISABLED", "").lower() not in ("1", "true", "yes"))
+    return _result_store
+
+
+if __name__ == "__main__":
+    import random
+
+    rng = random.Random(0)
+    page = [{"paperId": f"p{i:04d}", "title": f"Paper {i}", "year": rng.randint(2015, 2024), "citationCount": rng.randint(0, 500)} for i in range(1000)]
+    store = ResultStore()
+    broad = {"query": "graph neural networks", "fields": "paperId,title,year,citationCount", "year": "2016-"}
+    result_set = store.start(broad)
+    result_set.add_page(page)
+    result_set.complete = True
+    store.store(result_set)
+
+    for narrower in ({"year": "2023-"}, {"year": "2023-", "minCitationCount": 50}, {"year": "2021", "minCitationCount": 450}):
+        params = {**broad, **narrower}
+        started = time.perf_counter()
+        papers = store.lookup(params, limit=3)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        print(f"{narrower}: {[(p.paperId, p.year, p.citationCount) for p in papers]} in {elapsed_ms:.3f} ms")
+    print(f"Not covered (wider years): {store.lookup({**broad, 'year': '2010-'}, limit=3)}")
+    print(f"Result store stats: {store.stats()}")
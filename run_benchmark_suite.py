@@ -0,0 +1,138 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from stage_metrics import STAGES, enable_stage_metrics, reset_stage_metrics, stage_timer, summarize_stages
+from test_prompts import TEST_PROMPTS_FULL
+from tracing import configure_logging
+
+DEFAULT_ITERATIONS = 3
+# A stage counts as regressed when its p95 grows by more than this fraction over the baseline
+DEFAULT_MAX_REGRESSION = 0.20
+REGRESSION_PERCENTILE = "p95_ms"
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Times every completion the paper search assistant makes (the critic is timed separately).
+def _time_llm_turns(assistant) -> None:
+    original_create = assistant.client.create
+
+    def timed_create(*args, **kwargs):
+        with stage_timer("llm_turn"):
+            return original_create(*args, **kwargs)
+
+    assistant.client.create = timed_create
+
+
+def run_benchmark(prompt_indices: list, iterations: int, mode: str, cassette_path: str = None, run_critic: bool = True, stream: bool = False) -> dict:
+    """
+    Runs the given prompts `iterations` times through the agent (and critic) and returns
+    per-stage latency percentiles. "replay" serves every LLM and S2 exchange from a
+    cassette (see cassette.py); "live" talks to Mistral and Semantic Scholar.
+    """
+    if mode == "replay":
+        os.environ["CASSETTE_MODE"] = "replay"  # lets config.py load without a real API key
+        if cassette_path:
+            os.environ["CASSETTE_PATH"] = cassette_path
+    else:
+        # Cached pages and critic results would hide the latencies being measured
+        os.environ["S2_CACHE_DISABLED"] = "1"
+        os.environ["CRITIC_CACHE_DISABLED"] = "1"
+
+    from cassette import install_cassette_from_env
+    from evaluation import evaluate_agent_response
+    from main_agent import create_paper_search_agents, run_paper_search_chat
+
+    cassette = install_cassette_from_env() if mode == "replay" else None
+    user_proxy, assistant = create_paper_search_agents(stream=stream)
+    _time_llm_turns(assistant)
+
+    reset_stage_metrics()
+    enable_stage_metrics()
+    errors = []
+    started = time.perf_counter()
+    for iteration in range(iterations):
+        for index in prompt_indices:
+            prompt = TEST_PROMPTS_FULL[index]
+            try:
+                with stage_timer("case_total"):
+                    with stage_timer("agent_chat"):
+                        final_response, history = run_paper_search_chat(prompt, user_proxy, assistant)
+                    if run_critic and history:
+                        evaluate_agent_response(prompt, final_response, history, use_cache=False)
+            except Exception as e:
+                errors.append({"iteration": iteration, "prompt_index": index, "error": f"{type(e).__name__}: {e}"})
+    wall_seconds = time.perf_counter() - started
+    enable_stage_metrics(False)
+
+    stages = summarize_stages()
+    return {
+        "commit": _git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "mode": mode,
+        "iterations": iterations,
+        "prompt_indices": prompt_indices,
+        "critic": run_critic,
+        "stream": stream,
+        "wall_seconds": round(wall_seconds, 3),
+        "errors": errors,
+        "cassette": cassette.stats() if cassette is not None else None,
+        # Stages that never ran (e.g. no critic call) are listed with a zero count so runs diff cleanly
+        "stages": {stage: stages.get(stage, {"count": 0}) for stage in (*STAGES, *sorted(set(stages) - set(STAGES)))},
+    }
+
+
+# Compares two benchmark results stage by stage; returns the stages whose p95 grew too much.
+def compare_to_baseline(results: dict, baseline: dict, max_regression: float = DEFAULT_MAX_REGRESSION) -> list:
+    regressions = []
+    for stage, current in results["stages"].items():
+        previous = baseline.get("stages", {}).get(stage)
+        if not previous or not previous.get("count") or not current.get("count"):
+            continue
+        before, after = previous[REGRESSION_PERCENTILE], current[REGRESSION_PERCENTILE]
+        if before > 0 and (after - before) / before > max_regression:
+            regressions.append({"stage": stage, f"baseline_{REGRESSION_PERCENTILE}": before, REGRESSION_PERCENTILE: after,
+                                "change_percent": round((after - before) / before * 100, 1)})
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-stage latency benchmark (p50/p95/p99) over the test prompts.")
+    parser.add_argument("--mode", choices=["replay", "live"], default="replay", help="Replay a recorded cassette or call the live services.")
+    parser.add_argument("--cassette", default=None, help="Cassette to replay (default: CASSETTE_PATH or .cache/cassettes/evaluation.jsonl).")
+    parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS, help="How many times to run every prompt.")
+    parser.add_argument("--indices", type=int, nargs="*", default=None, help="Prompt indices to run (default: all).")
+    parser.add_argument("--no-critic", action="store_true", help="Only benchmark the agent, skip the critic.")
+    parser.add_argument("--stream", action="store_true", help="Stream the assistant's completions (adds llm_first_token / llm_tool_dispatch; live mode only).")
+    parser.add_argument("--output", default=None, help="Also write the JSON result to this file.")
+    parser.add_argument("--baseline", default=None, help="Earlier JSON result to compare against; exits with 1 on a regression.")
+    parser.add_argument("--max-regression", type=float, default=DEFAULT_MAX_REGRESSION, help="Allowed relative p95 increase per stage.")
+    args = parser.parse_args()
+    configure_logging(os.getenv("LOG_LEVEL", "WARNING"))  # per-case chatter would only slow the timed runs down
+
+    indices = args.indices if args.indices else list(range(len(TEST_PROMPTS_FULL)))
+    results = run_benchmark(indices, args.iterations, args.mode, args.cassette, run_critic=not args.no_critic, stream=args.stream)
+
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = compare_to_baseline(results, json.load(f), args.max_regression)
+        results["regressions"] = regressions
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    print(output)
+    if regressions:
+        sys.exit(1)
@@ -1,22 +1,23 @@
+import argparse
+import hashlib
 import json
-from main_agent import create_paper_search_agents, run_paper_search_chat
-from evaluation import evaluate_agent_response
-
-# Test Prompts
-TEST_PROMPTS_FULL = [
-    # A. Typical Prompts
-    "Find 3 research papers on 'transformer models in NLP' published in 2021 with more than 200 citations.",
-    "Show me one highly cited paper about 'CRISPR gene editing applications' published before 2019. By highly cited, I mean over 1000 citations.",
-    # B. Ambiguous Prompts
-    "I need some recent papers on reinforcement learning.",
-    "Find good papers about AI ethics.",
-    # C. Complex Requests
-    "Can you get me up to 5 papers on 'graph neural networks' published after 2022, but I only want those with at least 50 citations?",
-    # D. Edge Cases or Error-Inducing Prompts
-    "Find research papers on 'time travel feasibility' published in the year 2500.",
-    "Search for papers on '' with 10 citations.", # Empty topic
-    "I want papers on 'the history of aether physics' with exactly -5 citations published before 1900."
-]
+import logging
+import multiprocessing
+import os
+import queue
+import time
+import traceback
+import uuid
+from config import get_llm_config
+from critic_json import critic_parse_stats
+from main_agent import ASSISTANT_SYSTEM_MESSAGE, create_paper_search_agents, get_termination_reason, run_paper_search_chat
+from evaluation import CRITIC_SYSTEM_MESSAGE, evaluate_agent_response, evaluate_agent_responses_batch, get_critic_cache
+from research_tools import search_research_papers_tool_schema, search_research_papers_batch_tool_schema
+from test_prompts import TEST_PROMPTS_FULL
+from tracing import configure_logging, span
+
+logger = logging.getLogger(__name__)
+
 
 # Configuration for prompts
 # 2 = "I need some recent papers on reinforcement learning."
@@ -24,89 +25,337 @@ test_indices_to_run = [0]
 
 OUTPUT_FILE = "evaluation_results.jsonl"
 
+# Parallel runner defaults (override with --workers / --timeout)
+DEFAULT_WORKERS = 1
+DEFAULT_CASE_TIMEOUT_SECONDS = None  # None = no limit
+WORKER_POLL_SECONDS = 0.5
+
 all_evaluations = []
 
-def main():
-    print("--- Starting Evaluation Suite ---")
+
+# Content hash of everything that determines a case's result. Unchanged cases are skipped on rerun.
+def compute_case_hash(prompt_text: str) -> str:
+    model_config = [
+        {key: value for key, value in config.items() if key != "api_key"}
+        for config in get_llm_config()["config_list"]
+    ]
+    case_definition = {
+        "prompt": prompt_text,
+        "assistant_system_message": ASSISTANT_SYSTEM_MESSAGE,
+        "tool_schemas": [search_research_papers_tool_schema, search_research_papers_batch_tool_schema],
+        "model_config": model_config,
+        "critic_system_message": CRITIC_SYSTEM_MESSAGE,
+    }
+    canonical = json.dumps(case_definition, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def new_run_id() -> str:
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+
+
+# Successful records already in OUTPUT_FILE, by case hash (later runs win).
+def load_completed_cases() -> dict:
+    completed = {}
+    if not os.path.exists(OUTPUT_FILE):
+        return completed
+    with open(OUTPUT_FILE) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # e.g. a line cut off by a crash
+            if record.get("case_hash") and "error_during_processing" not in record:
+                completed[record["case_hash"]] = record
+    return completed
+
+
+# Runs the PaperSearchAgent and the critic for one prompt and returns the JSONL record.
+# With run_critic=False the conversation history is returned instead, for the batched critic.
+def run_test_case(prompt_id_in_run: int, prompt_index: int, prompt_text: str, user_proxy, assistant, run_critic: bool = True) -> dict:
+    with span("eval.case", prompt_id_in_run=prompt_id_in_run, overall_prompt_id=prompt_index + 1) as case_span:
+        result = _run_test_case(prompt_id_in_run, prompt_index, prompt_text, user_proxy, assistant, run_critic)
+        case_span.set_attribute("ok", "error_during_processing" not in result)
+        return result
+
+
+def _run_test_case(prompt_id_in_run: int, prompt_index: int, prompt_text: str, user_proxy, assistant, run_critic: bool) -> dict:
+    try:
+        # Run the PaperSearchAgent
+        agent_final_response, conversation_history = run_paper_search_chat(
+            task_message=prompt_text,
+            user_proxy=user_proxy,
+            assistant=assistant
+        )
+        termination_reason = get_termination_reason(user_proxy)
+
+        logger.info("\n--- Agent Interaction Summary (for this test case) ---\nAgent's Final User-Facing Response:\n%s", agent_final_response)
+
+        if not run_critic:
+            return {
+                "prompt_id_in_run": prompt_id_in_run,
+                "overall_prompt_id": prompt_index + 1,
+                "user_prompt": prompt_text,
+                "agent_final_response": agent_final_response,
+                "termination_reason": termination_reason,
+                "conversation_history": conversation_history
+            }
+
+        # Run the Critic Agent
+        if not conversation_history:
+            logger.warning("No conversation history was recorded. Skipping critic evaluation for this prompt.")
+            evaluation_result = {"error": "No conversation history available for critic."}
+        else:
+            evaluation_result = evaluate_agent_response(
+                user_prompt=prompt_text,
+                agent_final_response=agent_final_response,
+                conversation_history=conversation_history
+            )
+
+        logger.debug("\n--- Critic's Evaluation Result (for this test case) ---\n%s", json.dumps(evaluation_result, indent=2))
+
+        return {
+            "prompt_id_in_run": prompt_id_in_run,
+            "overall_prompt_id": prompt_index + 1,
+            "user_prompt": prompt_text,
+            "agent_final_response": agent_final_response,
+            "termination_reason": termination_reason,
+            "critic_evaluation": evaluation_result
+        }
+
+    except Exception as e:
+        logger.exception("ERROR occurred during Test Case %s for prompt: '%s'", prompt_id_in_run, prompt_text)
+        return {
+            "prompt_id_in_run": prompt_id_in_run,
+            "overall_prompt_id": prompt_index + 1,
+            "user_prompt": prompt_text,
+            "error_during_processing": str(e),
+            "traceback": traceback.format_exc()
+        }
+
+
+# Worker process: builds its own agent pair once, then runs the cases it is handed.
+# Under the spawn start method (the default on Windows) nothing set up in main() is
+# inherited, so logging and the cassette are set up again here.
+def _worker_loop(task_queue, result_queue, run_critic: bool) -> None:
+    from cassette import install_cassette_from_env
+
+    configure_logging()
+    install_cassette_from_env(resume=True)
+    user_proxy, assistant = create_paper_search_agents()
+    while True:
+        task = task_queue.get()
+        if task is None:
+            return
+        prompt_id_in_run, prompt_index, prompt_text = task
+        result_queue.put(run_test_case(prompt_id_in_run, prompt_index, prompt_text, user_proxy, assistant, run_critic))
+
+
+class _Worker:
+    def __init__(self, result_queue, run_critic: bool):
+        self.task_queue = multiprocessing.Queue()
+        self.process = multiprocessing.Process(target=_worker_loop, args=(self.task_queue, result_queue, run_critic), daemon=True)
+        self.process.start()
+        self.current_task = None
+        self.started_at = None
+
+    def assign(self, task) -> None:
+        self.current_task = task
+        self.started_at = time.monotonic()
+        self.task_queue.put(task)
+
+    def stop(self) -> None:
+        self.task_queue.put(None)
+
+    def kill(self) -> None:
+        self.process.terminate()
+        self.process.join(timeout=5)
+
+
+# Only the parent process writes to the output file, one complete line per case.
+# In batched-critic mode successful cases are held back until the critic has scored them.
+def _append_result(result: dict, run_context: dict) -> None:
+    if run_context["batch_critic"] and "conversation_history" in result:
+        run_context["awaiting_critic"].append(result)
+        return
+    result["run_id"] = run_context["run_id"]
+    result["case_hash"] = run_context["case_hashes"][result["prompt_id_in_run"]]
+    with open(OUTPUT_FILE, "a") as f:
+        f.write(json.dumps(result) + "\n")
+    logger.info("Results for Test Case %s appended to %s", result['prompt_id_in_run'], OUTPUT_FILE)
+
+
+def run_cases_sequentially(tasks: list, run_context: dict) -> list:
     print("Initializing agents for the evaluation suite...")
     user_proxy, assistant = create_paper_search_agents()
     print("Agents initialized.")
 
-    if test_indices_to_run is not None:
-        prompts_to_run = [TEST_PROMPTS_FULL[i] for i in test_indices_to_run]
-        print(f"Running a subset of {len(prompts_to_run)} test prompts.")
-    else:
-        prompts_to_run = TEST_PROMPTS_FULL
-        print(f"Running all {len(prompts_to_run)} test prompts.")
+    results = []
+    for prompt_id_in_run, prompt_index, prompt_text in tasks:
+        print(f"\n\n--- Test Case {prompt_id_in_run}/{len(tasks)} (Overall Index: {prompt_index + 1}) ---")
+        print(f"User Prompt: {prompt_text}")
+        result = run_test_case(prompt_id_in_run, prompt_index, prompt_text, user_proxy, assistant, not run_context["batch_critic"])
+        _append_result(result, run_context)
+        results.append(result)
+    return results
 
-    all_evaluations_summary = [] # To store critics output
 
-    with open(OUTPUT_FILE, "w") as f:
-        pass
+def run_cases_in_parallel(tasks: list, run_context: dict, workers: int, case_timeout: float = None) -> list:
+    """
+    Runs the cases on `workers` processes, each with its own agent pair. A case that runs
+    longer than case_timeout has its worker killed and replaced, and is recorded as timed out.
+    """
+    result_queue = multiprocessing.Queue()
+    pool = [_Worker(result_queue, not run_context["batch_critic"]) for _ in range(min(workers, len(tasks)))]
+    pending = list(tasks)
+    results = []
 
-    for i, prompt_text in enumerate(prompts_to_run):
-        current_prompt_index = test_indices_to_run[i] if test_indices_to_run else i
-        print(f"\n\n--- Test Case {i+1}/{len(prompts_to_run)} (Overall Index: {current_prompt_index + 1}) ---")
-        print(f"User Prompt: {prompt_text}")
+    while len(results) < len(tasks):
+        for worker in pool:
+            if worker.current_task is None and pending:
+                task = pending.pop(0)
+                logger.info("\n--- Dispatching Test Case %s/%d (Overall Index: %d) to worker %s ---", task[0], len(tasks), task[1] + 1, worker.process.pid)
+                worker.assign(task)
 
         try:
-            # Run the PaperSearchAgent
-            agent_final_response, conversation_history = run_paper_search_chat(
-                task_message=prompt_text,
-                user_proxy=user_proxy,
-                assistant=assistant   
-            )
+            result = result_queue.get(timeout=WORKER_POLL_SECONDS)
+        except queue.Empty:
+            result = None
 
-            print("\n--- Agent Interaction Summary (for this test case) ---")
-            print(f"Agent's Final User-Facing Response:\n{agent_final_response}")
+        if result is not None:
+            # Ignore late results from a case that was already recorded as timed out
+            owner = next((w for w in pool if w.current_task is not None and w.current_task[0] == result["prompt_id_in_run"]), None)
+            if owner is not None:
+                owner.current_task = None
+                _append_result(result, run_context)
+                results.append(result)
 
-            # Run the Critic Agent
-            if not conversation_history:
-                print("WARNING: No conversation history was recorded. Skipping critic evaluation for this prompt.")
-                evaluation_result = {"error": "No conversation history available for critic."}
-            else:
-                evaluation_result = evaluate_agent_response(
-                    user_prompt=prompt_text,
-                    agent_final_response=agent_final_response,
-                    conversation_history=conversation_history
-                )
-
-            print("\n--- Critic's Evaluation Result (for this test case) ---")
-            print(json.dumps(evaluation_result, indent=2))
-
-            current_evaluation_data = {
-                "prompt_id_in_run": i + 1,
-                "overall_prompt_id": current_prompt_index + 1,
-                "user_prompt": prompt_text,
-                "agent_final_response": agent_final_response,
-                "critic_evaluation": evaluation_result
-            }
-            all_evaluations_summary.append(evaluation_result)
-
-        except Exception as e:
-            print(f"ERROR occurred during Test Case {i+1} for prompt: '{prompt_text}'")
-            print(f"Error details: {e}")
-            import traceback
-            traceback.print_exc()
-            current_evaluation_data = {
-                "prompt_id_in_run": i + 1,
-                "overall_prompt_id": current_prompt_index + 1,
-                "user_prompt": prompt_text,
-                "error_during_processing": str(e),
-                "traceback": traceback.format_exc()
-            }
-        
-        # Save results to a file
-        with open(OUTPUT_FILE, "a") as f:
-            f.write(json.dumps(current_evaluation_data) + "\n")
-        print(f"Results for Test Case {i+1} appended to {OUTPUT_FILE}")
+        for i, worker in enumerate(pool):
+            if worker.current_task is None:
+                continue
+            elapsed = time.monotonic() - worker.started_at
+            timed_out = case_timeout is not None and elapsed > case_timeout
+            if timed_out or not worker.process.is_alive():
+                prompt_id_in_run, prompt_index, prompt_text = worker.current_task
+                reason = f"Timed out after {case_timeout} seconds" if timed_out else "Worker process died"
+                logger.error("%s during Test Case %s for prompt: '%s'", reason, prompt_id_in_run, prompt_text)
+                worker.kill()
+                timeout_result = {
+                    "prompt_id_in_run": prompt_id_in_run,
+                    "overall_prompt_id": prompt_index + 1,
+                    "user_prompt": prompt_text,
+                    "error_during_processing": reason,
+                }
+                _append_result(timeout_result, run_context)
+                results.append(timeout_result)
+                pool[i] = _Worker(result_queue, not run_context["batch_critic"])
+
+    for worker in pool:
+        worker.stop()
+    for worker in pool:
+        worker.process.join(timeout=5)
+        if worker.process.is_alive():
+            worker.kill()
+    return results
+
+
+# Scores every held-back case with as few critic calls as possible, then writes them out.
+def score_with_batched_critic(run_context: dict) -> list:
+    pending = run_context["awaiting_critic"]
+    run_context["awaiting_critic"] = []
+    run_context["batch_critic"] = False
 
+    batch_cases = [
+        {
+            "case_id": result["prompt_id_in_run"],
+            "user_prompt": result["user_prompt"],
+            "agent_final_response": result["agent_final_response"],
+            "conversation_history": result["conversation_history"],
+        }
+        for result in pending if result["conversation_history"]
+    ]
+    print(f"\n--- Running batched critic over {len(batch_cases)} test case(s) ---")
+    evaluations = evaluate_agent_responses_batch(batch_cases) if batch_cases else {}
+
+    for result in pending:
+        result["critic_evaluation"] = evaluations.get(
+            str(result["prompt_id_in_run"]), {"error": "No conversation history available for critic."}
+        )
+        del result["conversation_history"]
+        _append_result(result, run_context)
+    return pending
+
+
+def main(
+    workers: int = DEFAULT_WORKERS,
+    case_timeout: float = DEFAULT_CASE_TIMEOUT_SECONDS,
+    run_id: str = None,
+    fresh: bool = False,
+    batch_critic: bool = False
+):
+    print("--- Starting Evaluation Suite ---")
+    suite_started = time.monotonic()
+    from cassette import install_cassette_from_env  # imports httpx; not needed just to load this module
+
+    cassette = install_cassette_from_env()
+    if cassette is not None:
+        print(f"Cassette {cassette.mode} mode: {cassette.path}")
+
+    if test_indices_to_run is not None:
+        prompt_indices = list(test_indices_to_run)
+        print(f"Running a subset of {len(prompt_indices)} test prompts.")
+    else:
+        prompt_indices = list(range(len(TEST_PROMPTS_FULL)))
+        print(f"Running all {len(prompt_indices)} test prompts.")
+    all_tasks = [(i + 1, prompt_index, TEST_PROMPTS_FULL[prompt_index]) for i, prompt_index in enumerate(prompt_indices)]
+
+    run_context = {
+        "run_id": run_id or new_run_id(),
+        "case_hashes": {task[0]: compute_case_hash(task[2]) for task in all_tasks},
+        "batch_critic": batch_critic,
+        "awaiting_critic": [],
+    }
+    print(f"Run ID: {run_context['run_id']}")
+
+    if fresh:
+        with open(OUTPUT_FILE, "w") as f:
+            pass
+    completed_cases = load_completed_cases()
+
+    # Reuse results whose prompt, system message, tool schemas and model config are unchanged
+    reused_results = []
+    tasks = []
+    for task in all_tasks:
+        previous = completed_cases.get(run_context["case_hashes"][task[0]])
+        if previous is not None:
+            print(f"Skipping Test Case {task[0]} (Overall Index: {task[1] + 1}): result from run {previous.get('run_id')} is up to date.")
+            reused_results.append(previous)
+        else:
+            tasks.append(task)
+    print(f"{len(tasks)} test case(s) to run, {len(reused_results)} reused from {OUTPUT_FILE}.")
+
+    results = []
+    if tasks and (workers > 1 or case_timeout is not None):
+        print(f"Running with {workers} worker process(es), per-case timeout: {case_timeout}")
+        results = run_cases_in_parallel(tasks, run_context, workers, case_timeout)
+    elif tasks:
+        results = run_cases_sequentially(tasks, run_context)
+
+    if run_context["awaiting_critic"]:
+        results = [result for result in results if "conversation_history" not in result]
+        results += score_with_batched_critic(run_context)
+
+    all_evaluations_summary = [result["critic_evaluation"] for result in reused_results + results if "critic_evaluation" in result]
 
     print("\n\n--- Evaluation Suite Finished ---")
-    
+
     # Basic summary of scores
     print("\n--- Overall Score Summary (from successful evaluations) ---")
-    successful_evals = [e for e in all_evaluations_summary if e and "error" not in e]
+    # Evaluations whose scores failed validation (see critic_json.py) would skew the averages
+    successful_evals = [e for e in all_evaluations_summary if e and "error" not in e and "schema_errors" not in e]
     if successful_evals:
         criteria_keys = [
             "completeness_score", "quality_accuracy_score", "robustness_score",
@@ -122,8 +371,28 @@ def main():
     else:
         print("No successful evaluations to summarize.")
 
+    prescored = sum(1 for e in all_evaluations_summary if e and e.get("evaluated_by") == "prescorer")
+    print(f"\n{prescored} of {len(all_evaluations_summary)} evaluation(s) settled by the rule-based pre-scorer (no critic call).")
+
+    # Worker processes keep their own counters, so this covers the in-process cases only
+    print(f"\nCritic cache stats: {get_critic_cache().stats()}")
+    print(f"Critic JSON parse tiers: {critic_parse_stats()}")
+    if cassette is not None:
+        print(f"Cassette stats (this process): {cassette.stats()}")
+    print(f"Suite wall time: {time.monotonic() - suite_started:.2f}s")
     print(f"\nAll evaluation details saved to {OUTPUT_FILE}")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Run the paper search agent against the test prompts and score it with the critic.")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS, help="Number of worker processes, each with its own agent pair.")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_CASE_TIMEOUT_SECONDS, help="Per-case timeout in seconds; a stuck case's worker is killed.")
+    parser.add_argument("--indices", type=int, nargs="*", default=None, help="Prompt indices to run (overrides test_indices_to_run; pass no values to run all).")
+    parser.add_argument("--run-id", default=None, help="ID stored with every result of this run (default: timestamp-based).")
+    parser.add_argument("--fresh", action="store_true", help=f"Truncate {OUTPUT_FILE} and rerun every case.")
+    parser.add_argument("--batch-critic", action="store_true", help="Score all cases with batched critic calls after the agent runs (results are written at the end).")
+    args = parser.parse_args()
+    configure_logging()
+    if args.indices is not None:
+        test_indices_to_run = args.indices or None
+    main(workers=args.workers, case_timeout=args.timeout, run_id=args.run_id, fresh=args.fresh, batch_critic=args.batch_critic)
@@ -0,0 +1,281 @@
+from __future__ import annotations
+import threading
+import time
+import weakref
+from typing import TYPE_CHECKING
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from s2_rate_limit import S2RateLimiter, compute_backoff_seconds
+from tracing import span
+
+# httpx and asyncio are only imported by the async methods: a sync tool call should not pay for them
+if TYPE_CHECKING:
+    import httpx
+
+# Defaults for the shared Semantic Scholar client
+S2_POOL_CONNECTIONS = 4     # number of distinct host pools to keep around
+S2_POOL_MAXSIZE = 16        # connections kept alive per host
+S2_MAX_RETRIES = 3
+S2_BACKOFF_FACTOR = 0.5
+S2_RETRY_STATUSES = (500, 502, 503, 504)
+S2_TIMEOUT = 20
+S2_MAX_RATE_LIMIT_RETRIES = 5  # 429s are retried by the client, not by urllib3
+S2_MAX_RETRY_AFTER_SECONDS = 10.0  # longest Retry-After urllib3 sleeps for on a 503
+
+
+# urllib3 retries any status in RETRY_AFTER_STATUS_CODES (413, 429, 503 by default) that
+# carries a Retry-After header, even outside status_forcelist. 429s must reach the client's
+# own backoff so the shared rate limiter and the metrics see them, so only 503 is left.
+# That sleep happens inside urllib3, blocking the tool thread, so it is capped.
+class _S2Retry(Retry):
+    RETRY_AFTER_STATUS_CODES = frozenset({503})
+    RETRY_AFTER_MAX = S2_MAX_RETRY_AFTER_SECONDS
+
+    def get_retry_after(self, response) -> float | None:
+        retry_after = super().get_retry_after(response)
+        return None if retry_after is None else min(retry_after, self.RETRY_AFTER_MAX)
+
+
+class S2Client:
+    """
+    Thread-safe HTTP client for the Semantic Scholar API.
+
+    Owns a single pooled, keep-alive requests.Session so repeated page fetches and
+    tool calls reuse open TCP/TLS connections instead of handshaking every time.
+    Async callers get an httpx.AsyncClient with the same pool limits, one per event loop.
+
+    When a rate limiter is given, every request first takes a token from it, and 429
+    responses are retried internally after Retry-After or a jittered backoff.
+
+    A cassette (see cassette.py) wraps both transports to record or replay every exchange.
+    """
+
+    def __init__(
+        self,
+        pool_connections: int = S2_POOL_CONNECTIONS,
+        pool_maxsize: int = S2_POOL_MAXSIZE,
+        max_retries: int = S2_MAX_RETRIES,
+        backoff_factor: float = S2_BACKOFF_FACTOR,
+        retry_statuses: tuple = S2_RETRY_STATUSES,
+        keep_alive: bool = True,
+        timeout: float = S2_TIMEOUT,
+        api_key: str = None,
+        rate_limiter: S2RateLimiter = None,
+        max_rate_limit_retries: int = S2_MAX_RATE_LIMIT_RETRIES,
+        cassette=None,
+    ):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.keep_alive = keep_alive
+        self.timeout = timeout
+        self.api_key = api_key
+        self.max_retries = max_retries
+        self.rate_limiter = rate_limiter
+        self.max_rate_limit_retries = max_rate_limit_retries
+        self.cassette = cassette
+        self.retry_policy = _S2Retry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=retry_statuses,
+            allowed_methods=frozenset(["GET"]),
+            respect_retry_after_header=True,
+            raise_on_status=False,  # let raise_for_status() surface the final error
+        )
+        self._session = None
+        self._adapter = None
+        self._async_clients = weakref.WeakKeyDictionary()  # event loop -> httpx.AsyncClient
+        self._lock = threading.Lock()
+        self._requests_sent = 0
+        self._async_requests_sent = 0
+        self._timing = {
+            "queued_seconds": 0.0,
+            "request_seconds": 0.0,
+            "backoff_seconds": 0.0,
+            "rate_limited_responses": 0,
+        }
+
+    def _default_headers(self) -> dict:
+        headers = {"Connection": "keep-alive" if self.keep_alive else "close"}
+        if self.api_key:
+            headers["x-api-key"] = self.api_key
+        return headers
+
+    def _get_session(self) -> requests.Session:
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    adapter = HTTPAdapter(
+                        pool_connections=self.pool_connections,
+                        pool_maxsize=self.pool_maxsize,
+                        max_retries=self.retry_policy,
+                        pool_block=False,
+                    )
+                    session = requests.Session()
+                    mounted = self.cassette.wrap_adapter(adapter) if self.cassette is not None else adapter
+                    session.mount("https://", mounted)
+                    session.mount("http://", mounted)
+                    session.headers.update(self._default_headers())
+                    self._adapter = adapter
+                    self._session = session
+        return self._session
+
+    def _record(self, queued: float = 0.0, request: float = 0.0, backoff: float = 0.0, rate_limited: bool = False) -> None:
+        with self._lock:
+            self._timing["queued_seconds"] += queued
+            self._timing["request_seconds"] += request
+            self._timing["backoff_seconds"] += backoff
+            if rate_limited:
+                self._timing["rate_limited_responses"] += 1
+
+    # Returns the seconds to back off after a 429, or None when retries are used up.
+    def _rate_limit_backoff(self, attempt: int, retry_after: str) -> float | None:
+        if attempt >= self.max_rate_limit_retries:
+            return None
+        delay = compute_backoff_seconds(attempt, retry_after)
+        if self.rate_limiter is not None:
+            self.rate_limiter.block_for(delay)
+        return delay
+
+    def get(self, url: str, params: dict = None, headers: dict = None, timeout: float = None) -> requests.Response:
+        session = self._get_session()
+        attempt = 0
+        with span("s2.http.get", async_client=False) as http_span:
+            while True:
+                queued = self.rate_limiter.acquire() if self.rate_limiter is not None else 0.0
+                started = time.monotonic()
+                response = session.get(url, params=params, headers=headers, timeout=timeout or self.timeout)
+                with self._lock:
+                    self._requests_sent += 1
+                self._record(queued=queued, request=time.monotonic() - started)
+                http_span.add("attempts")
+                http_span.add("queued_ms", round(queued * 1000, 3))
+                http_span.set_attributes(status=response.status_code, bytes=len(response.content))
+                if response.status_code != 429:
+                    return response
+
+                delay = self._rate_limit_backoff(attempt, response.headers.get("Retry-After"))
+                self._record(rate_limited=True)
+                http_span.add("rate_limited")
+                if delay is None:
+                    return response
+                if self.rate_limiter is None:
+                    time.sleep(delay)  # the limiter already makes every worker wait out the block
+                self._record(backoff=delay)
+                http_span.add("backoff_ms", round(delay * 1000, 3))
+                attempt += 1
+
+    def _get_async_client(self) -> httpx.AsyncClient:
+        import asyncio
+        import httpx
+
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._async_clients.get(loop)
+            if client is None:
+                limits = httpx.Limits(
+                    max_connections=self.pool_maxsize,
+                    max_keepalive_connections=self.pool_maxsize if self.keep_alive else 0,
+                )
+                # httpx only retries failed connects; status-based retries stay with the sync adapter
+                transport = httpx.AsyncHTTPTransport(retries=self.max_retries, limits=limits)
+                if self.cassette is not None:
+                    transport = self.cassette.wrap_async_transport(transport)
+                client = httpx.AsyncClient(transport=transport, headers=self._default_headers())
+                self._async_clients[loop] = client
+        return client
+
+    async def aget(self, url: str, params: dict = None, headers: dict = None, timeout: float = None) -> httpx.Response:
+        import asyncio
+
+        client = self._get_async_client()
+        attempt = 0
+        with span("s2.http.get", async_client=True) as http_span:
+            while True:
+                queued = await asyncio.to_thread(self.rate_limiter.acquire) if self.rate_limiter is not None else 0.0
+                started = time.monotonic()
+                response = await client.get(url, params=params, headers=headers, timeout=timeout or self.timeout)
+                with self._lock:
+                    self._async_requests_sent += 1
+                self._record(queued=queued, request=time.monotonic() - started)
+                http_span.add("attempts")
+                http_span.add("queued_ms", round(queued * 1000, 3))
+                http_span.set_attributes(status=response.status_code, bytes=len(response.content))
+                if response.status_code != 429:
+                    return response
+
+                delay = await asyncio.to_thread(self._rate_limit_backoff, attempt, response.headers.get("Retry-After"))
+                self._record(rate_limited=True)
+                http_span.add("rate_limited")
+                if delay is None:
+                    return response
+                if self.rate_limiter is None:
+                    await asyncio.sleep(delay)
+                self._record(backoff=delay)
+                http_span.add("backoff_ms", round(delay * 1000, 3))
+                attempt += 1
+
+    async def aclose(self) -> None:
+        """Closes the async client bound to the running event loop, if any."""
+        import asyncio
+
+        with self._lock:
+            client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    def stats(self) -> dict:
+        """Connection counters summed over every host pool the session has opened."""
+        opened = 0
+        pool_requests = 0
+        with self._lock:
+            requests_sent = self._requests_sent
+            async_requests_sent = self._async_requests_sent
+            timing = dict(self._timing)
+            if self._adapter is not None:
+                pools = self._adapter.poolmanager.pools
+                for key in list(pools.keys()):
+                    pool = pools.get(key)
+                    if pool is None:
+                        continue
+                    opened += pool.num_connections
+                    pool_requests += pool.num_requests
+        return {
+            "requests_sent": requests_sent,
+            "async_requests_sent": async_requests_sent,
+            "connections_opened": opened,
+            "connections_reused": max(pool_requests - opened, 0),
+            **timing,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+            self._session = None
+            self._adapter = None
+
+
+_default_client = None
+_default_client_lock = threading.Lock()
+
+
+# Replaces the process-wide client, e.g. to route it through a cassette. No arguments restores the default.
+def configure_s2_client(**client_kwargs) -> S2Client:
+    global _default_client
+    with _default_client_lock:
+        if _default_client is not None:
+            _default_client.close()
+        client_kwargs.setdefault("rate_limiter", S2RateLimiter())
+        _default_client = S2Client(**client_kwargs)
+    return _default_client
+
+
+# Returns the process-wide client shared by every S2 endpoint wrapper.
+def get_s2_client() -> S2Client:
+    global _default_client
+    if _default_client is None:
+        with _default_client_lock:
+            if _default_client is None:
+                _default_client = S2Client(rate_limiter=S2RateLimiter())
+    return _default_client
@@ -0,0 +1,154 @@
+import email.utils
+import os
+import random
+import sqlite3
+import threading
+import time
+
+# Unauthenticated Semantic Scholar access is roughly one request per second shared by all callers
+S2_RATE_LIMIT_DB_PATH = os.path.join(".cache", "s2", "rate_limit.db")
+S2_RATE_LIMIT_PER_SECOND = 1.0
+S2_RATE_LIMIT_BURST = 1
+S2_BACKOFF_BASE_SECONDS = 1.0
+S2_BACKOFF_MAX_SECONDS = 60.0
+
+
+class S2RateLimiter:
+    """
+    Token bucket stored in SQLite so every thread and process on the machine draws from
+    the same quota.
+
+    A 429 response can also block the whole bucket until a given time (Retry-After or
+    backoff), so other workers stop sending requests that would be rejected anyway.
+    """
+
+    def __init__(
+        self,
+        db_path: str = S2_RATE_LIMIT_DB_PATH,
+        rate_per_second: float = S2_RATE_LIMIT_PER_SECOND,
+        burst: int = S2_RATE_LIMIT_BURST,
+        bucket_name: str = "semantic_scholar",
+    ):
+        self.db_path = db_path
+        self.rate_per_second = rate_per_second
+        self.burst = burst
+        self.bucket_name = bucket_name
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "acquired": 0,
+            "queued_seconds": 0.0,
+            "blocked_by_server": 0,
+        }
+
+    # One connection per thread; SQLite's own locking coordinates threads and processes.
+    def _get_conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            directory = os.path.dirname(self.db_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute(
+                """CREATE TABLE IF NOT EXISTS buckets (
+                    name TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    blocked_until REAL NOT NULL DEFAULT 0
+                )"""
+            )
+            self._local.conn = conn
+        return conn
+
+    def _try_take(self) -> float:
+        """Takes one token if available. Returns 0 on success, otherwise the seconds to wait."""
+        conn = self._get_conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT tokens, updated_at, blocked_until FROM buckets WHERE name = ?", (self.bucket_name,)
+            ).fetchone()
+            if row is None:
+                tokens, updated_at, blocked_until = float(self.burst), now, 0.0
+            else:
+                tokens, updated_at, blocked_until = row
+
+            tokens = min(float(self.burst), tokens + max(now - updated_at, 0.0) * self.rate_per_second)
+            if blocked_until > now:
+                wait = blocked_until - now
+            elif tokens >= 1.0:
+                tokens -= 1.0
+                wait = 0.0
+            else:
+                wait = (1.0 - tokens) / self.rate_per_second
+
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (name, tokens, updated_at, blocked_until) VALUES (?, ?, ?, ?)",
+                (self.bucket_name, tokens, now, blocked_until),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+    def acquire(self) -> float:
+        """Blocks until a request may be sent. Returns the time spent queued, in seconds."""
+        started = time.monotonic()
+        while True:
+            wait = self._try_take()
+            if wait <= 0:
+                break
+            time.sleep(wait)
+        queued = time.monotonic() - started
+        with self._stats_lock:
+            self._stats["acquired"] += 1
+            self._stats["queued_seconds"] += queued
+        return queued
+
+    def block_for(self, seconds: float) -> None:
+        """Stops every worker sharing this bucket from sending requests for `seconds`."""
+        conn = self._get_conn()
+        until = time.time() + seconds
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(
+                "INSERT OR IGNORE INTO buckets (name, tokens, updated_at, blocked_until) VALUES (?, 0, ?, 0)",
+                (self.bucket_name, time.time()),
+            )
+            conn.execute(
+                "UPDATE buckets SET blocked_until = MAX(blocked_until, ?) WHERE name = ?",
+                (until, self.bucket_name),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        with self._stats_lock:
+            self._stats["blocked_by_server"] += 1
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return dict(self._stats)
+
+
+# Seconds to wait after a 429: the server's Retry-After if given, else jittered exponential backoff.
+def compute_backoff_seconds(
+    attempt: int,
+    retry_after: str = None,
+    base: float = S2_BACKOFF_BASE_SECONDS,
+    maximum: float = S2_BACKOFF_MAX_SECONDS,
+) -> float:
+    if retry_after:
+        retry_after = retry_after.strip()
+        if retry_after.isdigit():
+            return min(float(retry_after), maximum)
+        try:
+            retry_at = email.utils.parsedate_to_datetime(retry_after)
+            return min(max(retry_at.timestamp() - time.time(), 0.0), maximum)
+        except (TypeError, ValueError):
+            pass
+    # "Equal jitter": keep half of the exponential delay, randomize the other half
+    delay = min(maximum, base * (2 ** attempt))
+    return delay / 2 + random.uniform(0, delay / 2)
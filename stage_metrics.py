@@ -0,0 +1,73 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Per-stage latency samples for run_benchmark_suite.py. Off by default, so the timers
+# spread through the code cost next to nothing in normal runs.
+STAGES = ("llm_turn", "llm_first_token", "llm_tool_dispatch", "s2_page", "paper_parse", "paper_format", "critic_call", "critic_json_repair", "agent_chat", "case_total")
+
+_enabled = False
+_samples = {}
+_lock = threading.Lock()
+
+
+def enable_stage_metrics(enabled: bool = True) -> None:
+    global _enabled
+    _enabled = enabled
+
+
+def record_stage(stage: str, seconds: float) -> None:
+    if not _enabled:
+        return
+    with _lock:
+        _samples.setdefault(stage, []).append(seconds)
+
+
+@contextmanager
+def stage_timer(stage: str):
+    if not _enabled:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - started)
+
+
+def reset_stage_metrics() -> None:
+    with _lock:
+        _samples.clear()
+
+
+def stage_samples() -> dict:
+    with _lock:
+        return {stage: list(values) for stage, values in _samples.items()}
+
+
+# Linear interpolation between closest ranks (same as numpy's default).
+def percentile(sorted_values: list, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = (len(sorted_values) - 1) * pct / 100
+    lower, upper = math.floor(rank), math.ceil(rank)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (rank - lower)
+
+
+def summarize_stages(samples: dict = None) -> dict:
+    """{stage: {count, total_ms, mean_ms, p50_ms, p95_ms, p99_ms, max_ms}} for every recorded stage."""
+    samples = stage_samples() if samples is None else samples
+    summary = {}
+    for stage, values in sorted(samples.items()):
+        ordered = sorted(values)
+        summary[stage] = {
+            "count": len(ordered),
+            "total_ms": round(sum(ordered) * 1000, 3),
+            "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3) if ordered else 0.0,
+            "p50_ms": round(percentile(ordered, 50) * 1000, 3),
+            "p95_ms": round(percentile(ordered, 95) * 1000, 3),
+            "p99_ms": round(percentile(ordered, 99) * 1000, 3),
+            "max_ms": round(ordered[-1] * 1000, 3) if ordered else 0.0,
+        }
+    return summary
@@ -0,0 +1,244 @@
+import contextvars
+import json
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from autogen.oai.mistral import MistralAIClient, calculate_mistral_cost
+from openai.types.chat import ChatCompletion
+from openai.types.chat.chat_completion import Choice
+from openai.types.chat.chat_completion_message import ChatCompletionMessage
+from openai.types.chat.chat_completion_message_tool_call import ChatCompletionMessageToolCall
+from openai.types.completion_usage import CompletionUsage
+from stage_metrics import record_stage
+from tracing import current_span
+
+# Streaming Mistral client for the paper search assistant (create_paper_search_agents(stream=True)).
+# Text deltas go to an on_token callback as they arrive, and a tool call is started on a
+# worker thread as soon as its JSON arguments are complete, before the stream has ended.
+EARLY_DISPATCH_MAX_WORKERS = 4
+# Early results the agent never asked for (e.g. the model's message was rejected) are dropped after this
+EARLY_DISPATCH_TTL_SECONDS = 120
+
+logger = logging.getLogger(__name__)
+
+
+class _IncrementalJsonObject:
+    """Tracks brace depth over streamed fragments to tell when a JSON object is complete."""
+
+    __slots__ = ("text", "_depth", "_in_string", "_escaped", "_started", "complete")
+
+    def __init__(self):
+        self.text = ""
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._started = False
+        self.complete = False
+
+    def feed(self, fragment: str) -> bool:
+        self.text += fragment
+        if self.complete:
+            return True
+        for char in fragment:
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == "{":
+                self._depth += 1
+                self._started = True
+            elif char == "}":
+                self._depth -= 1
+                if self._started and self._depth == 0:
+                    self.complete = True
+                    break
+        return self.complete
+
+
+class _StreamedToolCall:
+    __slots__ = ("id", "name", "arguments", "dispatched")
+
+    def __init__(self, call_id: str | None, name: str):
+        self.id = call_id or f"call_{uuid.uuid4().hex[:12]}"
+        self.name = name
+        self.arguments = _IncrementalJsonObject()
+        self.dispatched = False
+
+
+def _arguments_key(name: str, arguments: dict) -> tuple:
+    return name, json.dumps(arguments, sort_keys=True)
+
+
+class EarlyToolDispatcher:
+    """
+    Runs tool calls announced by a streaming LLM before the agent gets to execute them.
+
+    wrap_function_map() returns the function map to give the agents: when the agent then
+    executes a call that was already started, it waits for that result instead of running
+    the tool a second time.
+    """
+
+    def __init__(self, function_map: dict, max_workers: int = EARLY_DISPATCH_MAX_WORKERS):
+        self._functions = dict(function_map)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="early-tool")
+        self._pending = {}  # (name, canonical arguments) -> (started_at, future)
+        self._lock = threading.Lock()
+        self._stats = {"dispatched": 0, "claimed": 0, "expired": 0}
+
+    def dispatch(self, name: str, arguments: dict) -> bool:
+        function = self._functions.get(name)
+        if function is None or not isinstance(arguments, dict):
+            return False
+        key = _arguments_key(name, arguments)
+        now = time.monotonic()
+        with self._lock:
+            for stale_key in [k for k, (started, _) in self._pending.items() if now - started > EARLY_DISPATCH_TTL_SECONDS]:
+                del self._pending[stale_key]
+                self._stats["expired"] += 1
+            if key in self._pending:
+                return False
+            # Copy the context so the tool's spans nest under the LLM call that triggered them
+            future = self._executor.submit(contextvars.copy_context().run, function, **arguments)
+            self._pending[key] = (now, future)
+            self._stats["dispatched"] += 1
+        return True
+
+    def _claim(self, name: str, arguments: dict):
+        with self._lock:
+            entry = self._pending.pop(_arguments_key(name, arguments), None)
+            if entry is not None:
+                self._stats["claimed"] += 1
+        return entry[1] if entry is not None else None
+
+    def wrap(self, name: str):
+        function = self._functions[name]
+
+        def tool(**arguments):
+            future = self._claim(name, arguments)
+            return future.result() if future is not None else function(**arguments)
+
+        tool.__name__ = getattr(function, "__name__", name)
+        tool.__doc__ = function.__doc__
+        return tool
+
+    def wrap_function_map(self) -> dict:
+        return {name: self.wrap(name) for name in self._functions}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"pending": len(self._pending), **self._stats}
+
+
+def streaming_llm_config(llm_config: dict) -> dict:
+    """LLM_CONFIG with every Mistral entry routed through StreamingMistralClient."""
+    return {
+        **llm_config,
+        "config_list": [
+            {**config, "model_client_cls": StreamingMistralClient.__name__} if config.get("api_type") == "mistral" else config
+            for config in llm_config["config_list"]
+        ],
+    }
+
+
+def _delta_text(content) -> str:
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(getattr(chunk, "text", "") or "" for chunk in content)
+    return ""
+
+
+class StreamingMistralClient(MistralAIClient):
+    """
+    autogen model client that uses Mistral's streaming endpoint and returns the same
+    ChatCompletion as MistralAIClient once the stream ends. Register it with
+    assistant.register_model_client(StreamingMistralClient, dispatcher=..., on_token=...).
+    """
+
+    def __init__(self, config: dict, dispatcher: EarlyToolDispatcher = None, on_token=None, **kwargs):
+        super().__init__(api_key=config.get("api_key"))
+        self.dispatcher = dispatcher
+        self.on_token = on_token
+
+    def parse_params(self, params: dict) -> dict:
+        # MistralAIClient warns about and ignores "stream"; streaming is this class's job
+        return super().parse_params({key: value for key, value in params.items() if key != "stream"})
+
+    def _feed_tool_calls(self, delta_tool_calls, tool_calls: list, request_started: float) -> None:
+        for delta_call in delta_tool_calls:
+            function = delta_call.function
+            call_id = delta_call.id if delta_call.id not in (None, "null") else None  # the SDK's placeholder for "no id"
+            # A new id or name starts a new call; fragments without one continue the last call
+            if not tool_calls or (call_id and call_id != tool_calls[-1].id) or (function.name and function.name != tool_calls[-1].name):
+                tool_calls.append(_StreamedToolCall(call_id, function.name))
+            call = tool_calls[-1]
+            arguments = function.arguments
+            complete = call.arguments.feed(arguments if isinstance(arguments, str) else json.dumps(arguments or {}))
+            if complete and not call.dispatched and self.dispatcher is not None:
+                try:
+                    parsed_arguments = json.loads(call.arguments.text)
+                except json.JSONDecodeError:
+                    continue
+                call.dispatched = self.dispatcher.dispatch(call.name, parsed_arguments)
+                if call.dispatched:
+                    dispatch_seconds = time.perf_counter() - request_started
+                    record_stage("llm_tool_dispatch", dispatch_seconds)
+                    current_span().set_attribute("time_to_tool_dispatch_ms", round(dispatch_seconds * 1000, 3))
+                    logger.debug("Dispatched %s early after %.0f ms", call.name, dispatch_seconds * 1000)
+
+    def create(self, params: dict) -> ChatCompletion:
+        mistral_params = self.parse_params(params)
+        request_started = time.perf_counter()
+        first_token_seconds = None
+        content_parts, tool_calls = [], []
+        usage, response_id, model = None, None, mistral_params["model"]
+
+        for event in self._client.chat.stream(**mistral_params):
+            chunk = event.data
+            response_id, model = chunk.id or response_id, chunk.model or model
+            if chunk.usage is not None:
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            text = _delta_text(delta.content)
+            if first_token_seconds is None and (text or delta.tool_calls):
+                first_token_seconds = time.perf_counter() - request_started
+                record_stage("llm_first_token", first_token_seconds)
+                current_span().set_attribute("time_to_first_token_ms", round(first_token_seconds * 1000, 3))
+            if text:
+                content_parts.append(text)
+                if self.on_token is not None:
+                    self.on_token(text)
+            if delta.tool_calls:
+                self._feed_tool_calls(delta.tool_calls, tool_calls, request_started)
+
+        oai_tool_calls = [
+            ChatCompletionMessageToolCall(id=call.id, type="function", function={"name": call.name, "arguments": call.arguments.text or "{}"})
+            for call in tool_calls
+        ] or None
+        message = ChatCompletionMessage(
+            role="assistant",
+            content="".join(content_parts),
+            function_call=None,
+            tool_calls=oai_tool_calls,
+        )
+        prompt_tokens = usage.prompt_tokens if usage is not None else 0
+        completion_tokens = usage.completion_tokens if usage is not None else 0
+        current_span().set_attribute("streamed", True)
+        return ChatCompletion(
+            id=response_id or f"stream-{uuid.uuid4().hex[:12]}",
+            model=model,
+            created=int(time.time()),
+            object="chat.completion",
+            choices=[Choice(finish_reason="tool_calls" if oai_tool_calls else "stop", index=0, message=message)],
+            usage=CompletionUsage(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens, total_tokens=prompt_tokens + completion_tokens),
+            cost=calculate_mistral_cost(prompt_tokens, completion_tokens, model),
+        )
@@ -0,0 +1,15 @@
+# Test Prompts
+TEST_PROMPTS_FULL = [
+    # A. Typical Prompts
+    "Find 3 research papers on 'transformer models in NLP' published in 2021 with more than 200 citations.",
+    "Show me one highly cited paper about 'CRISPR gene editing applications' published before 2019. By highly cited, I mean over 1000 citations.",
+    # B. Ambiguous Prompts
+    "I need some recent papers on reinforcement learning.",
+    "Find good papers about AI ethics.",
+    # C. Complex Requests
+    "Can you get me up to 5 papers on 'graph neural networks' published after 2022, but I only want those with at least 50 citations?",
+    # D. Edge Cases or Error-Inducing Prompts
+    "Find research papers on 'time travel feasibility' published in the year 2500.",
+    "Search for papers on '' with 10 citations.", # Empty topic
+    "I want papers on 'the history of aether physics' with exactly -5 citations published before 1900."
+]
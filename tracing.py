@@ -0,0 +1,160 @@
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+# Spans are written as one JSON object per line, with OTLP-style field names, to
+# TRACE_JSONL_PATH. Without it tracing is off and span() hands out a shared no-op span.
+TRACE_JSONL_PATH = os.getenv("TRACE_JSONL_PATH")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = "%(message)s"
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_sink = None
+_sink_lock = threading.Lock()
+
+
+def configure_logging(level: str = None) -> None:
+    """Sets up logging for a command line entry point. LOG_LEVEL=DEBUG shows the full critic and tool chatter."""
+    logging.basicConfig(level=(level or LOG_LEVEL).upper(), format=LOG_FORMAT)
+
+
+class _JsonlSink:
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def export(self, record: dict) -> None:
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with _sink_lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+
+def enable_tracing(path: str) -> None:
+    """Starts writing spans to the given JSONL file (appends; several processes may share it)."""
+    global _sink
+    _sink = _JsonlSink(path)
+
+
+def disable_tracing() -> None:
+    global _sink
+    _sink = None
+
+
+def tracing_enabled() -> bool:
+    return _sink is not None
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_span_id", "start_ns", "end_ns", "attributes", "status")
+
+    def __init__(self, name: str, parent: "Span | None", attributes: dict):
+        self.name = name
+        self.trace_id = parent.trace_id if parent is not None else uuid.uuid4().hex
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_span_id = parent.span_id if parent is not None else None
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = dict(attributes)
+        self.status = "OK"
+
+    def set_attribute(self, key: str, value) -> None:
+        self.attributes[key] = value
+
+    def set_attributes(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    # Adds to a numeric attribute, e.g. retries or bytes over several requests.
+    def add(self, key: str, amount=1) -> None:
+        self.attributes[key] = self.attributes.get(key, 0) + amount
+
+    def to_dict(self) -> dict:
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_span_id,
+            "name": self.name,
+            "startTimeUnixNano": self.start_ns,
+            "endTimeUnixNano": self.end_ns,
+            "durationMs": round((self.end_ns - self.start_ns) / 1e6, 3) if self.end_ns else None,
+            "attributes": self.attributes,
+            "status": self.status,
+            "pid": os.getpid(),
+        }
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def set_attribute(self, key: str, value) -> None:
+        pass
+
+    def set_attributes(self, **attributes) -> None:
+        pass
+
+    def add(self, key: str, amount=1) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Times a block as a child of the current span. Exceptions are recorded on the span
+    (status "ERROR") and re-raised.
+    """
+    if _sink is None:
+        yield _NOOP_SPAN
+        return
+    current = Span(name, _current_span.get(), attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.status = "ERROR"
+        current.attributes["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end_ns = time.time_ns()
+        sink = _sink
+        if sink is not None:
+            sink.export(current.to_dict())
+
+
+def current_span():
+    """The innermost active span, or a no-op span when tracing is off or nothing is active."""
+    return _current_span.get() or _NOOP_SPAN
+
+
+# Wraps an agent's OpenAIWrapper.create so every LLM completion becomes an "llm.completion" span.
+def trace_llm_client(agent, agent_label: str = None) -> None:
+    original_create = agent.client.create
+
+    def traced_create(*args, **kwargs):
+        with span("llm.completion", agent=agent_label or agent.name, messages=len(kwargs.get("messages") or [])) as llm_span:
+            response = original_create(*args, **kwargs)
+            usage = getattr(response, "usage", None)
+            if usage is not None:
+                llm_span.set_attributes(
+                    prompt_tokens=usage.prompt_tokens,
+                    completion_tokens=usage.completion_tokens,
+                    total_tokens=usage.total_tokens,
+                )
+            llm_span.set_attribute("cost", getattr(response, "cost", None))
+            return response
+
+    agent.client.create = traced_create
+
+
+if TRACE_JSONL_PATH:
+    enable_tracing(TRACE_JSONL_PATH)